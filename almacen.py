@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén de metadatos de las declaraciones en un archivo SQLite.
+
+Reemplaza un JSON por declaración en declaraciones_metadatos/. Tablas:
+
+- declaraciones: una fila por declaración, con las columnas que se consultan
+  (URL y su hash, digest del PDF, versiones, error) y el registro completo
+  en `datos` (JSON) para reconstruir los archivos de antes.
+- intentos: cada intento de descarga o extracción, con su resultado.
+- campos: un renglón por campo extraído (montos también en centavos).
+
+Las escrituras se acumulan y se confirman en una sola transacción cada
+TAMANO_LOTE registros (o con confirmar()).
+
+El registro completo se serializa con serializacion.a_json (orjson si
+está instalado).
+
+Uso desde la terminal:
+    python almacen.py exportar [directorio]    # recrea los JSON
+    python almacen.py segmentos [directorio]   # exporta a segmentos JSON Lines
+    python almacen.py importar [directorio]    # carga los JSON o segmentos existentes
+"""
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import polars as pl
+
+import patrones
+from montos import pesos_a_centavos
+from serializacion import EscritorSegmentos, a_json, de_json, leer_segmentos
+
+RUTA_ALMACEN = Path("declaraciones.sqlite")
+DIRECTORIO_JSON = Path("declaraciones_metadatos")
+TAMANO_LOTE = 50
+
+# Columnas de `declaraciones` que se copian del registro (el resto queda en `datos`)
+COLUMNAS_DECLARACION = (
+    'url', 'nombre', 'primer_apellido', 'segundo_apellido', 'ruta_pdf',
+    'digest_pdf', 'pdf_descargado', 'datos_extraidos', 'error',
+    'version_texto', 'version_patrones', 'modo_texto', 'tabla_ingresos',
+    'timestamp_procesamiento',
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS declaraciones (
+    codigo_declaracion TEXT PRIMARY KEY,
+    url TEXT,
+    hash_url TEXT,
+    nombre TEXT,
+    primer_apellido TEXT,
+    segundo_apellido TEXT,
+    ruta_pdf TEXT,
+    digest_pdf TEXT,
+    pdf_descargado INTEGER,
+    datos_extraidos INTEGER,
+    error TEXT,
+    version_texto INTEGER,
+    version_patrones INTEGER,
+    modo_texto TEXT,
+    tabla_ingresos INTEGER,
+    timestamp_procesamiento TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_declaraciones_hash_url ON declaraciones(hash_url);
+CREATE INDEX IF NOT EXISTS idx_declaraciones_digest ON declaraciones(digest_pdf);
+
+CREATE TABLE IF NOT EXISTS intentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo_declaracion TEXT NOT NULL,
+    hash_url TEXT,
+    etapa TEXT NOT NULL,
+    exito INTEGER NOT NULL,
+    error TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_intentos_codigo ON intentos(codigo_declaracion);
+CREATE INDEX IF NOT EXISTS idx_intentos_hash_url ON intentos(hash_url);
+
+CREATE TABLE IF NOT EXISTS campos (
+    codigo_declaracion TEXT NOT NULL,
+    campo TEXT NOT NULL,
+    tipo TEXT,
+    valor TEXT,
+    centavos INTEGER,
+    PRIMARY KEY (codigo_declaracion, campo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_campos_campo ON campos(campo);
+"""
+
+
+def hash_url(url: Optional[str]) -> Optional[str]:
+    """SHA-256 de la URL (los índices sobre URLs largas son más pesados)."""
+    if not url:
+        return None
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _filas_campos(codigo: str, datos: Dict[str, Any]) -> List[tuple]:
+    """Renglones de `campos` para los campos registrados presentes en el registro."""
+    filas = []
+    for campo, alternativas in patrones.REGISTRO.items():
+        tipo = alternativas[0].tipo
+        if tipo == 'monto':
+            # Registros anteriores a los centavos traen el monto en pesos
+            centavos = datos.get(patrones.clave_valor(campo))
+            if centavos is None and isinstance(datos.get(campo), (int, float)):
+                centavos = pesos_a_centavos(datos[campo])
+            if centavos is None:
+                continue
+            filas.append((codigo, campo, tipo, f"{centavos / 100:.2f}", centavos))
+        elif datos.get(campo) is not None:
+            filas.append((codigo, campo, tipo, str(datos[campo]), None))
+    return filas
+
+
+class Almacen:
+    """
+    Conexión al almacén con escrituras por lotes. Las lecturas de un código
+    ven también lo que aún no se confirmó.
+    """
+
+    def __init__(self, ruta: Path = RUTA_ALMACEN, tamano_lote: int = TAMANO_LOTE):
+        self.ruta = Path(ruta)
+        self.tamano_lote = tamano_lote
+        self.conexion = sqlite3.connect(self.ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+        # codigo -> (fila de `declaraciones`, filas de `campos`), ya serializadas
+        self._pendientes: Dict[str, Tuple[tuple, List[tuple]]] = {}
+        self._intentos: List[tuple] = []
+        # Lo pendiente no se pierde si el proceso termina sin confirmar
+        atexit.register(self.confirmar)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    # Escritura
+
+    def guardar(self, datos: Dict[str, Any]):
+        """
+        Guarda (o reemplaza) el registro de una declaración. Se serializa al
+        recibirlo, así que se confirma tal como llegó aunque `datos` cambie.
+        """
+        codigo = datos['codigo_declaracion']
+        fila = ((codigo, hash_url(datos.get('url')))
+                + tuple(datos.get(columna) for columna in COLUMNAS_DECLARACION)
+                + (a_json(datos),))
+        self._pendientes[codigo] = (fila, _filas_campos(codigo, datos))
+        if len(self._pendientes) + len(self._intentos) >= self.tamano_lote:
+            self.confirmar()
+
+    def registrar_intento(self, codigo: str, etapa: str, exito: bool,
+                          error: Optional[str] = None, url: Optional[str] = None):
+        """Registra un intento de descarga o extracción (etapa: 'descarga', 'extraccion', ...)."""
+        self._intentos.append((codigo, hash_url(url), etapa, int(exito), error,
+                               datetime.now().isoformat()))
+        if len(self._pendientes) + len(self._intentos) >= self.tamano_lote:
+            self.confirmar()
+
+    def confirmar(self):
+        """Escribe lo pendiente en una sola transacción."""
+        if not self._pendientes and not self._intentos:
+            return
+        declaraciones = [fila for fila, _ in self._pendientes.values()]
+        campos = [renglon for _, renglones in self._pendientes.values() for renglon in renglones]
+
+        columnas = ('codigo_declaracion', 'hash_url') + COLUMNAS_DECLARACION + ('datos',)
+        with self.conexion:
+            self.conexion.executemany(
+                f"INSERT OR REPLACE INTO declaraciones ({', '.join(columnas)}) "
+                f"VALUES ({', '.join('?' * len(columnas))})", declaraciones)
+            self.conexion.executemany(
+                "DELETE FROM campos WHERE codigo_declaracion = ?",
+                [(codigo,) for codigo in self._pendientes])
+            self.conexion.executemany("INSERT INTO campos VALUES (?, ?, ?, ?, ?)", campos)
+            self.conexion.executemany(
+                "INSERT INTO intentos (codigo_declaracion, hash_url, etapa, exito, error, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self._intentos)
+        self._pendientes.clear()
+        self._intentos.clear()
+
+    def cerrar(self):
+        self.confirmar()
+        atexit.unregister(self.confirmar)
+        self.conexion.close()
+
+    # Lectura
+
+    def cargar(self, codigo: str) -> Optional[Dict[str, Any]]:
+        """Registro completo de una declaración, o None si no está."""
+        if codigo in self._pendientes:
+            return de_json(self._pendientes[codigo][0][-1])
+        fila = self.conexion.execute(
+            "SELECT datos FROM declaraciones WHERE codigo_declaracion = ?", (codigo,)).fetchone()
+        return de_json(fila[0]) if fila else None
+
+    def registros(self) -> List[Dict[str, Any]]:
+        """Todos los registros completos, en orden de código."""
+        self.confirmar()
+        filas = self.conexion.execute(
+            "SELECT datos FROM declaraciones ORDER BY codigo_declaracion").fetchall()
+        return [de_json(datos) for (datos,) in filas]
+
+    def buscar_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Registro de la declaración con esa URL (por hash)."""
+        self.confirmar()
+        fila = self.conexion.execute(
+            "SELECT datos FROM declaraciones WHERE hash_url = ? LIMIT 1", (hash_url(url),)).fetchone()
+        return de_json(fila[0]) if fila else None
+
+    def buscar_digest(self, digest: str) -> List[str]:
+        """Códigos de las declaraciones cuyo PDF tiene ese digest."""
+        self.confirmar()
+        return [codigo for (codigo,) in self.conexion.execute(
+            "SELECT codigo_declaracion FROM declaraciones WHERE digest_pdf = ?", (digest,))]
+
+    def consultar(self, sql: str, parametros: Iterable = ()) -> pl.DataFrame:
+        """Resultado de una consulta SQL como DataFrame."""
+        self.confirmar()
+        cursor = self.conexion.execute(sql, tuple(parametros))
+        columnas = [descripcion[0] for descripcion in cursor.description]
+        return pl.DataFrame(cursor.fetchall(), schema=columnas, orient='row')
+
+    def sin_campo(self, campo: str = 'ingreso_anual_neto') -> pl.DataFrame:
+        """Declaraciones procesadas a las que les falta un campo."""
+        return self.consultar(
+            "SELECT d.codigo_declaracion, d.url, d.error FROM declaraciones d "
+            "WHERE NOT EXISTS (SELECT 1 FROM campos c WHERE c.codigo_declaracion = d.codigo_declaracion "
+            "AND c.campo = ?) ORDER BY d.codigo_declaracion", (campo,))
+
+    def __len__(self) -> int:
+        self.confirmar()
+        return self.conexion.execute("SELECT COUNT(*) FROM declaraciones").fetchone()[0]
+
+    # Compatibilidad con los JSON por declaración
+
+    def exportar_json(self, directorio: Path = DIRECTORIO_JSON) -> int:
+        """Recrea {directorio}/{codigo}.json para cada declaración. Retorna cuántos."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        total = 0
+        for datos in self.registros():
+            # Temporal y renombrado: nunca queda un JSON a medias
+            ruta = directorio / f"{datos['codigo_declaracion']}.json"
+            temporal = ruta.with_name(ruta.name + '.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, ruta)
+            total += 1
+        return total
+
+    def exportar_segmentos(self, directorio: Path = DIRECTORIO_JSON) -> int:
+        """
+        Exporta todos los registros como segmentos metadatos_NNNNNN.jsonl,
+        reemplazando los de una exportación anterior. Retorna cuántos.
+        """
+        with EscritorSegmentos(directorio, reemplazar=True) as escritor:
+            for datos in self.registros():
+                escritor.agregar(datos)
+        return escritor.escritos
+
+    def importar_json(self, directorio: Path = DIRECTORIO_JSON) -> int:
+        """Carga los {codigo}.json y los segmentos .jsonl de un directorio. Retorna cuántos."""
+        total = 0
+        for ruta in sorted(Path(directorio).glob("*.json")):
+            with open(ruta, 'rb') as f:
+                datos = de_json(f.read())
+            datos.setdefault('codigo_declaracion', ruta.stem)
+            self.guardar(datos)
+            total += 1
+        for datos in leer_segmentos(directorio):
+            self.guardar(datos)
+            total += 1
+        self.confirmar()
+        return total
+
+
+if __name__ == "__main__":
+    comandos = ('exportar', 'segmentos', 'importar')
+    if len(sys.argv) < 2 or sys.argv[1] not in comandos:
+        print(f"Uso: python almacen.py {{{'|'.join(comandos)}}} [directorio]")
+        sys.exit(1)
+
+    directorio = Path(sys.argv[2]) if len(sys.argv) > 2 else DIRECTORIO_JSON
+    with Almacen() as almacen:
+        if sys.argv[1] == 'exportar':
+            total = almacen.exportar_json(directorio)
+            print(f"✓ {total} declaraciones exportadas a {directorio}/")
+        elif sys.argv[1] == 'segmentos':
+            total = almacen.exportar_segmentos(directorio)
+            print(f"✓ {total} declaraciones exportadas a segmentos JSON Lines en {directorio}/")
+        else:
+            total = almacen.importar_json(directorio)
+            print(f"✓ {total} declaraciones importadas de {directorio}/ a {RUTA_ALMACEN}")
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archivo frío de los PDFs (y los _debug.html / capturas) en segmentos grandes.
+
+En lugar de un archivo suelto por declaración en declaraciones_pdfs/, los
+documentos se agregan al final de segmentos segmento_NNNNNN.bin de hasta
+TAMANO_SEGMENTO bytes. Un índice SQLite (archivo_pdfs/indice.sqlite) guarda:
+
+- contenidos: digest SHA-256 -> (segmento, desplazamiento, longitud,
+  longitud original, compresión). Un mismo PDF se guarda una sola vez.
+- documentos: nombre del archivo (p. ej. CODIGO.pdf) -> digest.
+
+Cada documento se comprime por separado con zlib y solo si ahorra al menos
+AHORRO_MINIMO (los PDFs ya suelen venir comprimidos); así cualquier
+documento se lee sin tocar los demás. abrir() devuelve un objeto tipo
+archivo sobre un mmap del segmento: los documentos sin comprimir se leen
+sin copiarlos completos, y pdfplumber lo acepta igual que una ruta.
+
+Los bytes se escriben y se fuerzan a disco (fsync) antes de confirmar el
+índice, así que el índice nunca apunta a datos que no llegaron al disco.
+
+Uso desde la terminal:
+    python archivo_pdfs.py migrar [directorio] [--borrar]   # archiva declaraciones_pdfs/
+    python archivo_pdfs.py extraer NOMBRE [destino]          # recupera un documento
+    python archivo_pdfs.py resumen
+"""
+import hashlib
+import io
+import mmap
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+DIRECTORIO_ARCHIVO = Path("archivo_pdfs")
+DIRECTORIO_PDFS = Path("declaraciones_pdfs")
+NOMBRE_INDICE = "indice.sqlite"
+TAMANO_SEGMENTO = 1 << 30
+AHORRO_MINIMO = 0.05
+TAMANO_LOTE = 200
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contenidos (
+    digest TEXT PRIMARY KEY,
+    segmento INTEGER NOT NULL,
+    desplazamiento INTEGER NOT NULL,
+    longitud INTEGER NOT NULL,
+    longitud_original INTEGER NOT NULL,
+    compresion TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS documentos (
+    nombre TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    agregado TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_documentos_digest ON documentos(digest);
+"""
+
+
+class DocumentoArchivado(io.RawIOBase):
+    """
+    Documento del archivo como objeto de solo lectura con seek(). Al
+    serializarse (multiprocessing, ProcessPoolExecutor) se reabre por
+    nombre en el otro proceso.
+    """
+
+    def __init__(self, directorio: Path, nombre: str, digest: str, contenido):
+        super().__init__()
+        self.directorio = Path(directorio)
+        self.nombre = nombre
+        self.digest_pdf = digest
+        self._contenido = contenido
+        self._posicion = 0
+
+    def __reduce__(self):
+        return (abrir_documento, (str(self.directorio), self.nombre))
+
+    def __str__(self):
+        return f"{self.directorio}/{self.nombre}"
+
+    @property
+    def name(self) -> str:
+        return str(self)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, destino) -> int:
+        fin = min(self._posicion + len(destino), len(self._contenido))
+        leidos = fin - self._posicion
+        destino[:leidos] = self._contenido[self._posicion:fin]
+        self._posicion = fin
+        return leidos
+
+    def seek(self, desplazamiento: int, desde: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._posicion, io.SEEK_END: len(self._contenido)}[desde]
+        self._posicion = max(0, base + desplazamiento)
+        return self._posicion
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def close(self):
+        if isinstance(self._contenido, memoryview):
+            self._contenido.release()
+        super().close()
+
+
+class ArchivoPDF:
+    """Archivo de segmentos con su índice. Las escrituras se confirman por lotes."""
+
+    def __init__(self, directorio: Path = DIRECTORIO_ARCHIVO,
+                 tamano_segmento: int = TAMANO_SEGMENTO):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.tamano_segmento = tamano_segmento
+        self.conexion = sqlite3.connect(self.directorio / NOMBRE_INDICE)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript(ESQUEMA)
+        self._mapas: Dict[int, mmap.mmap] = {}
+        self._escritura = None
+        self._segmento = None
+        self._contenidos: Dict[str, tuple] = {}
+        self._documentos: List[tuple] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def _ruta_segmento(self, segmento: int) -> Path:
+        return self.directorio / f"segmento_{segmento:06d}.bin"
+
+    # Escritura
+
+    def _abrir_segmento(self, longitud: int):
+        """Segmento donde cabe el siguiente documento (uno nuevo si el actual se llenó)."""
+        if self._segmento is None:
+            segmentos = sorted(self.directorio.glob("segmento_*.bin"))
+            self._segmento = int(segmentos[-1].stem.split('_')[1]) if segmentos else 0
+        if self._escritura is None:
+            self._escritura = open(self._ruta_segmento(self._segmento), 'ab')
+        if self._escritura.tell() and self._escritura.tell() + longitud > self.tamano_segmento:
+            self._sincronizar()
+            self._escritura.close()
+            self._segmento += 1
+            self._escritura = open(self._ruta_segmento(self._segmento), 'ab')
+
+    def _sincronizar(self):
+        if self._escritura is not None:
+            self._escritura.flush()
+            os.fsync(self._escritura.fileno())
+
+    def agregar(self, nombre: str, datos: bytes) -> str:
+        """Agrega (o reemplaza) un documento. Retorna su digest."""
+        digest = hashlib.sha256(datos).hexdigest()
+        if digest not in self._contenidos and self._ubicacion(digest) is None:
+            comprimido = zlib.compress(datos, 6)
+            if len(comprimido) <= len(datos) * (1 - AHORRO_MINIMO):
+                guardado, compresion = comprimido, 'zlib'
+            else:
+                guardado, compresion = datos, 'ninguna'
+            self._abrir_segmento(len(guardado))
+            desplazamiento = self._escritura.tell()
+            self._escritura.write(guardado)
+            self._contenidos[digest] = (digest, self._segmento, desplazamiento,
+                                        len(guardado), len(datos), compresion)
+        self._documentos.append((nombre, digest, datetime.now().isoformat()))
+        if len(self._documentos) >= TAMANO_LOTE:
+            self.confirmar()
+        return digest
+
+    def agregar_archivo(self, ruta: Path) -> str:
+        ruta = Path(ruta)
+        return self.agregar(ruta.name, ruta.read_bytes())
+
+    def confirmar(self):
+        """Fuerza a disco los segmentos y después confirma el índice."""
+        if not self._documentos:
+            return
+        self._sincronizar()
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR IGNORE INTO contenidos VALUES (?, ?, ?, ?, ?, ?)", self._contenidos.values())
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?)", self._documentos)
+        self._contenidos.clear()
+        self._documentos.clear()
+
+    def cerrar(self):
+        self.confirmar()
+        if self._escritura is not None:
+            self._escritura.close()
+            self._escritura = None
+        for mapa in self._mapas.values():
+            mapa.close()
+        self._mapas.clear()
+        self.conexion.close()
+
+    # Lectura
+
+    def _ubicacion(self, digest: str) -> Optional[Tuple[int, int, int, int, str]]:
+        if digest in self._contenidos:
+            return self._contenidos[digest][1:]
+        return self.conexion.execute(
+            "SELECT segmento, desplazamiento, longitud, longitud_original, compresion "
+            "FROM contenidos WHERE digest = ?", (digest,)).fetchone()
+
+    def digest(self, nombre: str) -> Optional[str]:
+        """Digest del documento, o None si no está archivado."""
+        for pendiente, digest, _ in reversed(self._documentos):
+            if pendiente == nombre:
+                return digest
+        fila = self.conexion.execute("SELECT digest FROM documentos WHERE nombre = ?", (nombre,)).fetchone()
+        return fila[0] if fila else None
+
+    def contiene(self, nombre: str) -> bool:
+        return self.digest(nombre) is not None
+
+    def _mapa(self, segmento: int, fin: int) -> mmap.mmap:
+        mapa = self._mapas.get(segmento)
+        if mapa is None or len(mapa) < fin:
+            # El segmento en escritura pudo crecer desde que se mapeó
+            self._sincronizar()
+            with open(self._ruta_segmento(segmento), 'rb') as f:
+                nuevo = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapa is not None:
+                try:
+                    mapa.close()
+                except BufferError:
+                    pass  # Aún hay documentos abiertos sobre el mapa anterior
+            self._mapas[segmento] = mapa = nuevo
+        return mapa
+
+    def abrir(self, nombre: str) -> Optional[DocumentoArchivado]:
+        """Documento como objeto tipo archivo (sin copia si no está comprimido)."""
+        digest = self.digest(nombre)
+        if digest is None:
+            return None
+        segmento, desplazamiento, longitud, _, compresion = self._ubicacion(digest)
+        vista = memoryview(self._mapa(segmento, desplazamiento + longitud))[desplazamiento:desplazamiento + longitud]
+        if compresion == 'zlib':
+            contenido = zlib.decompress(vista)
+            vista.release()
+        else:
+            contenido = vista
+        return DocumentoArchivado(self.directorio, nombre, digest, contenido)
+
+    def leer(self, nombre: str) -> Optional[bytes]:
+        documento = self.abrir(nombre)
+        if documento is None:
+            return None
+        with documento:
+            return documento.read()
+
+    def extraer(self, nombre: str, destino: Path) -> bool:
+        """Recupera un documento como archivo suelto."""
+        datos = self.leer(nombre)
+        if datos is None:
+            return False
+        destino = Path(destino)
+        temporal = destino.with_name(destino.name + '.tmp')
+        temporal.write_bytes(datos)
+        os.replace(temporal, destino)
+        return True
+
+    def resumen(self) -> Dict[str, int]:
+        self.confirmar()
+        documentos, = self.conexion.execute("SELECT COUNT(*) FROM documentos").fetchone()
+        contenidos, guardado, original = self.conexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(longitud), 0), COALESCE(SUM(longitud_original), 0) "
+            "FROM contenidos").fetchone()
+        return {'documentos': documentos, 'contenidos': contenidos,
+                'bytes_guardados': guardado, 'bytes_originales': original,
+                'segmentos': len(list(self.directorio.glob("segmento_*.bin")))}
+
+    # Migración
+
+    def migrar(self, directorio: Path = DIRECTORIO_PDFS, borrar: bool = False) -> int:
+        """
+        Archiva los archivos sueltos de `directorio`. Con `borrar`, cada
+        archivo se elimina después de confirmar el índice y comprobar que
+        lo archivado tiene el mismo digest. Retorna cuántos se archivaron.
+        """
+        rutas = sorted(ruta for ruta in Path(directorio).iterdir()
+                       if ruta.is_file() and not ruta.name.endswith('.tmp'))
+        for inicio in range(0, len(rutas), TAMANO_LOTE):
+            lote = rutas[inicio:inicio + TAMANO_LOTE]
+            digests = [self.agregar_archivo(ruta) for ruta in lote]
+            self.confirmar()
+            if borrar:
+                for ruta, digest in zip(lote, digests):
+                    if hashlib.sha256(self.leer(ruta.name)).hexdigest() == digest:
+                        ruta.unlink()
+                    else:
+                        print(f"  ✗ {ruta.name}: lo archivado no coincide, se conserva el archivo")
+            print(f"  → {min(inicio + TAMANO_LOTE, len(rutas))}/{len(rutas)} archivados")
+        return len(rutas)
+
+
+_ARCHIVOS: Dict[str, ArchivoPDF] = {}
+
+
+def abrir_archivo(directorio: Union[str, Path] = DIRECTORIO_ARCHIVO) -> Optional[ArchivoPDF]:
+    """Archivo del directorio (uno por proceso), o None si no existe."""
+    clave = str(directorio)
+    if clave not in _ARCHIVOS:
+        if not (Path(directorio) / NOMBRE_INDICE).exists():
+            return None
+        _ARCHIVOS[clave] = ArchivoPDF(directorio)
+    return _ARCHIVOS[clave]
+
+
+def abrir_documento(directorio: Union[str, Path], nombre: str) -> Optional[DocumentoArchivado]:
+    archivo = abrir_archivo(directorio)
+    return archivo.abrir(nombre) if archivo else None
+
+
+def fuente_pdf(codigo: str, directorio_pdfs: Path = DIRECTORIO_PDFS,
+               directorio_archivo: Path = DIRECTORIO_ARCHIVO) -> Union[Path, DocumentoArchivado, None]:
+    """
+    PDF de una declaración: el archivo suelto si existe, si no el
+    documento archivado, o None si no hay ninguno.
+    """
+    ruta = Path(directorio_pdfs) / f"{codigo}.pdf"
+    if ruta.exists():
+        return ruta
+    return abrir_documento(directorio_archivo, ruta.name)
+
+
+def ubicacion_pdf(fuente: Union[Path, DocumentoArchivado]) -> str:
+    """Origen del PDF como se registra en el resultado: la ruta o archivo:<codigo>."""
+    if isinstance(fuente, DocumentoArchivado):
+        return f"archivo:{Path(fuente.nombre).stem}"
+    return str(fuente)
+
+
+def pdf_disponible(codigo: str, directorio_pdfs: Path = DIRECTORIO_PDFS,
+                   directorio_archivo: Path = DIRECTORIO_ARCHIVO) -> bool:
+    """Si el PDF de la declaración está suelto o archivado (sin abrirlo)."""
+    if (Path(directorio_pdfs) / f"{codigo}.pdf").exists():
+        return True
+    archivo = abrir_archivo(directorio_archivo)
+    return archivo is not None and archivo.contiene(f"{codigo}.pdf")
+
+
+if __name__ == "__main__":
+    comandos = ('migrar', 'extraer', 'resumen')
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not argumentos or argumentos[0] not in comandos or (argumentos[0] == 'extraer' and len(argumentos) < 2):
+        print("Uso: python archivo_pdfs.py migrar [directorio] [--borrar] | extraer NOMBRE [destino] | resumen")
+        sys.exit(1)
+
+    with ArchivoPDF() as archivo:
+        if argumentos[0] == 'migrar':
+            directorio = Path(argumentos[1]) if len(argumentos) > 1 else DIRECTORIO_PDFS
+            borrar = '--borrar' in sys.argv
+            total = archivo.migrar(directorio, borrar)
+            print(f"✓ {total} archivos de {directorio}/ archivados en {DIRECTORIO_ARCHIVO}/"
+                  + (" (originales eliminados)" if borrar else ""))
+        elif argumentos[0] == 'extraer':
+            destino = Path(argumentos[2]) if len(argumentos) > 2 else Path(argumentos[1])
+            if archivo.extraer(argumentos[1], destino):
+                print(f"✓ {argumentos[1]} -> {destino}")
+            else:
+                print(f"✗ {argumentos[1]} no está en el archivo")
+                sys.exit(1)
+        else:
+            conteo = archivo.resumen()
+            print(f"ℹ {conteo['documentos']} documentos ({conteo['contenidos']} distintos) "
+                  f"en {conteo['segmentos']} segmentos: "
+                  f"{conteo['bytes_guardados'] / 2**20:,.1f} MB de {conteo['bytes_originales'] / 2**20:,.1f} MB")
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara los motores de regex (re vs RE2) sobre las declaraciones ya
+descargadas y sobre textos adversariales que fuerzan retroceso.
+
+Requiere google-re2 (pip install google-re2); sin él solo se mide re.
+Que ambos motores coincidan y que RE2 se mantenga lineal lo verifica
+tests/test_patrones.py.
+"""
+
+# %% CONFIGURACIÓN
+from pathlib import Path
+
+from extraccion_pdf import extraer_texto_pdf
+from patrones import comparar_motores, textos_adversariales
+
+DIRECTORIO_PDFS = Path("declaraciones_pdfs")
+LIMITE_PDFS = 50
+REPETICIONES = 3
+
+# %% CORPUS
+textos = {}
+for ruta_pdf in sorted(DIRECTORIO_PDFS.glob("*.pdf"))[:LIMITE_PDFS]:
+    texto = extraer_texto_pdf(ruta_pdf)
+    if texto:
+        textos[ruta_pdf.stem] = texto
+
+print(f"✓ {len(textos)} declaraciones cargadas de {DIRECTORIO_PDFS}")
+
+adversariales = textos_adversariales()
+textos.update({f"adversarial_{nombre}": texto for nombre, texto in adversariales.items()})
+
+# %% COMPARACIÓN
+tiempos = comparar_motores(textos, repeticiones=REPETICIONES)
+
+print("\nTextos adversariales (ms por extracción):")
+for nombre in adversariales:
+    fila = "  ".join(f"{motor}: {por_texto[f'adversarial_{nombre}']*1000:>8,.1f}"
+                     for motor, por_texto in tiempos.items())
+    print(f"  {nombre:<25} {fila}")
+
@@ -9,6 +9,7 @@ import polars as pl
 import requests
 import pdfplumber
 import re
+import sys
 from io import BytesIO
 import time
 from pathlib import Path
@@ -17,6 +18,28 @@ import json
 from datetime import datetime
 from typing import Dict, Optional, Tuple
 
+from extraccion_pdf import (extraer_texto_pdf, extraer_texto_dirigido,
+                            extraer_tabla_ingresos, cargar_tabla_ingresos_cache, campos_desde_tabla,
+                            extraer_texto_con_ocr, DPI_OCR,
+                            guardar_texto_cache, cargar_textos_cache, cargar_texto_cache,
+                            huella_extraccion, comparar_huella, ESTADOS_REPROCESO)
+import patrones
+from patrones import extraer_campos, extraer_campos_lote, recargar_especificacion
+from montos import estadisticas_centavos, formatear_centavos
+from almacen import Almacen, RUTA_ALMACEN
+from manifiesto import Manifiesto, abrir_manifiesto
+from sumidero import SumideroParquet, leer_resultados_corrida, archivar_corrida
+from esquema import ResultadoDeclaracion, a_dataframe
+from archivo_pdfs import (fuente_pdf, pdf_disponible, ubicacion_pdf, DocumentoArchivado,
+                          DIRECTORIO_ARCHIVO)
+from parser_declaracion import construir_tablas, cargar_tabla, DIRECTORIO_TABLAS
+from dataset_resultados import (upsert_resultados, escanear_resultados, cargar_consolidado,
+                                DIRECTORIO_DATASET)
+from exportacion import (FORMATOS_DEFAULT, validar_formatos, exportar_xlsx_en_segundo_plano,
+                         esperar_exportaciones)
+from supervisor import (ejecutar_supervisado, ExtraccionAbortada,
+                        TIEMPO_MAXIMO_S, MEMORIA_MAXIMA_MB)
+
 # Configuración de directorios
 DIRECTORIO_PDFS = Path("declaraciones_pdfs")
 DIRECTORIO_METADATOS = Path("declaraciones_metadatos")
@@ -27,6 +50,12 @@ DIRECTORIO_PDFS.mkdir(exist_ok=True)
 DIRECTORIO_METADATOS.mkdir(exist_ok=True)
 DIRECTORIO_RESULTADOS.mkdir(exist_ok=True)
 
+# Metadatos en SQLite; los JSON de corridas anteriores se importan la primera vez
+ALMACEN = Almacen(RUTA_ALMACEN)
+if len(ALMACEN) == 0 and any(DIRECTORIO_METADATOS.glob("*.json")):
+    print(f"→ Importando metadatos JSON a {RUTA_ALMACEN}...")
+    print(f"✓ {ALMACEN.importar_json(DIRECTORIO_METADATOS)} declaraciones importadas")
+
 
 def generar_codigo_declaracion(nombre: str, apellido1: str, apellido2: str, url: str) -> str:
     """
@@ -109,126 +138,51 @@ def descargar_pdf(url: str, codigo: str) -> Optional[Path]:
         return None
 
 
-def extraer_texto_pdf(ruta_pdf: Path) -> Optional[str]:
-    """
-    Extrae todo el texto de un PDF.
-    """
-    try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            texto_completo = ""
-            for pagina in pdf.pages:
-                texto_completo += pagina.extract_text() or ""
-        
-        return texto_completo
-    
-    except Exception as e:
-        print(f"  ✗ Error extrayendo texto: {str(e)}")
-        return None
-
-
-def extraer_ingreso_anual_neto(texto: str) -> Optional[float]:
+def guardar_metadatos(codigo: str, datos_completos: Dict):
     """
-    Busca y extrae el ingreso anual neto del texto del PDF.
+    Guarda metadatos completos de la declaración en el almacén. Para tener
+    los JSON de antes: `python almacen.py exportar`.
     """
-    if not texto:
-        return None
-    
-    # Patrón 1: Buscar la línea específica
-    patron1 = r'A\.\s*INGRESO ANUAL NETO DEL DECLARANTE.*?(\d[\d,]+)'
-    match1 = re.search(patron1, texto, re.IGNORECASE | re.DOTALL)
-    
-    if match1:
-        monto = match1.group(1).replace(',', '')
-        return float(monto)
-    
-    # Patrón 2: Buscar en formato de tabla
-    patron2 = r'INGRESO ANUAL NETO.*?NUMERAL I Y II\)?\s*(\d[\d,]+)'
-    match2 = re.search(patron2, texto, re.IGNORECASE | re.DOTALL)
+    # Agregar timestamp y versión de los patrones usados
+    datos_completos['timestamp_procesamiento'] = datetime.now().isoformat()
+    datos_completos['version_patrones'] = patrones.VERSION_PATRONES
+    datos_completos['codigo_declaracion'] = codigo
     
-    if match2:
-        monto = match2.group(1).replace(',', '')
-        return float(monto)
+    ALMACEN.guardar(datos_completos)
     
-    return None
+    print(f"  ✓ Metadatos guardados: {codigo}")
 
 
-def extraer_datos_adicionales(texto: str) -> Dict:
-    """
-    Extrae información adicional del PDF para análisis futuro.
-    """
-    datos = {
-        'remuneracion_cargo_publico': None,
-        'otros_ingresos': None,
-        'actividad_financiera': None,
-        'servicios_profesionales': None,
-        'fecha_recepcion': None,
-        'cargo': None,
-        'institucion': None,
-    }
-    
-    # Extraer remuneración por cargo público
-    patron_remuneracion = r'REMUNERACIÓN ANUAL NETA.*?PRESTACIONES.*?(\d[\d,]+)'
-    match = re.search(patron_remuneracion, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['remuneracion_cargo_publico'] = float(match.group(1).replace(',', ''))
-    
-    # Extraer otros ingresos
-    patron_otros = r'II\.\s*OTROS INGRESOS.*?II\.1 AL II\.5\)\s*(\d[\d,]+)'
-    match = re.search(patron_otros, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['otros_ingresos'] = float(match.group(1).replace(',', ''))
-    
-    # Extraer actividad financiera
-    patron_financiera = r'II\.2.*?ACTIVIDAD FINANCIERA.*?IMPUESTOS\)\s*(\d[\d,]+)'
-    match = re.search(patron_financiera, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['actividad_financiera'] = float(match.group(1).replace(',', ''))
-    
-    # Extraer servicios profesionales
-    patron_servicios = r'II\.3.*?SERVICIOS PROFESIONALES.*?IMPUESTOS\)\s*(\d[\d,]+)'
-    match = re.search(patron_servicios, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['servicios_profesionales'] = float(match.group(1).replace(',', ''))
-    
-    # Extraer fecha de recepción
-    patron_fecha = r'FECHA DE RECEPCIÓN:\s*(\d{2}/\d{2}/\d{4})'
-    match = re.search(patron_fecha, texto)
-    if match:
-        datos['fecha_recepcion'] = match.group(1)
-    
-    # Extraer cargo
-    patron_cargo = r'EMPLEO, CARGO O COMISIÓN\s+([A-ZÁÉÍÓÚÑ\s]+?)(?=\s*DOCENCIA|ESPECIFIQUE|NIVEL)'
-    match = re.search(patron_cargo, texto, re.IGNORECASE)
-    if match:
-        datos['cargo'] = match.group(1).strip()
-    
-    # Extraer institución
-    patron_institucion = r'NOMBRE DEL ENTE PÚBLICO\s+([A-ZÁÉÍÓÚÑ,.\s]+?)(?=\s*ÁREA|EMPLEO|NIVEL)'
-    match = re.search(patron_institucion, texto, re.IGNORECASE)
-    if match:
-        datos['institucion'] = match.group(1).strip()
-    
-    return datos
+def cargar_metadatos(codigo: str) -> Optional[Dict]:
+    """Metadatos guardados de una declaración, o None si no hay."""
+    return ALMACEN.cargar(codigo)
 
 
-def guardar_metadatos(codigo: str, datos_completos: Dict):
+def procesar_declaracion(row: Dict, extraccion_dirigida: bool = False,
+                         tiempo_maximo: Optional[float] = TIEMPO_MAXIMO_S,
+                         memoria_maxima_mb: Optional[float] = MEMORIA_MAXIMA_MB,
+                         tabla_ingresos: bool = False,
+                         usar_ocr: bool = False,
+                         dpi_ocr: int = DPI_OCR,
+                         forzar_extraccion: bool = False,
+                         manifiesto: Optional[Manifiesto] = None) -> ResultadoDeclaracion:
     """
-    Guarda metadatos completos de la declaración en formato JSON.
-    """
-    ruta_metadatos = DIRECTORIO_METADATOS / f"{codigo}.json"
-    
-    # Agregar timestamp
-    datos_completos['timestamp_procesamiento'] = datetime.now().isoformat()
+    Procesa una declaración completa: descarga, extrae datos y guarda metadatos.
     
-    with open(ruta_metadatos, 'w', encoding='utf-8') as f:
-        json.dump(datos_completos, f, indent=2, ensure_ascii=False)
+    Si el PDF, las versiones de los extractores y las opciones coinciden con
+    las del resultado guardado, se reutiliza sin abrir el PDF; si solo
+    cambió la versión de campos.toml, se re-extrae desde el texto en caché.
     
-    print(f"  ✓ Metadatos guardados: {ruta_metadatos}")
-
-
-def procesar_declaracion(row: Dict) -> Dict:
-    """
-    Procesa una declaración completa: descarga, extrae datos y guarda metadatos.
+    Args:
+        row: Diccionario con datos de la persona y URL
+        extraccion_dirigida: Si True, extrae solo las páginas que contienen los campos
+        tiempo_maximo: Segundos permitidos para extraer el texto del PDF
+        memoria_maxima_mb: Memoria máxima (RSS) del proceso de extracción
+        tabla_ingresos: Si True, toma los montos de ingresos de la tabla del PDF
+        usar_ocr: Si True y el PDF no tiene texto, aplica OCR a las páginas vacías
+        dpi_ocr: Resolución para rasterizar las páginas en el OCR
+        forzar_extraccion: Si True, vuelve a leer el PDF aunque nada haya cambiado
+        manifiesto: Manifiesto de la corrida donde se registra la descarga
     """
     url = row.get('url', '')
     nombre = row.get('nombre', '')
@@ -243,54 +197,217 @@ def procesar_declaracion(row: Dict) -> Dict:
     print(f"Código: {codigo}")
     print(f"{'='*60}")
     
-    resultado = {
-        'codigo_declaracion': codigo,
-        'url': url,
-        'nombre': nombre,
-        'primer_apellido': apellido1,
-        'segundo_apellido': apellido2,
-        'ingreso_anual_neto': None,
-        'pdf_descargado': False,
-        'datos_extraidos': False,
-        'ruta_pdf': None,
-        'error': None,
-    }
-    
-    # Verificar si ya existe el PDF
-    ruta_pdf = DIRECTORIO_PDFS / f"{codigo}.pdf"
-    if ruta_pdf.exists():
-        print(f"  ℹ PDF ya existe, usando versión local")
-    else:
-        # Descargar PDF
-        ruta_pdf = descargar_pdf(url, codigo)
-        if not ruta_pdf:
-            resultado['error'] = 'Error al descargar PDF'
-            return resultado
-    
-    resultado['pdf_descargado'] = True
-    resultado['ruta_pdf'] = str(ruta_pdf)
-    
-    # Extraer texto
-    texto = extraer_texto_pdf(ruta_pdf)
-    if not texto:
-        resultado['error'] = 'Error al extraer texto del PDF'
-        return resultado
-    
-    # Extraer ingreso anual neto
-    ingreso = extraer_ingreso_anual_neto(texto)
-    resultado['ingreso_anual_neto'] = ingreso
+    resultado = ResultadoDeclaracion(codigo, url, nombre, apellido1, apellido2)
     
-    # Extraer datos adicionales
-    datos_adicionales = extraer_datos_adicionales(texto)
-    resultado.update(datos_adicionales)
-    resultado['datos_extraidos'] = True
+    # Verificar si ya existe el PDF (suelto o en archivo_pdfs)
+    ruta_pdf = fuente_pdf(codigo, DIRECTORIO_PDFS)
+    # Un documento archivado mantiene abierto un mmap del segmento hasta cerrarlo
+    archivado = ruta_pdf if isinstance(ruta_pdf, DocumentoArchivado) else None
+    try:
+        if ruta_pdf is not None:
+            print(f"  ℹ PDF ya existe, usando versión local" if isinstance(ruta_pdf, Path)
+                  else f"  ℹ PDF archivado, se lee desde {DIRECTORIO_ARCHIVO}")
+        else:
+            # Descargar PDF
+            ruta_pdf = descargar_pdf(url, codigo)
+            ALMACEN.registrar_intento(codigo, 'descarga', bool(ruta_pdf),
+                                      None if ruta_pdf else 'Error al descargar PDF', url)
+            if not ruta_pdf:
+                resultado.error = 'Error al descargar PDF'
+                return resultado
+        
+        resultado.pdf_descargado = True
+        resultado.ruta_pdf = ubicacion_pdf(ruta_pdf)
+        if manifiesto:
+            manifiesto.registrar(codigo, 'descargado')
+        
+        # Reproceso incremental según el PDF y las versiones de los extractores
+        recargar_especificacion()
+        huella = huella_extraccion(ruta_pdf, patrones.VERSION_PATRONES,
+                                   extraccion_dirigida, tabla_ingresos)
+        previo = cargar_metadatos(codigo)
+        estado = 'completo' if forzar_extraccion else comparar_huella(previo, huella)
+        resultado.actualizar(huella)
+        
+        if estado == 'sin_cambios':
+            print(f"  ✓ Sin cambios desde la última extracción, se reutiliza el resultado")
+            return ResultadoDeclaracion.desde_dict(previo)
+        
+        texto = cargar_texto_cache(codigo) if estado == 'campos' else None
+        if texto:
+            print(f"  → Solo cambiaron los campos, se re-extraen desde el texto en caché")
+        
+        limites = {'tiempo_maximo': tiempo_maximo, 'memoria_maxima_mb': memoria_maxima_mb}
+        if texto is None:
+            # Extraer texto en un proceso vigilado (tiempo y memoria limitados)
+            try:
+                if extraccion_dirigida:
+                    texto = ejecutar_supervisado(extraer_texto_dirigido, ruta_pdf,
+                                                 extraer_campos, **limites)
+                else:
+                    texto = ejecutar_supervisado(extraer_texto_pdf, ruta_pdf, **limites)
+            except ExtraccionAbortada as e:
+                print(f"  ✗ {e.mensaje_error()} ({e.detalle})")
+                resultado.error = e.mensaje_error()
+                ALMACEN.registrar_intento(codigo, 'extraccion', False, resultado.error, url)
+                return resultado
+        
+            # Declaración escaneada: OCR solo de las páginas sin capa de texto
+            if usar_ocr and not (texto or '').strip():
+                texto = extraer_texto_con_ocr(ruta_pdf, dpi=dpi_ocr)
+        
+            if not texto or not texto.strip():
+                resultado.error = 'Error al extraer texto del PDF'
+                ALMACEN.registrar_intento(codigo, 'extraccion', False, resultado.error, url)
+                return resultado
+            ALMACEN.registrar_intento(codigo, 'extraccion', True, url=url)
+        
+            # El texto queda en caché para re-extraer campos en lote; el del modo
+            # dirigido como parcial, que construir_tablas completa desde el PDF
+            guardar_texto_cache(codigo, texto, completo=not extraccion_dirigida)
+        
+        # Todos los campos en una sola pasada sobre el texto
+        datos = extraer_campos(texto)
+        ingreso = datos['ingreso_anual_neto_centavos']
+        resultado.actualizar(datos)
+        
+        # Montos de ingresos desde la tabla (geometría de las palabras) si se pidió
+        if tabla_ingresos:
+            try:
+                filas = ejecutar_supervisado(extraer_tabla_ingresos, ruta_pdf, **limites)
+            except ExtraccionAbortada as e:
+                print(f"  ⚠ Tabla de ingresos: {e.mensaje_error()} ({e.detalle})")
+                filas = None
+            if filas:
+                campos_tabla = campos_desde_tabla(filas)
+                resultado.actualizar({k: v for k, v in campos_tabla.items() if v is not None})
+                ingreso = resultado.get('ingreso_anual_neto_centavos')
+        
+        resultado.datos_extraidos = True
+        
+        # Guardar metadatos completos (con timestamp y versión de los patrones)
+        registro = resultado.a_dict()
+        guardar_metadatos(codigo, registro)
+        resultado.actualizar(registro)
+        
+        print(f"  ✓ Ingreso anual neto: {formatear_centavos(ingreso)}" if ingreso else "  ⚠ Ingreso no encontrado")
+        
+        return resultado
+    finally:
+        if archivado is not None:
+            archivado.close()
+
+
+def reextraer_desde_cache(codigos=None) -> pl.DataFrame:
+    """
+    Vuelve a extraer todos los campos desde la caché de texto, sin abrir
+    los PDFs, en una sola pasada vectorizada.
     
-    # Guardar metadatos completos
-    guardar_metadatos(codigo, resultado)
+    Args:
+        codigos: Códigos de declaración a re-extraer (None para todo el archivo)
+    """
+    inicio = time.perf_counter()
+    textos = cargar_textos_cache(codigos)
+    if textos.is_empty():
+        print("⚠ No hay textos en caché")
+        return textos.drop('texto')
+    
+    campos = extraer_campos_lote(textos)
+    transcurrido = time.perf_counter() - inicio
+    print(f"✓ {len(campos)} declaraciones re-extraídas desde caché en {transcurrido:.2f}s")
+    return campos
+
+
+def reaplicar_especificacion() -> pl.DataFrame:
+    """
+    Re-extrae, desde la caché de texto, solo las declaraciones cuyos
+    metadatos vienen de una versión anterior de campos.toml, y actualiza
+    sus metadatos con los campos nuevos.
+    """
+    recargar_especificacion()
+    version = patrones.VERSION_PATRONES
+    
+    desactualizadas = {datos['codigo_declaracion']: datos for datos in ALMACEN.registros()
+                       if datos.get('version_patrones', 0) < version}
+    
+    if not desactualizadas:
+        print(f"✓ Todas las declaraciones están en la versión {version}")
+        return pl.DataFrame()
+    
+    print(f"→ {len(desactualizadas)} declaraciones con versión anterior a {version}")
+    campos = reextraer_desde_cache(desactualizadas.keys())
+    
+    sin_tabla = 0
+    for fila in campos.iter_rows(named=True):
+        previo = desactualizadas[fila['codigo_declaracion']]
+        # Como registro: los montos en pesos de versiones anteriores no se arrastran
+        registro = ResultadoDeclaracion.desde_dict(previo)
+        registro.actualizar(fila)
+        if previo.get('tabla_ingresos'):
+            # Sus montos de ingresos vienen de la tabla, no de los patrones
+            filas_tabla = cargar_tabla_ingresos_cache(previo['digest_pdf']) if previo.get('digest_pdf') else None
+            if filas_tabla is None:
+                sin_tabla += 1
+                continue
+            registro.actualizar({k: v for k, v in campos_desde_tabla(filas_tabla).items() if v is not None})
+        guardar_metadatos(fila['codigo_declaracion'], registro.a_dict())
+    ALMACEN.confirmar()
+    
+    sin_texto = len(desactualizadas) - len(campos)
+    if sin_texto:
+        print(f"⚠ {sin_texto} sin texto en caché (hay que reprocesar su PDF)")
+    if sin_tabla:
+        print(f"⚠ {sin_tabla} con tabla de ingresos sin caché (quedan para reprocesar)")
+    return campos
+
+
+def reprocesar(forzar: bool = False, usar_ocr: bool = False) -> pl.DataFrame:
+    """
+    Recalcula solo las declaraciones guardadas cuyo PDF, versión del
+    extractor de texto, versión de campos.toml u opciones cambiaron desde
+    su última extracción. No descarga nada: usa los PDFs locales.
     
-    print(f"  ✓ Ingreso anual neto: ${ingreso:,.2f}" if ingreso else "  ⚠ Ingreso no encontrado")
+    Args:
+        forzar: Si True, recalcula todas desde el PDF
+        usar_ocr: Si True, aplica OCR a los PDFs sin capa de texto
+    """
+    inicio = time.perf_counter()
+    recargar_especificacion()
+    conteo = {estado: 0 for estado in ESTADOS_REPROCESO}
+    sin_pdf = 0
+    resultados = []
     
-    return resultado
+    for previo in ALMACEN.registros():
+        ruta_pdf = fuente_pdf(previo['codigo_declaracion'], DIRECTORIO_PDFS)
+        if ruta_pdf is None:
+            sin_pdf += 1
+            continue
+        
+        opciones = {
+            'extraccion_dirigida': previo.get('modo_texto') == 'dirigido',
+            'tabla_ingresos': bool(previo.get('tabla_ingresos')),
+        }
+        huella = huella_extraccion(ruta_pdf, patrones.VERSION_PATRONES, **opciones)
+        if isinstance(ruta_pdf, DocumentoArchivado):
+            ruta_pdf.close()
+        estado = 'completo' if forzar else comparar_huella(previo, huella)
+        conteo[estado] += 1
+        if estado == 'sin_cambios':
+            continue
+        
+        row = {clave: previo.get(clave, '') for clave in
+               ('url', 'nombre', 'primer_apellido', 'segundo_apellido')}
+        resultados.append(procesar_declaracion(row, usar_ocr=usar_ocr,
+                                               forzar_extraccion=forzar, **opciones))
+    ALMACEN.confirmar()
+    
+    transcurrido = time.perf_counter() - inicio
+    print(f"\n✓ Reproceso en {transcurrido:.2f}s: {conteo['sin_cambios']} sin cambios, "
+          f"{conteo['campos']} solo campos, {conteo['completo']} desde el PDF")
+    if sin_pdf:
+        print(f"⚠ {sin_pdf} declaraciones sin PDF local (hay que descargarlas)")
+    
+    return a_dataframe(resultados)
 
 
 def leer_excel(ruta_excel: str, skiprows: int = 5) -> pl.DataFrame:
@@ -359,15 +476,20 @@ def leer_excel(ruta_excel: str, skiprows: int = 5) -> pl.DataFrame:
 
 def procesar_todas_declaraciones(df, 
                                  columna_url: str,
-                                 limite: Optional[int] = None):
+                                 limite: Optional[int] = None,
+                                 extraccion_dirigida: bool = False,
+                                 reanudar: bool = False,
+                                 reintentar_fallidos: bool = False):
     """
-    Procesa todas las declaraciones del DataFrame.
-    Funciona tanto con Polars como con Pandas.
+    Procesa todas las declaraciones del DataFrame (Polars, o Pandas si
+    leer_excel no pudo convertirlo). Retorna siempre un DataFrame de Polars
+    con el esquema de esquema.esquema_resultados().
+    
+    Cada cambio de estado queda en el manifiesto de la corrida (manifiesto.py)
+    y cada resultado se escribe por lotes en Parquet (sumidero.py), así que
+    la memoria no crece con la corrida. Con `reanudar`, las declaraciones
+    que ya terminaron en la corrida anterior se saltan.
     """
-    resultados = []
-    
-    # Detectar si es Polars o Pandas
-    es_polars = isinstance(df, pl.DataFrame)
     
     # Obtener columnas
     columnas = df.columns
@@ -379,7 +501,7 @@ def procesar_todas_declaraciones(df,
         print(f"\n✗ No se encontró columna de URL. Columnas disponibles:")
         for col in columnas:
             print(f"  - {col}")
-        return pl.DataFrame() if es_polars else None
+        return a_dataframe([])
     
     # Usar la primera columna que contenga URLs
     columna_url_real = columnas_posibles[0] if columna_url not in columnas else columna_url
@@ -395,10 +517,7 @@ def procesar_todas_declaraciones(df,
     print(f"✓ Columna segundo apellido: {col_apellido2}")
     
     # Convertir a diccionarios para iterar
-    if es_polars:
-        registros = df.to_dicts()
-    else:
-        registros = df.to_dict('records')
+    registros = df.to_dicts() if isinstance(df, pl.DataFrame) else df.to_dict('records')
     
     if limite:
         registros = registros[:limite]
@@ -406,157 +525,144 @@ def procesar_todas_declaraciones(df,
     
     total = len(registros)
     
+    # Preparar datos de cada row con nombres genéricos
+    pendientes = []
     for idx, row in enumerate(registros, 1):
         url = row.get(columna_url_real)
+        if not (url and isinstance(url, str) and url.startswith('http')):
+            print(f"\n[{idx}/{total}] ✗ URL no válida, saltando...")
+            continue
         
-        # Preparar datos del row con nombres genéricos
         row_procesado = {
             'url': url,
             'nombre': row.get(col_nombre, '') if col_nombre else '',
             'primer_apellido': row.get(col_apellido1, '') if col_apellido1 else '',
             'segundo_apellido': row.get(col_apellido2, '') if col_apellido2 else '',
         }
+        codigo = generar_codigo_declaracion(row_procesado['nombre'], row_procesado['primer_apellido'],
+                                            row_procesado['segundo_apellido'], url)
+        pendientes.append((idx, codigo, row_procesado))
+    
+    if not reanudar:
+        archivar_corrida()
+    manifiesto = abrir_manifiesto(reanudar)
+    manifiesto.encolar(codigo for _, codigo, _ in pendientes)
+    sumidero = SumideroParquet()
+    
+    try:
+        if reanudar:
+            # Terminadas cuyo lote no alcanzó a escribirse: su resultado se relee del manifiesto
+            escritos = sumidero.codigos_escritos()
+            for resultado in manifiesto.resultados_guardados(
+                    codigo for _, codigo, _ in pendientes
+                    if codigo not in escritos and manifiesto.completado(codigo, reintentar_fallidos)):
+                sumidero.agregar(resultado)
         
-        if url and isinstance(url, str) and url.startswith('http'):
+        for posicion, (idx, codigo, row_procesado) in enumerate(pendientes, 1):
+            if manifiesto.completado(codigo, reintentar_fallidos):
+                continue
+            
             print(f"\n[{idx}/{total}]")
+            pdf_local = pdf_disponible(codigo, DIRECTORIO_PDFS)
             
-            resultado = procesar_declaracion(row_procesado)
-            resultados.append(resultado)
+            resultado = procesar_declaracion(row_procesado, extraccion_dirigida,
+                                             manifiesto=manifiesto)
+            # Los metadatos se confirman antes de que el manifiesto la dé por terminada
+            ALMACEN.confirmar()
+            manifiesto.terminar(resultado)
+            sumidero.agregar(resultado)
             
-            # Pausa entre peticiones
-            if idx < total:
+            # Pausa entre peticiones (solo si hubo descarga)
+            if posicion < len(pendientes) and not pdf_local:
                 time.sleep(2)
-        else:
-            print(f"\n[{idx}/{total}] ✗ URL no válida, saltando...")
-    
-    # Si no hay resultados, retornar DataFrame vacío con estructura
-    if not resultados:
+    finally:
+        sumidero.cerrar()
+        ALMACEN.confirmar()
+        manifiesto.cerrar()
+    
+    # Resultados de la corrida con su esquema (montos también en centavos)
+    df_resultados = leer_resultados_corrida()
+    if df_resultados.is_empty():
         print("\n⚠ No se procesaron registros")
-        estructura_vacia = {
-            'codigo_declaracion': [],
-            'url': [],
-            'nombre': [],
-            'primer_apellido': [],
-            'segundo_apellido': [],
-            'ingreso_anual_neto': [],
-            'pdf_descargado': [],
-            'datos_extraidos': [],
-            'ruta_pdf': [],
-            'error': [],
-        }
-        return pl.DataFrame(estructura_vacia) if es_polars else None
-    
-    # Retornar en el formato apropiado
-    if es_polars:
-        return pl.DataFrame(resultados)
-    else:
-        import pandas as pd
-        return pd.DataFrame(resultados)
+    return df_resultados
 
 
-def guardar_resultados(df_resultados):
+def guardar_resultados(df_resultados: pl.DataFrame, formatos=FORMATOS_DEFAULT):
     """
-    Guarda los resultados en múltiples formatos.
-    Funciona con Polars o Pandas.
+    Guarda los resultados en los formatos pedidos ('csv', 'dataset', 'xlsx').
+    El XLSX se escribe en segundo plano: esperar_exportaciones() espera a
+    que termine.
     """
-    if df_resultados is None or len(df_resultados) == 0:
+    if df_resultados is None or df_resultados.is_empty():
         print("\n⚠ No hay resultados para guardar")
         return
     
+    formatos = validar_formatos(formatos)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    es_polars = isinstance(df_resultados, pl.DataFrame)
+    print()
     
-    # CSV (compatible con ambos)
-    ruta_csv = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.csv"
-    if es_polars:
-        df_resultados.write_csv(ruta_csv)
-    else:
-        df_resultados.to_csv(ruta_csv, index=False)
-    print(f"\n✓ Resultados guardados: {ruta_csv}")
-    
-    # Parquet (más eficiente para grandes volúmenes)
-    try:
-        ruta_parquet = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.parquet"
-        if es_polars:
-            df_resultados.write_parquet(ruta_parquet)
-        else:
-            df_resultados.to_parquet(ruta_parquet, index=False)
-        print(f"✓ Resultados guardados: {ruta_parquet}")
-    except Exception as e:
-        print(f"⚠ No se pudo guardar Parquet: {e}")
-    
-    # Excel
-    try:
+    # Excel primero: corre en otro hilo mientras se escribe lo demás
+    if 'xlsx' in formatos:
         ruta_excel = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.xlsx"
-        if es_polars:
-            df_resultados.write_excel(ruta_excel)
-        else:
-            df_resultados.to_excel(ruta_excel, index=False)
-        print(f"✓ Resultados guardados: {ruta_excel}")
-    except Exception as e:
-        print(f"⚠ No se pudo guardar Excel: {e}")
+        exportar_xlsx_en_segundo_plano(df_resultados, ruta_excel)
+        print(f"→ Excel en segundo plano: {ruta_excel}")
+    
+    if 'csv' in formatos:
+        try:
+            ruta_csv = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.csv"
+            df_resultados.write_csv(ruta_csv)
+            print(f"✓ Resultados guardados: {ruta_csv}")
+        except Exception as e:
+            print(f"✗ No se pudo guardar CSV: {e}")
+    
+    # Dataset particionado (institución/año): upsert por codigo_declaracion
+    if 'dataset' in formatos:
+        try:
+            conteo = upsert_resultados(df_resultados, DIRECTORIO_DATASET)
+            print(f"✓ Dataset actualizado: {DIRECTORIO_DATASET} "
+                  f"({conteo['filas']} declaraciones, {conteo['archivos_retirados']} archivos reemplazados)")
+        except Exception as e:
+            print(f"✗ No se pudo actualizar el dataset: {e}")
 
 
-def mostrar_estadisticas(df_resultados):
+def mostrar_estadisticas(df_resultados: Optional[pl.DataFrame] = None):
     """
-    Muestra estadísticas de los resultados.
-    Funciona con Polars o Pandas.
+    Muestra estadísticas de los resultados (esquema de esquema_resultados).
+    Sin argumento, de todo el dataset consolidado (mapeado en memoria).
     """
+    if df_resultados is None:
+        df_resultados = cargar_consolidado(DIRECTORIO_DATASET)
+    
     print("\n" + "="*60)
     print("ESTADÍSTICAS GENERALES")
     print("="*60)
     
     # Verificar que el DataFrame no esté vacío
-    if df_resultados is None or len(df_resultados) == 0:
+    if df_resultados.is_empty():
         print("⚠ No hay resultados para mostrar estadísticas")
         return
     
-    es_polars = isinstance(df_resultados, pl.DataFrame)
-    
-    # Verificar que las columnas existan
-    columnas_requeridas = ['datos_extraidos', 'pdf_descargado', 'ingreso_anual_neto']
-    columnas_disponibles = df_resultados.columns if es_polars else df_resultados.columns.tolist()
-    columnas_faltantes = [col for col in columnas_requeridas if col not in columnas_disponibles]
-    
-    if columnas_faltantes:
-        print(f"⚠ Columnas faltantes: {columnas_faltantes}")
-        print(f"Columnas disponibles: {columnas_disponibles}")
-        return
-    
-    total = len(df_resultados)
-    
-    if es_polars:
-        exitosos = df_resultados.filter(pl.col('datos_extraidos') == True).height
-        pdfs_descargados = df_resultados.filter(pl.col('pdf_descargado') == True).height
-        con_ingreso = df_resultados.filter(pl.col('ingreso_anual_neto').is_not_null()).height
-    else:
-        exitosos = (df_resultados['datos_extraidos'] == True).sum()
-        pdfs_descargados = (df_resultados['pdf_descargado'] == True).sum()
-        con_ingreso = df_resultados['ingreso_anual_neto'].notna().sum()
-    
-    print(f"Total de registros procesados: {total}")
-    print(f"PDFs descargados exitosamente: {pdfs_descargados}")
-    print(f"Datos extraídos exitosamente: {exitosos}")
-    print(f"Ingresos encontrados: {con_ingreso}")
-    
-    if con_ingreso > 0:
-        if es_polars:
-            ingresos = df_resultados.filter(pl.col('ingreso_anual_neto').is_not_null())
-            promedio = ingresos['ingreso_anual_neto'].mean()
-            mediana = ingresos['ingreso_anual_neto'].median()
-            minimo = ingresos['ingreso_anual_neto'].min()
-            maximo = ingresos['ingreso_anual_neto'].max()
-        else:
-            ingresos = df_resultados[df_resultados['ingreso_anual_neto'].notna()]
-            promedio = ingresos['ingreso_anual_neto'].mean()
-            mediana = ingresos['ingreso_anual_neto'].median()
-            minimo = ingresos['ingreso_anual_neto'].min()
-            maximo = ingresos['ingreso_anual_neto'].max()
+    conteo = df_resultados.select(
+        pl.len().alias('total'),
+        pl.col('pdf_descargado').sum().alias('pdfs_descargados'),
+        pl.col('datos_extraidos').sum().alias('exitosos'),
+        pl.col('ingreso_anual_neto').is_not_null().sum().alias('con_ingreso'),
+    ).row(0, named=True)
+    
+    print(f"Total de registros procesados: {conteo['total']}")
+    print(f"PDFs descargados exitosamente: {conteo['pdfs_descargados']}")
+    print(f"Datos extraídos exitosamente: {conteo['exitosos']}")
+    print(f"Ingresos encontrados: {conteo['con_ingreso']}")
+    
+    if conteo['con_ingreso'] > 0:
+        # Estadísticas exactas en centavos enteros
+        stats = estadisticas_centavos(df_resultados['ingreso_anual_neto_centavos'])
         
-        print(f"\nPromedio de ingresos: ${promedio:,.2f}")
-        print(f"Mediana de ingresos: ${mediana:,.2f}")
-        print(f"Ingreso mínimo: ${minimo:,.2f}")
-        print(f"Ingreso máximo: ${maximo:,.2f}")
+        print(f"\nPromedio de ingresos: {formatear_centavos(stats['promedio'])}")
+        print(f"Mediana de ingresos: {formatear_centavos(stats['mediana'])}")
+        print(f"Ingreso mínimo: {formatear_centavos(stats['minimo'])}")
+        print(f"Ingreso máximo: {formatear_centavos(stats['maximo'])}")
+        print(f"Suma de ingresos: {formatear_centavos(stats['total'])}")
     
     print("\n" + "="*60)
 
@@ -564,7 +670,9 @@ def mostrar_estadisticas(df_resultados):
 # Función principal
 def main(ruta_excel: str, 
          columna_url: str = 'Hipervínculo a La Versión Pública de La Declaración de Situación Patrimonial, O a La Versión Pública de Los Sistemas Habilitados Que Registren Y Resguarden en Las Bases de Datos Correspondientes',
-         limite: Optional[int] = None):
+         limite: Optional[int] = None,
+         reanudar: bool = False,
+         formatos=FORMATOS_DEFAULT):
     """
     Función principal para ejecutar el scraping.
     
@@ -572,6 +680,8 @@ def main(ruta_excel: str,
         ruta_excel: Ruta al archivo Excel con las URLs
         columna_url: Nombre de la columna con las URLs
         limite: Número máximo de registros a procesar (None para todos)
+        reanudar: Si True, continúa la corrida anterior desde su manifiesto
+        formatos: Formatos de salida ('csv', 'dataset', 'xlsx')
     """
     print("\n" + "="*60)
     print("INICIANDO WEB SCRAPING DE DECLARACIONES PATRIMONIALES")
@@ -585,18 +695,28 @@ def main(ruta_excel: str,
     print(df.head(3))
     
     # Procesar declaraciones
-    df_resultados = procesar_todas_declaraciones(df, columna_url, limite)
+    df_resultados = procesar_todas_declaraciones(df, columna_url, limite, reanudar=reanudar)
     
     # Guardar resultados
-    guardar_resultados(df_resultados)
+    guardar_resultados(df_resultados, formatos)
+    
+    # Tablas por sección de las declaraciones de esta corrida
+    if df_resultados is not None and 'codigo_declaracion' in df_resultados.columns:
+        construir_tablas(df_resultados['codigo_declaracion'].drop_nulls().to_list())
     
     # Mostrar estadísticas
     mostrar_estadisticas(df_resultados)
     
+    # El Excel pudo seguir escribiéndose mientras tanto
+    if not esperar_exportaciones():
+        print("⚠ Alguna exportación falló (ver arriba)")
+    
     print("\n✓ Proceso completado")
     print(f"  - PDFs guardados en: {DIRECTORIO_PDFS}")
-    print(f"  - Metadatos guardados en: {DIRECTORIO_METADATOS}")
+    print(f"  - Metadatos guardados en: {RUTA_ALMACEN} (JSON: python almacen.py exportar)")
     print(f"  - Resultados guardados en: {DIRECTORIO_RESULTADOS}")
+    print(f"  - Dataset particionado en: {DIRECTORIO_DATASET}")
+    print(f"  - Tablas por sección en: {DIRECTORIO_TABLAS}")
 
 
 def inspeccionar_url(url: str):
@@ -719,15 +839,23 @@ def inspeccionar_url(url: str):
 
 
 if __name__ == "__main__":
-    # PASO 1: Primero inspeccionar el archivo para ver su estructura
-    print("PASO 1: Inspeccionando el archivo Excel...")
-    df_inspeccion = inspeccionar_excel('INFORMACION_49_708785.xls', skiprows=5)
-    
-    print("\n" + "="*60)
-    input("Presiona ENTER para continuar con el scraping de prueba (5 registros)...")
+    # python cide.py --reanudar continúa una corrida interrumpida
+    reanudar = '--reanudar' in sys.argv
+    # python cide.py --formatos csv,dataset elige las salidas (default: csv, dataset y xlsx)
+    formatos = FORMATOS_DEFAULT
+    if '--formatos' in sys.argv and sys.argv.index('--formatos') + 1 < len(sys.argv):
+        formatos = validar_formatos(sys.argv[sys.argv.index('--formatos') + 1].split(','))
+    
+    if not reanudar:
+        # PASO 1: Primero inspeccionar el archivo para ver su estructura
+        print("PASO 1: Inspeccionando el archivo Excel...")
+        df_inspeccion = inspeccionar_excel('INFORMACION_49_708785.xls', skiprows=5)
+        
+        print("\n" + "="*60)
+        input("Presiona ENTER para continuar con el scraping de prueba (5 registros)...")
     
     # PASO 2: Ejecutar el scraping con los primeros 5 registros
-    main('INFORMACION_49_708785.xls', limite=5)
+    main('INFORMACION_49_708785.xls', limite=5, reanudar=reanudar, formatos=formatos)
     
     # Para procesar todos los registros después de verificar que funciona:
     # main('INFORMACION_49_708785.xls')
\ No newline at end of file
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compactación de los resultados históricos de DIRECTORIO_RESULTADOS.
+
+Cada corrida deja un resultados_{fecha}.csv (y .parquet/.xlsx). Este módulo
+los lee de forma perezosa, los lleva al esquema actual, se queda con una
+fila por codigo_declaracion y escribe todo en un solo Parquet
+(compactado_resultados.parquet) con sink_parquet, sin cargar el historial
+completo en memoria. El compactado anterior también se lee, así que se
+puede compactar otra vez después de podar.
+
+Criterios para elegir la fila de cada declaración:
+- 'completo': la que tiene más campos extraídos; a igualdad, la más reciente.
+- 'reciente': la más reciente (timestamp_procesamiento o fecha del archivo).
+
+Uso desde la terminal:
+    python compactacion.py [--criterio completo|reciente] [--podar]
+"""
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import polars as pl
+
+import patrones
+from esquema import alinear
+
+DIRECTORIO_RESULTADOS = Path("resultados")
+NOMBRE_COMPACTADO = "compactado_resultados.parquet"
+CRITERIOS = ('completo', 'reciente')
+
+_REGEX_SNAPSHOT = re.compile(r'^resultados_(\d{8}_\d{6})\.(csv|parquet)$')
+
+
+def snapshots(directorio: Path = DIRECTORIO_RESULTADOS) -> Dict[str, Path]:
+    """
+    Archivo de cada corrida ({fecha: ruta}). Si una corrida tiene CSV y
+    Parquet se usa el Parquet (mismos datos, tipos ya resueltos).
+    """
+    encontrados: Dict[str, Path] = {}
+    for ruta in sorted(Path(directorio).glob("resultados_*")):
+        coincidencia = _REGEX_SNAPSHOT.match(ruta.name)
+        if not coincidencia:
+            continue
+        fecha, extension = coincidencia.groups()
+        if extension == 'parquet' or fecha not in encontrados:
+            encontrados[fecha] = ruta
+    return encontrados
+
+
+def _escanear(ruta: Path) -> pl.LazyFrame:
+    if ruta.suffix == '.csv':
+        # Todo como texto: los tipos se resuelven al alinear con el esquema
+        return pl.scan_csv(ruta, infer_schema=False)
+    return pl.scan_parquet(ruta)
+
+
+def _alinear(lf: pl.LazyFrame, momento: str) -> pl.LazyFrame:
+    """Archivo en el esquema actual, con su completitud y su momento."""
+    campos = [pl.col(patrones.clave_valor(campo)).is_not_null().cast(pl.Int32) for campo in patrones.REGISTRO]
+    return alinear(lf).with_columns(
+        pl.sum_horizontal(campos).alias('_completitud'),
+        pl.coalesce(pl.col('timestamp_procesamiento'), pl.lit(momento)).alias('_momento'))
+
+
+def compactar(directorio: Path = DIRECTORIO_RESULTADOS, criterio: str = 'completo',
+              podar: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Compacta los snapshots de `directorio` en {directorio}/compactado_resultados.parquet.
+    Con `podar`, borra los snapshots compactados (csv, parquet y xlsx).
+    Retorna cuántos archivos se leyeron y cuántas declaraciones quedaron.
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f"Criterio desconocido: {criterio} (opciones: {', '.join(CRITERIOS)})")
+    directorio = Path(directorio)
+    ruta_compactado = directorio / NOMBRE_COMPACTADO
+    encontrados = snapshots(directorio)
+
+    fuentes: List[pl.LazyFrame] = []
+    if ruta_compactado.exists():
+        fuentes.append(_alinear(pl.scan_parquet(ruta_compactado), ''))
+    for fecha, ruta in encontrados.items():
+        # La fecha del archivo (20250101_120000) ordena igual que un ISO
+        momento = f"{fecha[:4]}-{fecha[4:6]}-{fecha[6:8]}T{fecha[9:11]}:{fecha[11:13]}:{fecha[13:15]}"
+        fuentes.append(_alinear(_escanear(ruta), momento))
+    if not fuentes:
+        return None
+
+    orden = ['_completitud', '_momento'] if criterio == 'completo' else ['_momento', '_completitud']
+    # Ordenar por código y criterio y quedarse con la última fila de cada
+    # código corre en streaming; un group_by con agg(pl.all()...) juntaría
+    # en memoria todas las columnas de cada grupo
+    compactado = (pl.concat(fuentes, how='diagonal_relaxed')
+                  .filter(pl.col('codigo_declaracion').is_not_null())
+                  .sort(['codigo_declaracion', *orden], maintain_order=True)
+                  .unique(subset='codigo_declaracion', keep='last', maintain_order=True)
+                  .drop('_completitud', '_momento'))
+
+    temporal = ruta_compactado.with_name(ruta_compactado.name + '.tmp')
+    compactado.sink_parquet(temporal)
+    os.replace(temporal, ruta_compactado)
+
+    if podar:
+        for fecha in encontrados:
+            for extension in ('csv', 'parquet', 'xlsx'):
+                (directorio / f"resultados_{fecha}.{extension}").unlink(missing_ok=True)
+
+    declaraciones = pl.scan_parquet(ruta_compactado).select(pl.len()).collect().item()
+    return {'archivos': len(encontrados), 'declaraciones': declaraciones}
+
+
+if __name__ == "__main__":
+    criterio = 'completo'
+    if '--criterio' in sys.argv:
+        indice = sys.argv.index('--criterio') + 1
+        criterio = sys.argv[indice] if indice < len(sys.argv) else ''
+    if criterio not in CRITERIOS:
+        print(f"Uso: python compactacion.py [--criterio {{{'|'.join(CRITERIOS)}}}] [--podar]")
+        sys.exit(1)
+
+    podar = '--podar' in sys.argv
+    conteo = compactar(criterio=criterio, podar=podar)
+    if conteo is None:
+        print(f"⚠ No hay resultados que compactar en {DIRECTORIO_RESULTADOS}/")
+    else:
+        print(f"✓ {conteo['archivos']} snapshots compactados en "
+              f"{DIRECTORIO_RESULTADOS / NOMBRE_COMPACTADO}: {conteo['declaraciones']} declaraciones")
+        if podar:
+            print("✓ Snapshots compactados eliminados")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dataset de resultados particionado por institución y año de la declaración.
+
+Estructura (particiones estilo Hive):
+
+    dataset_resultados/
+        _manifiesto.json                      archivos vivos y su partición
+        _indice.parquet                       codigo_declaracion -> archivo
+        institucion=CENTRO_DE_.../anio=2024/parte-<id>.parquet
+
+Los archivos no se modifican: upsert_resultados() escribe archivos nuevos
+con las filas que llegan y, si alguna declaración ya estaba en otro
+archivo, reescribe ese archivo sin ella. El cambio se publica al reemplazar
+el manifiesto (escritura atómica) y solo después se borran los archivos
+retirados, así que un lector siempre ve una versión completa.
+
+escanear_resultados() lee solo los archivos de las particiones pedidas.
+
+Además se mantiene _consolidado.arrow: todas las filas vivas en Arrow IPC
+sin compresión. cargar_consolidado() lo mapea en memoria (sin copiar los
+datos), así que abrir el dataset completo en una sesión interactiva es
+prácticamente instantáneo.
+"""
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import polars as pl
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from esquema import alinear, esquema_resultados
+from normalizacion import sombra_de
+
+DIRECTORIO_DATASET = Path("dataset_resultados")
+NOMBRE_MANIFIESTO = "_manifiesto.json"
+NOMBRE_INDICE = "_indice.parquet"
+NOMBRE_CONSOLIDADO = "_consolidado.arrow"
+
+# Valor de partición cuando falta el dato
+SIN_DATO = "SIN_DATO"
+
+
+def clave_institucion(institucion: Optional[str]) -> str:
+    """Nombre de directorio de la partición de una institución."""
+    if not institucion or not str(institucion).strip():
+        return SIN_DATO
+    clave = re.sub(r'[^A-Z0-9]+', '_', sombra_de(str(institucion).upper())).strip('_')
+    return clave[:80] or SIN_DATO
+
+
+def agregar_particion(df: pl.DataFrame) -> pl.DataFrame:
+    """Columnas de partición `_institucion` y `_anio` (de fecha_recepcion) de cada fila."""
+    return df.with_columns(
+        pl.Series('_institucion', [clave_institucion(i) for i in df['institucion'].to_list()], pl.String),
+        pl.col('fecha_recepcion').dt.year().cast(pl.Int32).fill_null(0).alias('_anio'),
+    )
+
+
+def leer_manifiesto(directorio: Path = DIRECTORIO_DATASET) -> Dict[str, Any]:
+    """Manifiesto del dataset (vacío si aún no existe)."""
+    ruta = Path(directorio) / NOMBRE_MANIFIESTO
+    if not ruta.exists():
+        return {'version': 0, 'actualizado': None, 'archivos': {}}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _escribir_atomico(ruta: Path, escribir):
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+
+def _guardar_manifiesto(manifiesto: Dict[str, Any], directorio: Path):
+    def escribir(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    _escribir_atomico(directorio / NOMBRE_MANIFIESTO, escribir)
+
+
+def _leer_indice(directorio: Path) -> pl.DataFrame:
+    ruta = directorio / NOMBRE_INDICE
+    if not ruta.exists():
+        return pl.DataFrame(schema={'codigo_declaracion': pl.String, 'archivo': pl.String})
+    return pl.read_parquet(ruta)
+
+
+def _escribir_parte(df: pl.DataFrame, institucion: str, anio: int,
+                    directorio: Path) -> Dict[str, Any]:
+    """Escribe un archivo nuevo de una partición y retorna su entrada del manifiesto."""
+    relativo = Path(f"institucion={institucion}") / f"anio={anio}" / f"parte-{uuid.uuid4().hex[:16]}.parquet"
+    ruta = directorio / relativo
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    _escribir_atomico(ruta, df.drop('_institucion', '_anio').write_parquet)
+    return {'archivo': relativo.as_posix(), 'institucion': institucion, 'anio': anio, 'filas': df.height}
+
+
+def upsert_resultados(df, directorio: Path = DIRECTORIO_DATASET) -> Dict[str, int]:
+    """
+    Inserta o reemplaza (por codigo_declaracion) filas de resultados.
+    Acepta Polars o Pandas. Retorna cuántas filas se escribieron y cuántos
+    archivos se retiraron.
+    """
+    if not isinstance(df, pl.DataFrame):
+        df = pl.from_pandas(df)
+    # Mismos tipos en todos los archivos (fecha_recepcion como Date, etc.)
+    df = alinear(df.lazy()).collect()
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    # La última fila de cada código es la que vale
+    nuevas = agregar_particion(df.unique(subset='codigo_declaracion', keep='last', maintain_order=True))
+    codigos = nuevas['codigo_declaracion']
+
+    manifiesto = leer_manifiesto(directorio)
+    archivos = manifiesto['archivos']
+    indice = _leer_indice(directorio)
+    afectados = indice.filter(pl.col('codigo_declaracion').is_in(codigos.implode()))['archivo'].unique().to_list()
+
+    entradas: List[Dict[str, Any]] = []
+
+    # Archivos con versiones anteriores: se reescriben sin esas declaraciones
+    for archivo in afectados:
+        previo = archivos.pop(archivo)
+        restantes = (pl.read_parquet(directorio / archivo)
+                     .filter(~pl.col('codigo_declaracion').is_in(codigos.implode())))
+        if restantes.height:
+            restantes = restantes.with_columns(pl.lit(previo['institucion']).alias('_institucion'),
+                                               pl.lit(previo['anio'], pl.Int32).alias('_anio'))
+            entradas.append(_escribir_parte(restantes, previo['institucion'], previo['anio'], directorio))
+
+    for (institucion, anio), grupo in nuevas.group_by('_institucion', '_anio', maintain_order=True):
+        entradas.append(_escribir_parte(grupo, institucion, anio, directorio))
+
+    # Índice nuevo: se quitan los archivos retirados y se agregan los escritos
+    partes_indice = [indice.filter(~pl.col('archivo').is_in(afectados))]
+    for entrada in entradas:
+        archivo = entrada.pop('archivo')
+        archivos[archivo] = entrada
+        partes_indice.append(pl.read_parquet(directorio / archivo, columns=['codigo_declaracion'])
+                             .with_columns(pl.lit(archivo).alias('archivo')))
+    indice = pl.concat(partes_indice)
+
+    manifiesto['version'] += 1
+    manifiesto['actualizado'] = datetime.now().isoformat()
+    _escribir_atomico(directorio / NOMBRE_INDICE, indice.write_parquet)
+    _guardar_manifiesto(manifiesto, directorio)
+
+    # Ya publicado el manifiesto, los archivos retirados sobran
+    for archivo in afectados:
+        (directorio / archivo).unlink(missing_ok=True)
+
+    actualizar_consolidado(directorio)
+
+    return {'filas': nuevas.height, 'archivos_retirados': len(afectados)}
+
+
+def archivos_vivos(instituciones: Optional[Iterable[str]] = None,
+                   anios: Optional[Iterable[int]] = None,
+                   directorio: Path = DIRECTORIO_DATASET) -> List[Path]:
+    """Archivos vivos del dataset, solo de las particiones pedidas."""
+    claves = {clave_institucion(i) for i in instituciones} if instituciones is not None else None
+    anios = set(anios) if anios is not None else None
+    return [Path(directorio) / archivo
+            for archivo, entrada in sorted(leer_manifiesto(directorio)['archivos'].items())
+            if (claves is None or entrada['institucion'] in claves)
+            and (anios is None or entrada['anio'] in anios)]
+
+
+def escanear_resultados(instituciones: Optional[Iterable[str]] = None,
+                        anios: Optional[Iterable[int]] = None,
+                        directorio: Path = DIRECTORIO_DATASET) -> pl.LazyFrame:
+    """
+    LazyFrame con los resultados vivos de las particiones pedidas (default:
+    todas), en el esquema actual. Las particiones que no se piden no se abren.
+    """
+    archivos = archivos_vivos(instituciones, anios, directorio)
+    if not archivos:
+        return pl.LazyFrame(schema=esquema_resultados())
+    # Cada archivo por separado: los escritos con otra versión de campos.toml
+    # pueden tener otras columnas
+    return pl.concat([alinear(pl.scan_parquet(archivo)) for archivo in archivos],
+                     how='diagonal_relaxed')
+
+
+def actualizar_consolidado(directorio: Path = DIRECTORIO_DATASET) -> Path:
+    """Reescribe _consolidado.arrow con todas las filas vivas (sin compresión, para mmap)."""
+    directorio = Path(directorio)
+    manifiesto = leer_manifiesto(directorio)
+    ruta = directorio / NOMBRE_CONSOLIDADO
+    _escribir_atomico(ruta, lambda temporal: escanear_resultados(directorio=directorio)
+                      .sink_ipc(temporal, compression='uncompressed'))
+    manifiesto['consolidado'] = manifiesto['version']
+    _guardar_manifiesto(manifiesto, directorio)
+    return ruta
+
+
+def cargar_consolidado(directorio: Path = DIRECTORIO_DATASET) -> pl.DataFrame:
+    """
+    Todas las filas vivas del dataset desde _consolidado.arrow, mapeado en
+    memoria. Si el snapshot no corresponde a la versión del manifiesto, se
+    regenera antes.
+    """
+    directorio = Path(directorio)
+    ruta = directorio / NOMBRE_CONSOLIDADO
+    manifiesto = leer_manifiesto(directorio)
+    if not ruta.exists() or manifiesto.get('consolidado') != manifiesto['version']:
+        if not manifiesto['archivos']:
+            return pl.DataFrame(schema=esquema_resultados())
+        actualizar_consolidado(directorio)
+    if pa is None:
+        # Sin pyarrow, Polars lee el archivo completo
+        return pl.read_ipc(ruta)
+    tabla = pa.ipc.open_file(pa.memory_map(str(ruta), 'r')).read_all()
+    return pl.from_arrow(tabla, rechunk=False)
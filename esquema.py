@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esquema y registro tipado de los resultados por declaración.
+
+ResultadoDeclaracion reemplaza al diccionario `resultado` que se armaba
+en procesar_declaracion: las columnas base son atributos (dataclass con
+slots) y los campos de campos.toml van en `campos`. a_dataframe() arma el
+DataFrame columna por columna con esquema_resultados(), así que los tipos
+se fijan una sola vez:
+
+- montos: {campo}_centavos Int64, tal como lo producen los extractores, y
+  {campo} Float64 en pesos, derivado de los centavos solo para mostrar
+- fechas: Date (de dd/mm/aaaa)
+- error: Categorical (pocos mensajes repetidos)
+- el resto: String
+
+alinear() lleva al mismo esquema un archivo escrito antes (CSV, Parquet
+con otros tipos o con columnas de otra versión de campos.toml). Los
+registros y archivos de cuando los extractores producían pesos se pasan a
+centavos al leerlos.
+"""
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, Optional, Union
+
+import polars as pl
+
+import patrones
+from montos import expr_centavos_a_pesos, expr_pesos_a_centavos, pesos_a_centavos
+
+FORMATOS_FECHA = ('%d/%m/%Y', '%Y-%m-%d')
+
+# Columnas de cada resultado, antes de los campos extraídos
+ESQUEMA_BASE = {
+    'codigo_declaracion': pl.String,
+    'url': pl.String,
+    'nombre': pl.String,
+    'primer_apellido': pl.String,
+    'segundo_apellido': pl.String,
+    'pdf_descargado': pl.Boolean,
+    'datos_extraidos': pl.Boolean,
+    'ruta_pdf': pl.String,
+    'error': pl.Categorical,
+    'digest_pdf': pl.String,
+    'version_texto': pl.Int64,
+    'version_patrones': pl.Int64,
+    'modo_texto': pl.String,
+    'tabla_ingresos': pl.Boolean,
+    'timestamp_procesamiento': pl.String,
+}
+
+DTYPES_CAMPO = {'monto': pl.Float64, 'fecha': pl.Date, 'texto': pl.String}
+
+
+def esquema_resultados() -> Dict[str, pl.DataType]:
+    """
+    Esquema de una fila de resultados: columnas base y un campo por cada
+    campo registrado en patrones (los montos en pesos y en centavos).
+    """
+    esquema = dict(ESQUEMA_BASE)
+    for campo, alternativas in patrones.REGISTRO.items():
+        esquema[campo] = DTYPES_CAMPO[alternativas[0].tipo]
+        if alternativas[0].tipo == 'monto':
+            esquema[f'{campo}_centavos'] = pl.Int64
+    return esquema
+
+
+@dataclass(slots=True)
+class ResultadoDeclaracion:
+    """Resultado del procesamiento de una declaración."""
+    codigo_declaracion: str
+    url: str = ''
+    nombre: str = ''
+    primer_apellido: str = ''
+    segundo_apellido: str = ''
+    pdf_descargado: bool = False
+    datos_extraidos: bool = False
+    ruta_pdf: Optional[str] = None
+    error: Optional[str] = None
+    digest_pdf: Optional[str] = None
+    version_texto: Optional[int] = None
+    version_patrones: Optional[int] = None
+    modo_texto: Optional[str] = None
+    tabla_ingresos: Optional[bool] = None
+    timestamp_procesamiento: Optional[str] = None
+    # Campos extraídos (campos.toml) y cualquier otra clave del registro
+    campos: Dict[str, Any] = field(default_factory=dict)
+
+    def actualizar(self, datos: Dict[str, Any]):
+        """
+        Copia las claves de `datos`: las base a su atributo, el resto a
+        `campos`. Un monto en pesos (registros anteriores) se guarda como
+        {campo}_centavos, salvo que `datos` ya traiga los centavos.
+        """
+        montos = patrones.campos_monto()
+        for clave, valor in datos.items():
+            if clave in _ATRIBUTOS:
+                setattr(self, clave, valor)
+            elif clave in montos:
+                if f'{clave}_centavos' not in datos:
+                    self.campos[f'{clave}_centavos'] = pesos_a_centavos(valor)
+            else:
+                self.campos[clave] = valor
+
+    def get(self, clave: str, default: Any = None) -> Any:
+        if clave in _ATRIBUTOS:
+            return getattr(self, clave)
+        return self.campos.get(clave, default)
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Registro plano (para el almacén y el manifiesto)."""
+        datos = {nombre: getattr(self, nombre) for nombre in _ATRIBUTOS}
+        datos.update(self.campos)
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> 'ResultadoDeclaracion':
+        resultado = cls(datos['codigo_declaracion'])
+        resultado.actualizar(datos)
+        return resultado
+
+
+_ATRIBUTOS = tuple(f.name for f in fields(ResultadoDeclaracion) if f.name != 'campos')
+
+
+def _expr_fecha(expr: pl.Expr) -> pl.Expr:
+    """Texto dd/mm/aaaa (o ISO, como lo escribe un CSV) -> Date."""
+    return pl.coalesce(*(expr.str.strip_chars().str.to_date(formato, strict=False)
+                         for formato in FORMATOS_FECHA))
+
+
+def a_dataframe(resultados: Iterable[Union[ResultadoDeclaracion, Dict[str, Any]]]) -> pl.DataFrame:
+    """Resultados -> DataFrame con esquema_resultados(), sin inferir tipos."""
+    registros = [r if isinstance(r, ResultadoDeclaracion) else ResultadoDeclaracion.desde_dict(r)
+                 for r in resultados]
+    esquema = esquema_resultados()
+    montos = [columna.removesuffix('_centavos') for columna in esquema if columna.endswith('_centavos')]
+    columnas = []
+    for columna, tipo in esquema.items():
+        if columna in montos:
+            continue
+        if columna in ESQUEMA_BASE:
+            valores = [getattr(r, columna) for r in registros]
+        else:
+            valores = [r.campos.get(columna) for r in registros]
+        if tipo == pl.Date:
+            serie = pl.Series(columna, [None if v is None else str(v) for v in valores], pl.String)
+            columnas.append(serie.to_frame().select(_expr_fecha(pl.col(columna)))[columna])
+        elif tipo == pl.Categorical:
+            columnas.append(pl.Series(columna, valores, pl.String).cast(pl.Categorical))
+        else:
+            columnas.append(pl.Series(columna, valores, tipo, strict=False))
+    df = pl.DataFrame(columnas)
+    return df.with_columns(
+        expr_centavos_a_pesos(pl.col(f'{campo}_centavos')).alias(campo) for campo in montos
+    ).select(list(esquema))
+
+
+def alinear(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Lleva un archivo de resultados al esquema actual. Las columnas que ya
+    no están en campos.toml se conservan como texto; los centavos que
+    falten (archivos anteriores) se calculan de los pesos, y los pesos
+    siempre se derivan de los centavos.
+    """
+    fuente = lf.collect_schema()
+    esquema = esquema_resultados()
+    columnas = []
+    for columna, tipo in esquema.items():
+        origen = fuente.get(columna)
+        if origen is None:
+            columnas.append(pl.lit(None, tipo).alias(columna))
+        elif origen == tipo:
+            columnas.append(pl.col(columna))
+        elif tipo == pl.Boolean and origen == pl.String:
+            columnas.append(pl.col(columna).str.to_lowercase()
+                            .replace_strict({'true': True, 'false': False}, default=None,
+                                            return_dtype=pl.Boolean).alias(columna))
+        elif tipo == pl.Date and origen == pl.String:
+            columnas.append(_expr_fecha(pl.col(columna)).alias(columna))
+        elif tipo == pl.Categorical:
+            columnas.append(pl.col(columna).cast(pl.String).cast(pl.Categorical))
+        else:
+            columnas.append(pl.col(columna).cast(tipo, strict=False))
+    columnas.extend(pl.col(columna).cast(pl.String) for columna in fuente if columna not in esquema)
+
+    montos = [columna.removesuffix('_centavos') for columna in esquema if columna.endswith('_centavos')]
+    return (lf.select(columnas)
+            .with_columns(pl.coalesce(pl.col(f'{campo}_centavos'), expr_pesos_a_centavos(pl.col(campo)))
+                          .alias(f'{campo}_centavos') for campo in montos)
+            .with_columns(expr_centavos_a_pesos(pl.col(f'{campo}_centavos')).alias(campo)
+                          for campo in montos))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportación de los resultados de una corrida.
+
+Los formatos se eligen por corrida (FORMATOS). El XLSX es el más lento:
+se escribe fila por fila con xlsxwriter en modo constant_memory (la
+memoria no depende del número de filas) en un hilo aparte, así que
+guardar_resultados() no lo espera. Los errores del hilo se reportan al
+terminar; esperar_exportaciones() bloquea hasta que acaben todos.
+"""
+import atexit
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import polars as pl
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# 'dataset' es el dataset particionado de dataset_resultados
+FORMATOS = ('csv', 'dataset', 'xlsx')
+FORMATOS_DEFAULT = ('csv', 'dataset', 'xlsx')
+
+# Filas que se materializan a la vez al escribir el XLSX
+FILAS_POR_BLOQUE = 5000
+
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exportacion")
+_pendientes: List[Tuple[Path, Future]] = []
+
+
+def validar_formatos(formatos: Iterable[str]) -> Tuple[str, ...]:
+    """Formatos pedidos, sin repetir; error si alguno no existe."""
+    formatos = tuple(dict.fromkeys(formatos))
+    desconocidos = [formato for formato in formatos if formato not in FORMATOS]
+    if desconocidos:
+        raise ValueError(f"Formato desconocido: {', '.join(desconocidos)} (opciones: {', '.join(FORMATOS)})")
+    return formatos
+
+
+def exportar_xlsx(df: pl.DataFrame, ruta: Path) -> int:
+    """
+    Escribe `df` en `ruta` con xlsxwriter (constant_memory). Se escribe a
+    un temporal y se renombra al final. Retorna cuántas filas se escribieron.
+    """
+    if xlsxwriter is None:
+        raise RuntimeError("xlsxwriter no está instalado (pip install xlsxwriter)")
+
+    ruta = Path(ruta)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    # NaN no es un número válido en XLSX
+    df = df.with_columns(pl.col(pl.Float32, pl.Float64).fill_nan(None))
+
+    libro = xlsxwriter.Workbook(str(temporal), {'constant_memory': True})
+    try:
+        hoja = libro.add_worksheet("resultados")
+        hoja.write_row(0, 0, df.columns)
+        fila = 1
+        for bloque in df.iter_slices(FILAS_POR_BLOQUE):
+            for valores in bloque.iter_rows():
+                hoja.write_row(fila, 0, valores)
+                fila += 1
+    finally:
+        libro.close()
+    os.replace(temporal, ruta)
+    return fila - 1
+
+
+def _reportar(ruta: Path, futuro: Future):
+    error = futuro.exception()
+    if error is None:
+        print(f"✓ Excel guardado: {ruta} ({futuro.result()} filas)")
+    else:
+        print(f"✗ No se pudo guardar Excel {ruta}: {error}")
+
+
+def exportar_xlsx_en_segundo_plano(df, ruta: Path) -> Future:
+    """Encola la escritura del XLSX (Polars o Pandas) y regresa de inmediato."""
+    if not isinstance(df, pl.DataFrame):
+        # Copia propia: el DataFrame de Pandas puede cambiar mientras el hilo escribe
+        df = pl.from_pandas(df)
+    futuro = _ejecutor.submit(exportar_xlsx, df, Path(ruta))
+    futuro.add_done_callback(lambda f: _reportar(Path(ruta), f))
+    _pendientes.append((Path(ruta), futuro))
+    return futuro
+
+
+def esperar_escrituras():
+    """
+    Bloquea hasta que el hilo termine lo encolado, sin consumir los
+    resultados (esos los reporta esperar_exportaciones()).
+    """
+    wait([futuro for _, futuro in _pendientes])
+
+
+def esperar_exportaciones() -> bool:
+    """Espera las exportaciones en curso. True si todas terminaron bien."""
+    exito = True
+    while _pendientes:
+        _, futuro = _pendientes.pop(0)
+        exito = futuro.exception() is None and exito
+    return exito
+
+
+# Al salir del intérprete se espera lo que falte (no se deja un XLSX a medias)
+atexit.register(esperar_exportaciones)
@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción de texto y tablas de los PDFs de DeclaraNet.
+
+El texto se obtiene página por página con iterar_paginas_pdf, liberando
+los objetos de pdfplumber de cada página al terminar con ella. Incluye un
+modo dirigido que extrae primero las páginas donde suelen estar los campos
+buscados y se detiene en cuanto todos aparecen.
+
+El texto de cada declaración se guarda en cache_extraccion/texto/ para
+poder re-extraer los campos de todo el archivo sin volver a abrir los PDFs
+(el del modo dirigido, que no tiene todas las páginas, en texto/parcial/).
+"""
+import re
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pdfplumber
+import polars as pl
+
+from montos import monto_a_centavos
+
+# Directorio para cachés de extracción
+DIRECTORIO_CACHE = Path("cache_extraccion")
+
+# Versión de la obtención del texto (extraer_texto_pdf, extraer_texto_dirigido,
+# OCR). Subirla cuando cambie el texto que producen: invalida el texto en
+# caché y los resultados guardados con la versión anterior.
+VERSION_EXTRACTOR_TEXTO = 2
+RUTA_MAPA_PAGINAS = DIRECTORIO_CACHE / "mapa_paginas.json"
+
+# Anclas que identifican en qué página está cada campo
+ANCLAS_CAMPOS = {
+    'ingreso_anual_neto': r'INGRESO ANUAL NETO DEL DECLARANTE|NUMERAL I Y II',
+    'remuneracion_cargo_publico': r'REMUNERACIÓN ANUAL NETA',
+    'otros_ingresos': r'II\.\s*OTROS INGRESOS',
+    'actividad_financiera': r'ACTIVIDAD FINANCIERA',
+    'servicios_profesionales': r'SERVICIOS PROFESIONALES',
+    'fecha_recepcion': r'FECHA DE RECEPCIÓN',
+    'cargo': r'EMPLEO, CARGO O COMISIÓN',
+    'institucion': r'NOMBRE DEL ENTE PÚBLICO',
+}
+
+# Páginas iniciales (base 0) si todavía no se ha aprendido nada.
+# En el formato de DeclaraNet los datos generales, el encargo y los
+# ingresos están en las primeras páginas; los bienes vienen después.
+PAGINAS_POR_DEFECTO = [0, 1, 2, 3]
+
+_REGEX_ANCLAS_CAMPOS = {campo: re.compile(ancla, re.IGNORECASE)
+                        for campo, ancla in ANCLAS_CAMPOS.items()}
+
+
+def iterar_paginas_pdf(ruta_pdf: Path,
+                       paginas: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Genera (número de página base 0, texto) para cada página del PDF.
+
+    Después de extraer cada página se vacían sus cachés de objetos, de modo
+    que la memoria no crece con el número de páginas.
+
+    Args:
+        ruta_pdf: Ruta al PDF
+        paginas: Orden de páginas a extraer (default: todas, en orden)
+    """
+    with pdfplumber.open(ruta_pdf) as pdf:
+        total = len(pdf.pages)
+        for num_pagina in (range(total) if paginas is None else paginas):
+            pagina = pdf.pages[num_pagina]
+            try:
+                texto = pagina.extract_text() or ""
+            finally:
+                # close() existe desde pdfplumber 0.10; antes solo flush_cache()
+                getattr(pagina, 'close', pagina.flush_cache)()
+            yield num_pagina, texto
+
+
+def contar_paginas_pdf(ruta_pdf: Path) -> int:
+    """Número de páginas del PDF."""
+    with pdfplumber.open(ruta_pdf) as pdf:
+        return len(pdf.pages)
+
+
+def validar_pdf(ruta_pdf) -> bool:
+    """Valida si un archivo (ruta o documento de archivo_pdfs) es realmente un PDF válido."""
+    try:
+        if hasattr(ruta_pdf, 'read'):
+            # Documento archivado: tamaño y encabezado sin salir del objeto
+            tamano = ruta_pdf.seek(0, os.SEEK_END)
+            ruta_pdf.seek(0)
+            header = ruta_pdf.read(4)
+            ruta_pdf.seek(0)
+        else:
+            # Verificar que existe
+            ruta_pdf = Path(ruta_pdf)
+            if not ruta_pdf.exists():
+                return False
+            tamano = ruta_pdf.stat().st_size
+            with open(ruta_pdf, 'rb') as f:
+                header = f.read(4)
+        
+        # Verificar tamaño mínimo (PDFs vacíos son sospechosos)
+        if tamano < 1024:  # Menos de 1KB
+            print(f"  ⚠ Archivo muy pequeño: {tamano} bytes")
+            return False
+        
+        # Verificar que comienza con %PDF
+        if not header.startswith(b'%PDF'):
+            print(f"  ✗ No tiene encabezado PDF válido: {header}")
+            return False
+        
+        # Intentar abrir con pdfplumber
+        with pdfplumber.open(ruta_pdf) as pdf:
+            paginas = len(pdf.pages)
+        if hasattr(ruta_pdf, 'read'):
+            ruta_pdf.seek(0)
+        if paginas == 0:
+            print(f"  ✗ PDF sin páginas")
+            return False
+        
+        return True
+        
+    except Exception as e:
+        print(f"  ✗ Error validando PDF: {type(e).__name__}: {e}")
+        return False
+
+
+def extraer_texto_pdf(ruta_pdf: Path) -> Optional[str]:
+    """Extrae todo el texto de un PDF, una página por línea de separación."""
+    try:
+        return "\n".join(texto for _, texto in iterar_paginas_pdf(ruta_pdf))
+    except Exception as e:
+        print(f"  ✗ Error extrayendo texto: {str(e)}")
+        return None
+
+
+def cargar_mapa_paginas(ruta: Path = RUTA_MAPA_PAGINAS) -> Dict[str, List[int]]:
+    """Carga el mapa campo -> páginas aprendido en ejecuciones anteriores."""
+    if not ruta.exists():
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  ⚠ No se pudo leer el mapa de páginas: {e}")
+        return {}
+
+
+def guardar_mapa_paginas(mapa: Dict[str, List[int]], ruta: Path = RUTA_MAPA_PAGINAS):
+    """Guarda el mapa campo -> páginas."""
+    ruta.parent.mkdir(exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(mapa, f, indent=2, ensure_ascii=False)
+
+
+def paginas_candidatas(campos: Iterable[str], mapa: Dict[str, List[int]],
+                       total_paginas: int) -> Tuple[List[int], List[int]]:
+    """
+    Ordena las páginas a extraer: primero las aprendidas (o configuradas)
+    para los campos pedidos y la siguiente de cada una, por si el valor
+    quedó en la página de después; luego el resto en orden.
+    """
+    prioritarias = set()
+    for campo in campos:
+        for pagina in mapa.get(campo) or PAGINAS_POR_DEFECTO:
+            prioritarias.update({pagina, pagina + 1})
+
+    prioritarias = sorted(p for p in prioritarias if 0 <= p < total_paginas)
+    resto = [p for p in range(total_paginas) if p not in prioritarias]
+    return prioritarias, resto
+
+
+def aprender_paginas(textos_paginas: Dict[int, str], campos: Iterable[str],
+                     mapa: Dict[str, List[int]]) -> bool:
+    """
+    Registra en el mapa las páginas donde aparece el ancla de cada campo.
+    Retorna True si el mapa cambió.
+    """
+    cambio = False
+    for campo in campos:
+        ancla = _REGEX_ANCLAS_CAMPOS.get(campo)
+        if ancla is None:
+            continue
+        for pagina, texto in textos_paginas.items():
+            if ancla.search(texto):
+                paginas = mapa.setdefault(campo, [])
+                if pagina not in paginas:
+                    paginas.append(pagina)
+                    paginas.sort()
+                    cambio = True
+    return cambio
+
+
+def _valor_extraido(datos: Dict[str, Any], campo: str) -> Any:
+    """Valor de un campo en la salida del extractor (los montos van como {campo}_centavos)."""
+    valor = datos.get(campo)
+    return valor if valor is not None else datos.get(f'{campo}_centavos')
+
+
+def extraer_texto_dirigido(ruta_pdf: Path,
+                           extractor: Callable[[str], Dict],
+                           campos: Optional[List[str]] = None,
+                           aprender: bool = True) -> Optional[str]:
+    """
+    Extrae solo las páginas necesarias para encontrar los campos pedidos.
+
+    Primero se leen las páginas prioritarias (las aprendidas, o las de
+    PAGINAS_POR_DEFECTO) y el extractor corre una sola vez sobre ellas. Los
+    campos que siguen sin valor se buscan por su ancla en el texto de cada
+    página nueva, y la lectura se detiene cuando apareció el ancla de todos
+    (más la página siguiente, por si el valor quedó ahí). Un campo solo se da
+    por ausente cuando se recorrió el documento sin encontrar su ancla.
+
+    Args:
+        ruta_pdf: Ruta al PDF
+        extractor: Función texto -> {campo: valor} (p. ej. los extractores de regex)
+        campos: Campos que deben encontrarse (default: todos los de ANCLAS_CAMPOS)
+        aprender: Si True, actualiza el mapa de páginas con lo encontrado
+
+    Retorna el texto de las páginas extraídas, en orden de página.
+    """
+    campos = list(campos or ANCLAS_CAMPOS)
+    mapa = cargar_mapa_paginas()
+
+    try:
+        total = contar_paginas_pdf(ruta_pdf)
+        prioritarias, resto = paginas_candidatas(campos, mapa, total)
+        textos_paginas = dict(iterar_paginas_pdf(ruta_pdf, prioritarias))
+
+        datos = extractor("\n".join(textos_paginas[p] for p in sorted(textos_paginas)))
+        # Las páginas aprendidas vienen de otros documentos: un campo que falta
+        # se busca por su ancla en el resto de este aunque el mapa lo ubique
+        pendientes = set()
+        # Páginas que siguen a un ancla encontrada: el valor puede estar ahí
+        siguientes = set()
+        for campo in campos:
+            if _valor_extraido(datos, campo) is not None or campo not in _REGEX_ANCLAS_CAMPOS:
+                continue
+            con_ancla = [p for p, texto in textos_paginas.items() if _REGEX_ANCLAS_CAMPOS[campo].search(texto)]
+            if not con_ancla:
+                pendientes.add(campo)
+            siguientes.update(p + 1 for p in con_ancla if p + 1 < total and p + 1 not in textos_paginas)
+
+        if pendientes or siguientes:
+            paginas = iterar_paginas_pdf(ruta_pdf, resto)
+            for num_pagina, texto_pagina in paginas:
+                textos_paginas[num_pagina] = texto_pagina
+                siguientes.discard(num_pagina)
+                for campo in [c for c in pendientes if _REGEX_ANCLAS_CAMPOS[c].search(texto_pagina)]:
+                    pendientes.discard(campo)
+                    if num_pagina + 1 < total and num_pagina + 1 not in textos_paginas:
+                        siguientes.add(num_pagina + 1)
+                if not pendientes and not siguientes:
+                    paginas.close()
+                    break
+
+        if pendientes:
+            print(f"  ⚠ Sin ancla en el documento: {', '.join(sorted(pendientes))}")
+        print(f"  ✓ Texto de {len(textos_paginas)}/{total} páginas")
+
+    except Exception as e:
+        print(f"  ✗ Error extrayendo texto: {str(e)}")
+        return None
+
+    if aprender and aprender_paginas(textos_paginas, campos, mapa):
+        guardar_mapa_paginas(mapa)
+
+    return "\n".join(textos_paginas[p] for p in sorted(textos_paginas))
+
+
+# %% Tabla de ingresos a partir de la geometría de las palabras
+
+DIRECTORIO_CACHE_TABLAS = DIRECTORIO_CACHE / "tablas_ingresos"
+
+# Una página pertenece a la sección de ingresos si contiene alguna de estas anclas
+ANCLA_PAGINA_INGRESOS = r'INGRESO ANUAL NETO|OTROS INGRESOS|REMUNERACIÓN ANUAL NETA'
+
+# Encabezados que cierran la sección de ingresos
+ANCLA_FIN_INGRESOS = r'^(¿|BIENES|VEH[IÍ]CULOS|BIENES MUEBLES|INVERSIONES|ADEUDOS|PRÉSTAMO|ACLARACIONES)'
+
+# Numerales de la tabla: I., II., II.1 ... II.5, A., B., C.
+PATRON_NUMERAL = re.compile(r'^(?:[IV]+(?:\.\d)?|[A-C])\.?$')
+PATRON_MONTO = re.compile(r'^\$?\d[\d,]*(?:\.\d+)?$')
+
+# Numeral de la tabla -> campo de resultados
+CAMPOS_POR_NUMERAL = {
+    'I': 'remuneracion_cargo_publico',
+    'II': 'otros_ingresos',
+    'II.2': 'actividad_financiera',
+    'II.3': 'servicios_profesionales',
+    'A': 'ingreso_anual_neto',
+}
+
+
+class FilaIngreso(NamedTuple):
+    """Un renglón de la tabla de ingresos (monto en centavos)."""
+    numeral: str
+    concepto: str
+    monto_centavos: Optional[int]
+    pagina: int
+
+
+def calcular_digest_pdf(ruta_pdf: Path) -> str:
+    """SHA-256 del contenido del PDF (identifica el documento, no el nombre)."""
+    # Un documento de archivo_pdfs ya trae su digest en el índice
+    if hasattr(ruta_pdf, 'digest_pdf'):
+        return ruta_pdf.digest_pdf
+    digest = hashlib.sha256()
+    with open(ruta_pdf, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def agrupar_renglones(palabras: List[Dict], tolerancia: float = 3) -> List[List[Dict]]:
+    """Agrupa las palabras de una página en renglones según su posición vertical."""
+    renglones: List[List[Dict]] = []
+    for palabra in sorted(palabras, key=lambda p: (p['top'], p['x0'])):
+        if renglones and abs(renglones[-1][0]['top'] - palabra['top']) <= tolerancia:
+            renglones[-1].append(palabra)
+        else:
+            renglones.append([palabra])
+    return [sorted(r, key=lambda p: p['x0']) for r in renglones]
+
+
+def _cerrar_fila(fila: Dict) -> FilaIngreso:
+    """Convierte una fila en construcción en FilaIngreso."""
+    monto = fila['monto']
+    return FilaIngreso(fila['numeral'], ' '.join(fila['concepto']),
+                       monto_a_centavos(monto) if monto else None,
+                       fila['pagina'])
+
+
+def _filas_de_renglones(renglones: List[List[Dict]], num_pagina: int,
+                        abierta: Optional[Dict]) -> Tuple[List[FilaIngreso], Optional[Dict], bool]:
+    """
+    Convierte renglones en filas. Un renglón que empieza con numeral abre una
+    fila nueva; los siguientes se suman a su concepto. El monto es la palabra
+    numérica más a la derecha de la fila.
+
+    Retorna (filas cerradas, fila abierta, fin de sección encontrado).
+    """
+    filas = []
+
+    for renglon in renglones:
+        texto_renglon = ' '.join(p['text'] for p in renglon)
+        if re.search(ANCLA_FIN_INGRESOS, texto_renglon, re.IGNORECASE):
+            if abierta is not None:
+                filas.append(_cerrar_fila(abierta))
+            return filas, None, True
+
+        palabras = renglon
+        primera = renglon[0]['text']
+        if PATRON_NUMERAL.match(primera):
+            if abierta is not None:
+                filas.append(_cerrar_fila(abierta))
+            abierta = {'numeral': primera.rstrip('.'), 'concepto': [], 'monto': None,
+                       'x_monto': -1, 'pagina': num_pagina}
+            palabras = renglon[1:]
+        elif abierta is None:
+            continue
+
+        for palabra in palabras:
+            if PATRON_MONTO.match(palabra['text']):
+                if palabra['x1'] > abierta['x_monto']:
+                    abierta['monto'], abierta['x_monto'] = palabra['text'], palabra['x1']
+            else:
+                abierta['concepto'].append(palabra['text'])
+
+    return filas, abierta, False
+
+
+def cargar_tabla_ingresos_cache(digest: str) -> Optional[List[FilaIngreso]]:
+    """Tabla de ingresos en caché del PDF con ese digest, o None si no está."""
+    ruta_cache = DIRECTORIO_CACHE_TABLAS / f"{digest}.json"
+    if not ruta_cache.exists():
+        return None
+    with open(ruta_cache, 'r', encoding='utf-8') as f:
+        guardadas = json.load(f)
+    # Las cachés anteriores guardaban el monto en pesos: se recalculan
+    if not all('monto_centavos' in fila for fila in guardadas):
+        return None
+    return [FilaIngreso(**fila) for fila in guardadas]
+
+
+def extraer_tabla_ingresos(ruta_pdf: Path, usar_cache: bool = True) -> Optional[List[FilaIngreso]]:
+    """
+    Extrae la tabla de ingresos como filas (numeral, concepto, monto, página).
+
+    Solo se leen las palabras de las páginas de ingresos: primero las
+    aprendidas en el mapa de páginas y, si no hay, desde el inicio hasta
+    que termina la sección. El resultado se guarda en caché por digest.
+    """
+    try:
+        digest = calcular_digest_pdf(ruta_pdf)
+        ruta_cache = DIRECTORIO_CACHE_TABLAS / f"{digest}.json"
+        guardadas = cargar_tabla_ingresos_cache(digest) if usar_cache else None
+        if guardadas is not None:
+            return guardadas
+
+        mapa = cargar_mapa_paginas()
+        aprendidas = sorted({p for campo in CAMPOS_POR_NUMERAL.values() for p in mapa.get(campo, [])})
+
+        filas: List[FilaIngreso] = []
+        with pdfplumber.open(ruta_pdf) as pdf:
+            total = len(pdf.pages)
+            inicio = aprendidas[0] if aprendidas and aprendidas[0] < total else 0
+
+            abierta = None
+            en_seccion = False
+            for num_pagina in range(inicio, total):
+                pagina = pdf.pages[num_pagina]
+                try:
+                    renglones = agrupar_renglones(pagina.extract_words())
+                finally:
+                    getattr(pagina, 'close', pagina.flush_cache)()
+
+                texto_pagina = ' '.join(p['text'] for r in renglones for p in r)
+                if not re.search(ANCLA_PAGINA_INGRESOS, texto_pagina, re.IGNORECASE):
+                    if en_seccion:
+                        break
+                    continue
+
+                en_seccion = True
+                nuevas, abierta, fin = _filas_de_renglones(renglones, num_pagina, abierta)
+                filas.extend(nuevas)
+                if fin:
+                    break
+
+            if abierta is not None:
+                filas.append(_cerrar_fila(abierta))
+
+        DIRECTORIO_CACHE_TABLAS.mkdir(parents=True, exist_ok=True)
+        with open(ruta_cache, 'w', encoding='utf-8') as f:
+            json.dump([fila._asdict() for fila in filas], f, ensure_ascii=False)
+
+        return filas
+
+    except Exception as e:
+        print(f"  ✗ Error extrayendo tabla de ingresos: {str(e)}")
+        return None
+
+
+def campos_desde_tabla(filas: List[FilaIngreso]) -> Dict[str, Optional[int]]:
+    """Campos de ingreso de resultados ({campo}_centavos) a partir de las filas de la tabla."""
+    datos = {f'{campo}_centavos': None for campo in CAMPOS_POR_NUMERAL.values()}
+    for fila in filas:
+        campo = CAMPOS_POR_NUMERAL.get(fila.numeral)
+        if campo and datos[f'{campo}_centavos'] is None:
+            datos[f'{campo}_centavos'] = fila.monto_centavos
+    return datos
+
+
+# %% OCR para páginas sin capa de texto (declaraciones escaneadas)
+
+DIRECTORIO_CACHE_OCR = DIRECTORIO_CACHE / "ocr"
+DPI_OCR = 300
+IDIOMA_OCR = 'spa'
+
+
+def ocr_disponible() -> bool:
+    """Indica si pytesseract y el ejecutable de tesseract están instalados."""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except ImportError:
+        print("  ⚠ OCR no disponible (instala pytesseract: pip install pytesseract)")
+    except Exception as e:
+        print(f"  ⚠ OCR no disponible (no se encontró tesseract): {e}")
+    return False
+
+
+def _ruta_cache_ocr(digest: str, num_pagina: int, dpi: int, idioma: str) -> Path:
+    return DIRECTORIO_CACHE_OCR / f"{digest}_p{num_pagina}_{dpi}dpi_{idioma}.txt"
+
+
+def _ocr_pagina(ruta_pdf: Path, num_pagina: int, dpi: int, idioma: str,
+                ruta_cache: Path) -> Tuple[int, str]:
+    """Rasteriza una página y le aplica OCR (se ejecuta en un proceso del pool)."""
+    import pytesseract
+
+    with pdfplumber.open(ruta_pdf) as pdf:
+        imagen = pdf.pages[num_pagina].to_image(resolution=dpi).original
+    texto = pytesseract.image_to_string(imagen, lang=idioma)
+
+    # Escritura atómica: un proceso interrumpido no deja caché a medias
+    temporal = ruta_cache.with_suffix('.tmp')
+    temporal.write_text(texto, encoding='utf-8')
+    os.replace(temporal, ruta_cache)
+    return num_pagina, texto
+
+
+def extraer_texto_con_ocr(ruta_pdf: Path, dpi: int = DPI_OCR, idioma: str = IDIOMA_OCR,
+                          procesos: Optional[int] = None) -> Optional[str]:
+    """
+    Extrae el texto del PDF aplicando OCR solo a las páginas sin capa de texto.
+
+    Las páginas se rasterizan a `dpi` y se procesan en paralelo en un pool de
+    procesos; el texto de cada página se guarda en caché por digest, página,
+    DPI e idioma.
+
+    Args:
+        ruta_pdf: Ruta al PDF
+        dpi: Resolución de rasterizado
+        idioma: Idioma de tesseract (requiere el paquete de idioma instalado)
+        procesos: Número de procesos del pool (default: núcleos disponibles)
+    """
+    try:
+        textos = dict(iterar_paginas_pdf(ruta_pdf))
+        vacias = [n for n, texto in textos.items() if not texto.strip()]
+        if not vacias:
+            return "\n".join(textos[n] for n in sorted(textos))
+
+        if not ocr_disponible():
+            return None
+
+        print(f"  → OCR de {len(vacias)}/{len(textos)} páginas sin texto ({dpi} dpi)...")
+        digest = calcular_digest_pdf(ruta_pdf)
+        DIRECTORIO_CACHE_OCR.mkdir(parents=True, exist_ok=True)
+
+        pendientes = []
+        for num_pagina in vacias:
+            ruta_cache = _ruta_cache_ocr(digest, num_pagina, dpi, idioma)
+            if ruta_cache.exists():
+                textos[num_pagina] = ruta_cache.read_text(encoding='utf-8')
+            else:
+                pendientes.append((num_pagina, ruta_cache))
+
+        if pendientes:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = [pool.submit(_ocr_pagina, ruta_pdf, num_pagina, dpi, idioma, ruta_cache)
+                           for num_pagina, ruta_cache in pendientes]
+                for futuro in as_completed(futuros):
+                    num_pagina, texto = futuro.result()
+                    textos[num_pagina] = texto
+
+        print(f"  ✓ OCR completado ({len(pendientes)} páginas nuevas, "
+              f"{len(vacias) - len(pendientes)} desde caché)")
+        return "\n".join(textos[n] for n in sorted(textos))
+
+    except Exception as e:
+        print(f"  ✗ Error en OCR: {str(e)}")
+        return None
+
+
+# %% Caché del texto extraído por declaración
+
+DIRECTORIO_CACHE_TEXTO = DIRECTORIO_CACHE / "texto"
+# Texto del modo dirigido (solo las páginas leídas). No se usa para re-extraer
+# campos ni para las tablas: un campo nuevo de campos.toml o una sección pueden
+# estar en páginas que no se leyeron. Indica qué declaraciones hay que completar.
+DIRECTORIO_CACHE_TEXTO_PARCIAL = DIRECTORIO_CACHE_TEXTO / "parcial"
+
+
+def _ruta_texto_cache(codigo: str, completo: bool = True) -> Path:
+    directorio = DIRECTORIO_CACHE_TEXTO if completo else DIRECTORIO_CACHE_TEXTO_PARCIAL
+    return directorio / f"{codigo}.txt"
+
+
+def guardar_texto_cache(codigo: str, texto: str, completo: bool = True):
+    """
+    Guarda el texto extraído de una declaración para re-extraer campos sin
+    abrir el PDF. `completo=False` para el texto del modo dirigido; cada
+    versión reemplaza a la otra.
+    """
+    ruta = _ruta_texto_cache(codigo, completo)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.tmp')
+    temporal.write_text(texto, encoding='utf-8')
+    os.replace(temporal, ruta)
+    _ruta_texto_cache(codigo, not completo).unlink(missing_ok=True)
+
+
+def _rutas_texto_cache(codigos: Optional[Iterable[str]], parciales: bool) -> List[Path]:
+    if codigos is None:
+        rutas = sorted(DIRECTORIO_CACHE_TEXTO.glob("*.txt"))
+        if parciales:
+            rutas += sorted(DIRECTORIO_CACHE_TEXTO_PARCIAL.glob("*.txt"))
+        return rutas
+
+    rutas = []
+    for codigo in codigos:
+        candidatas = [_ruta_texto_cache(codigo)] + ([_ruta_texto_cache(codigo, False)] if parciales else [])
+        rutas.extend(next(([ruta] for ruta in candidatas if ruta.exists()), []))
+    return rutas
+
+
+def cargar_textos_cache(codigos: Optional[Iterable[str]] = None, parciales: bool = False) -> pl.DataFrame:
+    """
+    Lee el texto en caché de las declaraciones indicadas (default: todas).
+    Retorna un DataFrame con `codigo_declaracion` y `texto`, listo para
+    patrones.extraer_campos_lote. Con `parciales=True` incluye los textos
+    del modo dirigido.
+    """
+    rutas = _rutas_texto_cache(codigos, parciales)
+    return pl.DataFrame({
+        'codigo_declaracion': [ruta.stem for ruta in rutas],
+        'texto': [ruta.read_text(encoding='utf-8') for ruta in rutas],
+    }, schema={'codigo_declaracion': pl.String, 'texto': pl.String})
+
+
+def cargar_texto_cache(codigo: str, parciales: bool = False) -> Optional[str]:
+    """Texto en caché de una declaración, o None si no está."""
+    rutas = _rutas_texto_cache([codigo], parciales)
+    if not rutas:
+        return None
+    return rutas[0].read_text(encoding='utf-8')
+
+
+def codigos_sin_texto_completo(codigos: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Declaraciones sin texto completo en caché: de `codigos`, las que no lo
+    tienen; sin `codigos`, las que solo tienen el texto del modo dirigido.
+    """
+    if codigos is None:
+        codigos = [ruta.stem for ruta in sorted(DIRECTORIO_CACHE_TEXTO_PARCIAL.glob("*.txt"))]
+    return [codigo for codigo in codigos if not _ruta_texto_cache(codigo).exists()]
+
+
+# %% Reproceso incremental: qué cambió desde el resultado guardado
+
+# 'sin_cambios': el resultado guardado sigue valiendo
+# 'campos': mismo texto, basta volver a extraer los campos del texto en caché
+# 'completo': hay que volver a leer el PDF
+ESTADOS_REPROCESO = ('sin_cambios', 'campos', 'completo')
+
+
+def huella_extraccion(ruta_pdf: Path, version_patrones: int,
+                      extraccion_dirigida: bool = False,
+                      tabla_ingresos: bool = False) -> Dict[str, Any]:
+    """
+    Entradas de las que depende el resultado de una declaración: el
+    contenido del PDF, las versiones de los extractores y las opciones.
+    Se guarda junto al resultado para decidir si hay que recalcularlo.
+    """
+    return {
+        'digest_pdf': calcular_digest_pdf(ruta_pdf),
+        'version_texto': VERSION_EXTRACTOR_TEXTO,
+        'version_patrones': version_patrones,
+        'modo_texto': 'dirigido' if extraccion_dirigida else 'completo',
+        'tabla_ingresos': tabla_ingresos,
+    }
+
+
+def comparar_huella(previo: Optional[Dict[str, Any]], huella: Dict[str, Any]) -> str:
+    """Estado de reproceso (ver ESTADOS_REPROCESO) de un resultado guardado."""
+    if not previo or not previo.get('datos_extraidos'):
+        return 'completo'
+    if any(previo.get(clave) != huella[clave]
+           for clave in ('digest_pdf', 'version_texto', 'modo_texto')):
+        return 'completo'
+    if any(previo.get(clave) != huella[clave]
+           for clave in ('version_patrones', 'tabla_ingresos')):
+        return 'campos'
+    return 'sin_cambios'
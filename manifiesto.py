@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de una corrida: bitácora de estados por declaración escrita
+antes de seguir con la siguiente (write-ahead).
+
+Cada cambio de estado (en_cola -> descargado -> extraido | fallido) se
+agrega como una línea JSON y se fuerza a disco (fsync). Si la corrida se
+cae o se interrumpe con Ctrl-C, al reanudar se relee el manifiesto: las
+declaraciones terminadas se saltan (consulta O(1) en un dict) y solo se
+pierde la declaración que estaba en proceso.
+
+En memoria queda solo el estado de cada declaración. Los resultados se
+quedan en el archivo; al reanudar se releen de ahí únicamente los de las
+declaraciones terminadas que no alcanzaron a escribirse en el sumidero.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from esquema import ResultadoDeclaracion
+from serializacion import a_json, de_json
+
+DIRECTORIO_CORRIDAS = Path("corridas")
+RUTA_MANIFIESTO = DIRECTORIO_CORRIDAS / "manifiesto.jsonl"
+
+ESTADOS = ('en_cola', 'descargado', 'extraido', 'fallido')
+TERMINALES = ('extraido', 'fallido')
+
+
+class Manifiesto:
+    """Manifiesto append-only de una corrida; en memoria solo el estado de cada declaración."""
+
+    def __init__(self, ruta: Path = RUTA_MANIFIESTO):
+        self.ruta = Path(ruta)
+        self.estados: Dict[str, str] = {}
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        if self.ruta.exists():
+            self._reproducir()
+        self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def _reproducir(self):
+        """Relee el manifiesto; una última línea cortada por una caída se descarta."""
+        with open(self.ruta, 'rb') as f:
+            contenido = f.read()
+
+        validos = 0
+        for linea in contenido.splitlines(keepends=True):
+            if not linea.endswith(b'\n'):
+                break
+            try:
+                evento = de_json(linea)
+            except ValueError:
+                break
+            self.estados[evento['codigo']] = evento['estado']
+            validos += len(linea)
+
+        if validos < len(contenido):
+            with open(self.ruta, 'r+b') as f:
+                f.truncate(validos)
+
+    def _escribir(self, eventos: List[Dict[str, Any]]):
+        if not eventos:
+            return
+        self._archivo.write(''.join(
+            a_json(evento) + '\n' for evento in eventos))
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        for evento in eventos:
+            self.estados[evento['codigo']] = evento['estado']
+
+    def encolar(self, codigos: Iterable[str]):
+        """Registra en una sola escritura las declaraciones nuevas de la corrida."""
+        momento = datetime.now().isoformat()
+        self._escribir([{'codigo': codigo, 'estado': 'en_cola', 'momento': momento}
+                        for codigo in dict.fromkeys(codigos) if codigo not in self.estados])
+
+    def registrar(self, codigo: str, estado: str, resultado: Optional[Dict[str, Any]] = None):
+        """Registra un cambio de estado; los terminales llevan el resultado."""
+        if estado not in ESTADOS:
+            raise ValueError(f"Estado desconocido: {estado}")
+        evento = {'codigo': codigo, 'estado': estado, 'momento': datetime.now().isoformat()}
+        if resultado is not None:
+            evento['resultado'] = resultado
+        self._escribir([evento])
+
+    def terminar(self, resultado: ResultadoDeclaracion):
+        """Estado final de una declaración según su resultado."""
+        estado = 'extraido' if resultado.datos_extraidos else 'fallido'
+        self.registrar(resultado.codigo_declaracion, estado, resultado.a_dict())
+
+    def completado(self, codigo: str, reintentar_fallidos: bool = False) -> bool:
+        """Si la declaración ya terminó en esta corrida."""
+        estado = self.estados.get(codigo)
+        if reintentar_fallidos:
+            return estado == 'extraido'
+        return estado in TERMINALES
+
+    def resultados_guardados(self, codigos: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Último resultado registrado de cada una de las declaraciones
+        indicadas, releído del archivo. Solo se decodifican los eventos que
+        llevan resultado.
+        """
+        buscados = set(codigos)
+        if not buscados:
+            return []
+        encontrados: Dict[str, Dict[str, Any]] = {}
+        with open(self.ruta, 'rb') as f:
+            for linea in f:
+                if b'"resultado"' not in linea:
+                    continue
+                evento = de_json(linea)
+                if evento['codigo'] in buscados and 'resultado' in evento:
+                    encontrados[evento['codigo']] = evento['resultado']
+        return list(encontrados.values())
+
+    def resumen(self) -> Dict[str, int]:
+        conteo = {estado: 0 for estado in ESTADOS}
+        for estado in self.estados.values():
+            conteo[estado] += 1
+        return conteo
+
+    def cerrar(self):
+        if not self._archivo.closed:
+            self._archivo.close()
+
+
+def abrir_manifiesto(reanudar: bool = False, ruta: Path = RUTA_MANIFIESTO) -> Manifiesto:
+    """
+    Manifiesto de la corrida. Sin `reanudar`, el de la corrida anterior se
+    archiva como manifiesto_{fecha}.jsonl y se empieza uno nuevo.
+    """
+    ruta = Path(ruta)
+    if not reanudar and ruta.exists():
+        archivado = ruta.with_name(f"{ruta.stem}_{datetime.now():%Y%m%d_%H%M%S}{ruta.suffix}")
+        os.replace(ruta, archivado)
+
+    manifiesto = Manifiesto(ruta)
+    if reanudar and manifiesto.estados:
+        conteo = manifiesto.resumen()
+        terminados = conteo['extraido'] + conteo['fallido']
+        print(f"→ Reanudando corrida: {terminados} terminadas "
+              f"({conteo['extraido']} extraídas, {conteo['fallido']} fallidas), "
+              f"{len(manifiesto.estados) - terminados} pendientes")
+    return manifiesto
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversión exacta de montos en pesos mexicanos a centavos enteros.
+
+Acepta separadores de miles, decimales, signo "$", sufijo "MXN" o "M.N." y
+montos negativos con signo o entre paréntesis ("$1,234.56 MXN" -> 123456,
+"(1,234.56)" -> -123456). Un tercer decimal se redondea al centavo (mitad
+hacia arriba, sobre el valor absoluto).
+
+Los extractores producen centavos enteros (Int64) y esos son el dato: las
+sumas, promedios y medianas de ingresos son exactas. Los pesos (float) solo
+se derivan para mostrar. Las funciones de columna son expresiones de Polars
+y no llaman a Python por cada valor.
+"""
+import re
+from typing import Any, Dict, Optional
+
+import polars as pl
+
+# Todo lo que acompaña al número y no forma parte de él
+PATRON_ADORNOS = r'[\s$,]|MXN|M\.N\.'
+# Negativo contable: (1234.56) -> -1234.56
+PATRON_PARENTESIS = r'^\((.*)\)$'
+# Signo, pesos y, opcionalmente, decimales
+PATRON_NUMERO = r'^(-?)(\d+)(?:\.(\d+))?$'
+
+_REGEX_ADORNOS = re.compile(PATRON_ADORNOS, re.IGNORECASE)
+_REGEX_PARENTESIS = re.compile(PATRON_PARENTESIS)
+_REGEX_NUMERO = re.compile(PATRON_NUMERO)
+
+
+def monto_a_centavos(texto: Optional[str]) -> Optional[int]:
+    """
+    Convierte un monto escrito ("1,234", "$1,234.5", "1234.56 MXN",
+    "-1,234.567", "(1,234.56)") a centavos. Retorna None si el texto no es
+    un monto.
+    """
+    if texto is None:
+        return None
+    limpio = _REGEX_PARENTESIS.sub(r'-\1', _REGEX_ADORNOS.sub('', texto))
+    match = _REGEX_NUMERO.match(limpio)
+    if not match:
+        return None
+    signo, pesos, decimales = match.groups()
+    decimales = decimales or ''
+    centavos = int(pesos) * 100 + int(decimales.ljust(2, '0')[:2]) + (decimales[2:3] >= '5')
+    return -centavos if signo else centavos
+
+
+def expr_centavos(expr: pl.Expr) -> pl.Expr:
+    """Versión vectorizada de monto_a_centavos sobre una columna de texto."""
+    limpio = (expr.str.replace_all(f'(?i){PATRON_ADORNOS}', '')
+              .str.replace(PATRON_PARENTESIS, '-$1'))
+    partes = limpio.str.extract_groups(PATRON_NUMERO)
+    decimales = partes.struct[2].fill_null('')
+    centavos = (partes.struct[1].cast(pl.Int64) * 100
+                + decimales.str.pad_end(2, '0').str.slice(0, 2).cast(pl.Int64)
+                + (decimales.str.slice(2, 1) >= '5').cast(pl.Int64))
+    return pl.when(partes.struct[0] == '-').then(-centavos).otherwise(centavos).name.keep()
+
+
+def expr_centavos_a_pesos(expr: pl.Expr) -> pl.Expr:
+    """Pesos (float) de una columna de centavos, solo para mostrar."""
+    return expr.cast(pl.Int64) / 100
+
+
+def pesos_a_centavos(pesos: Optional[float]) -> Optional[int]:
+    """
+    Centavos de un monto en pesos (float). Solo para resultados guardados
+    cuando los extractores todavía producían pesos.
+    """
+    return None if pesos is None else round(float(pesos) * 100)
+
+
+def expr_pesos_a_centavos(expr: pl.Expr) -> pl.Expr:
+    """
+    Centavos de una columna en pesos (float), para archivos escritos antes
+    de que los extractores produjeran centavos. Es exacto para montos que
+    vinieron de centavos.
+    """
+    return (expr * 100).round(0).cast(pl.Int64)
+
+
+def agregar_columnas_centavos(df, columnas):
+    """
+    Agrega `{columna}_centavos` (entero) por cada columna de montos en
+    pesos. Funciona con Polars o Pandas.
+    """
+    columnas = [c for c in columnas if c in df.columns]
+    if isinstance(df, pl.DataFrame):
+        return df.with_columns(
+            expr_pesos_a_centavos(pl.col(c)).alias(f'{c}_centavos') for c in columnas)
+
+    df = df.copy()
+    for c in columnas:
+        df[f'{c}_centavos'] = (df[c].astype('float64') * 100).round().astype('Int64')
+    return df
+
+
+def formatear_centavos(centavos: Optional[int]) -> str:
+    """123456 -> '$1,234.56'"""
+    if centavos is None:
+        return '-'
+    signo = '-' if centavos < 0 else ''
+    pesos, resto = divmod(abs(centavos), 100)
+    return f"{signo}${pesos:,}.{resto:02d}"
+
+
+def estadisticas_centavos(centavos: pl.Series) -> Dict[str, Any]:
+    """
+    Estadísticas exactas de una serie de centavos (ignora nulos). Promedio
+    y mediana se redondean al centavo.
+    """
+    valores = centavos.drop_nulls().cast(pl.Int64).sort()
+    n = len(valores)
+    if n == 0:
+        return {'n': 0, 'total': 0, 'promedio': None, 'mediana': None,
+                'minimo': None, 'maximo': None}
+
+    total = int(valores.sum())
+    mitad = n // 2
+    if n % 2:
+        mediana = int(valores[mitad])
+    else:
+        suma_centro = int(valores[mitad - 1]) + int(valores[mitad])
+        mediana = (suma_centro + 1) // 2
+    return {
+        'n': n,
+        'total': total,
+        'promedio': (2 * total + n) // (2 * n),
+        'mediana': mediana,
+        'minimo': int(valores[0]),
+        'maximo': int(valores[-1]),
+    }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Forma canónica del texto de una declaración, calculada una vez por documento.
+
+extract_text() devuelve mayúsculas, acentos y saltos de línea distintos
+según el PDF. Aquí el texto se lleva a:
+
+- texto: NFC, mayúsculas y cada secuencia de espacios o saltos de línea
+  reducida a un solo espacio.
+- sombra: el mismo texto con los acentos quitados y cualquier otro carácter
+  no ASCII cambiado por '~'. Mide lo mismo que `texto`, así que una
+  posición encontrada en la sombra vale también en el texto.
+- offsets: para cada carácter del texto normalizado, su posición en el
+  texto crudo, para regresar al fragmento original.
+
+Con esto los patrones de campos.toml son ASCII, distinguen mayúsculas y no
+necesitan `.*?` para brincar saltos de línea.
+"""
+import re
+import unicodedata
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import polars as pl
+
+_ESPACIOS_MULTIPLES = re.compile(r'\s{2,}')
+_NO_ASCII = re.compile(r'[^\x00-\x7f]')
+SUSTITUTO_NO_ASCII = '~'
+
+
+def _tabla_plegado() -> Dict[str, str]:
+    """Letra latina acentuada -> letra ASCII base (Á -> A, Ñ -> N, Ü -> U)."""
+    tabla = {}
+    for codigo in range(0xC0, 0x250):
+        letra = chr(codigo)
+        base = unicodedata.normalize('NFD', letra)[0]
+        if base != letra and base.isascii() and base.isalpha():
+            tabla[letra] = base
+    return tabla
+
+
+PLEGADO_ACENTOS = _tabla_plegado()
+
+
+class MapaPosiciones:
+    """
+    Posición en el texto normalizado -> posición en el texto crudo.
+
+    Se guarda por tramos: dentro de cada tramo el desplazamiento es
+    constante, y solo cambia después de una secuencia de varios espacios.
+    Los tramos se calculan la primera vez que se consulta una posición.
+    """
+    __slots__ = ('previo', 'base', 'largo', '_inicios', '_desplazamientos')
+
+    def __init__(self, previo: str, base: Sequence[int], largo: int):
+        self.previo = previo        # texto antes de colapsar espacios
+        self.base = base            # posición en `previo` -> posición cruda
+        self.largo = largo
+        self._inicios: List[int] = []
+        self._desplazamientos: List[int] = []
+
+    def _calcular_tramos(self):
+        inicios, desplazamientos, acumulado = [0], [0], 0
+        for espacio in _ESPACIOS_MULTIPLES.finditer(self.previo):
+            acumulado += espacio.end() - espacio.start() - 1
+            inicios.append(espacio.end() - acumulado)
+            desplazamientos.append(acumulado)
+        self._inicios, self._desplazamientos = inicios, desplazamientos
+
+    def __len__(self) -> int:
+        return self.largo
+
+    def __getitem__(self, posicion: int) -> int:
+        if not self._inicios:
+            self._calcular_tramos()
+        tramo = bisect_right(self._inicios, posicion) - 1
+        return self.base[posicion + self._desplazamientos[tramo]]
+
+
+class TextoNormalizado(NamedTuple):
+    """Texto de un documento en forma canónica, con su sombra y mapa de posiciones."""
+    crudo: str
+    texto: str
+    sombra: str
+    offsets: MapaPosiciones
+
+    def posicion_cruda(self, inicio: int, fin: int) -> Tuple[int, int]:
+        """Convierte un intervalo del texto normalizado a uno del texto crudo."""
+        if inicio >= fin:
+            base = self.offsets[inicio] if inicio < len(self.offsets) else len(self.crudo)
+            return base, base
+        return self.offsets[inicio], self.offsets[fin - 1] + 1
+
+    def fragmento_crudo(self, inicio: int, fin: int) -> str:
+        """Fragmento del texto crudo que corresponde a texto[inicio:fin]."""
+        inicio_crudo, fin_crudo = self.posicion_cruda(inicio, fin)
+        return self.crudo[inicio_crudo:fin_crudo]
+
+
+def _transformar(texto: str, mapa: Sequence[int], funcion) -> Tuple[str, Sequence[int]]:
+    """
+    Aplica `funcion` carácter por carácter cuando cambia el largo del texto,
+    repitiendo o descartando posiciones del mapa según corresponda.
+    """
+    completo = funcion(texto)
+    if len(completo) == len(texto):
+        return completo, mapa
+
+    partes, nuevo_mapa = [], array('l')
+    for i, caracter in enumerate(texto):
+        convertido = funcion(caracter)
+        partes.append(convertido)
+        nuevo_mapa.extend([mapa[i]] * len(convertido))
+    return ''.join(partes), nuevo_mapa
+
+
+def _nfc(texto: str, mapa: Sequence[int]) -> Tuple[str, Sequence[int]]:
+    """NFC por grupos de letra base + marcas combinantes."""
+    completo = unicodedata.normalize('NFC', texto)
+    if len(completo) == len(texto):
+        return completo, mapa
+
+    partes, nuevo_mapa = [], array('l')
+    inicio = 0
+    for i in range(1, len(texto) + 1):
+        if i < len(texto) and unicodedata.combining(texto[i]):
+            continue
+        grupo = unicodedata.normalize('NFC', texto[inicio:i])
+        partes.append(grupo)
+        nuevo_mapa.extend([mapa[inicio]] * len(grupo))
+        inicio = i
+    return ''.join(partes), nuevo_mapa
+
+
+def _plegar(match) -> str:
+    return PLEGADO_ACENTOS.get(match.group(), SUSTITUTO_NO_ASCII)
+
+
+def sombra_de(texto: str) -> str:
+    """Sombra ASCII del texto ya normalizado (misma longitud)."""
+    return _NO_ASCII.sub(_plegar, texto)
+
+
+def _colapsar_espacios(texto: str) -> str:
+    """Reduce cada secuencia de espacios o saltos de línea a un solo espacio."""
+    nucleo = ' '.join(texto.split())
+    if not nucleo:
+        return ' ' if texto else ''
+    inicio = ' ' if texto[0].isspace() else ''
+    fin = ' ' if texto[-1].isspace() else ''
+    return inicio + nucleo + fin
+
+
+def normalizar(crudo: str) -> TextoNormalizado:
+    """Calcula la forma canónica del texto crudo de un documento."""
+    texto, mapa = _nfc(crudo, range(len(crudo)))
+    texto, mapa = _transformar(texto, mapa, str.upper)
+
+    colapsado = _colapsar_espacios(texto)
+    offsets = MapaPosiciones(texto, mapa, len(colapsado))
+
+    return TextoNormalizado(crudo, colapsado, sombra_de(colapsado), offsets)
+
+
+def normalizar_lineas(crudo: str) -> Iterator[Tuple[str, str]]:
+    """
+    Recorre el texto línea por línea y da (línea normalizada, sombra), sin
+    líneas vacías. Para los recorridos que dependen de la estructura de
+    renglones, que normalizar() colapsa.
+    """
+    texto = unicodedata.normalize('NFC', crudo).upper()
+    for linea in texto.splitlines():
+        linea = ' '.join(linea.split())
+        if linea:
+            yield linea, sombra_de(linea)
+
+
+def nfc_columna(textos: pl.Series) -> pl.Series:
+    """
+    NFC de una columna de textos. Solo se normalizan las filas con marcas
+    combinantes; en el resto NFC no cambia nada y es lo más caro del paso.
+    """
+    con_marcas = textos.str.contains(r'\p{M}').fill_null(False)
+    if not con_marcas.any():
+        return textos
+    return textos.scatter(con_marcas.arg_true(), textos.filter(con_marcas).str.normalize('NFC'))
+
+
+def expr_normalizar(expr: pl.Expr) -> pl.Expr:
+    """
+    Versión vectorizada de `texto` de normalizar, sobre una columna que ya
+    pasó por nfc_columna.
+    """
+    # Los espacios sencillos se quedan como están: solo se reemplazan
+    # secuencias y saltos de línea o tabuladores
+    return expr.str.to_uppercase().str.replace_all(r'\s\s+|[^\S ]', ' ')
+
+
+def expr_sombra(expr: pl.Expr) -> pl.Expr:
+    """Versión vectorizada de sombra_de, sobre una columna ya normalizada."""
+    return (expr.str.replace_many(list(PLEGADO_ACENTOS), list(PLEGADO_ACENTOS.values()))
+            .str.replace_all(r'[^\x00-\x7f]', SUSTITUTO_NO_ASCII))
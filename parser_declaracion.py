@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura estructurada de una declaración DeclaraNet en una sola pasada.
+
+El texto se recorre renglón por renglón una vez; cada encabezado de
+sección (datos generales, encargo actual, ingresos, bienes inmuebles,
+vehículos, adeudos) cambia la sección en curso y cada renglón se interpreta
+según la sección a la que pertenece:
+
+- Secciones de un solo registro (datos generales, encargo): pares
+  "ETIQUETA: valor" o "ETIQUETA valor".
+- Secciones de registros repetidos (bienes, vehículos, adeudos): los mismos
+  pares; una etiqueta que ya apareció en el registro en curso abre uno nuevo.
+- Ingresos: un renglón por numeral (I., II., II.1 ... II.5, A., B., C.) con
+  el monto al final del propio renglón o de su continuación.
+
+Cada sección produce un DataFrame de Polars con tipos fijos (montos en
+centavos Int64, fechas Date) y se guarda como Parquet en
+DIRECTORIO_TABLAS/{seccion}.parquet, una fila por registro y declaración.
+El análisis posterior lee esas tablas en lugar de volver a buscar en el texto.
+"""
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import polars as pl
+
+from archivo_pdfs import fuente_pdf, DIRECTORIO_ARCHIVO, DIRECTORIO_PDFS
+from extraccion_pdf import (cargar_textos_cache, codigos_sin_texto_completo, extraer_texto_pdf,
+                            guardar_texto_cache)
+from montos import monto_a_centavos
+from normalizacion import normalizar_lineas
+from supervisor import ejecutar_supervisado, ExtraccionAbortada
+
+DIRECTORIO_TABLAS = Path("tablas_declaraciones")
+
+# Tipo de cada columna -> dtype de Polars
+DTYPES = {'texto': pl.String, 'monto': pl.Int64, 'fecha': pl.Date}
+
+
+class Seccion(NamedTuple):
+    """Sección de la declaración y las etiquetas que se leen en ella."""
+    nombre: str
+    encabezado: str                             # patrón sobre la sombra del renglón
+    etiquetas: Tuple[Tuple[str, str, str], ...]  # (etiqueta ASCII, columna, tipo)
+    repetida: bool = False
+
+
+# En orden de aparición. Las etiquetas son ASCII porque se comparan con la
+# sombra del renglón (sin acentos); las columnas de montos llevan el sufijo
+# _centavos porque guardan centavos enteros.
+SECCIONES = (
+    Seccion('datos_generales', r'DATOS GENERALES\b', (
+        ('FECHA DE RECEPCION', 'fecha_recepcion', 'fecha'),
+        ('TIPO DE DECLARACION', 'tipo_declaracion', 'texto'),
+        ('NOMBRE', 'nombre', 'texto'),
+        ('CORREO ELECTRONICO INSTITUCIONAL', 'correo_institucional', 'texto'),
+        ('SITUACION PERSONAL / ESTADO CIVIL', 'estado_civil', 'texto'),
+        ('PAIS DE NACIMIENTO', 'pais_nacimiento', 'texto'),
+        ('NACIONALIDAD', 'nacionalidad', 'texto'),
+    )),
+    Seccion('encargo', r'DATOS DEL EMPLEO, CARGO O COMISION\b', (
+        ('NIVEL / ORDEN DE GOBIERNO', 'orden_gobierno', 'texto'),
+        ('AMBITO PUBLICO', 'ambito_publico', 'texto'),
+        ('NOMBRE DEL ENTE PUBLICO', 'ente_publico', 'texto'),
+        ('AREA DE ADSCRIPCION', 'area_adscripcion', 'texto'),
+        ('EMPLEO, CARGO O COMISION', 'empleo_cargo_comision', 'texto'),
+        ('NIVEL DEL EMPLEO, CARGO O COMISION', 'nivel_empleo', 'texto'),
+        ('NIVEL DEL EMPLEO', 'nivel_empleo', 'texto'),
+        ('FUNCION PRINCIPAL', 'funcion_principal', 'texto'),
+        ('FECHA DE TOMA DE POSESION DEL EMPLEO, CARGO O COMISION', 'fecha_toma_posesion', 'fecha'),
+        ('FECHA DE TOMA DE POSESION', 'fecha_toma_posesion', 'fecha'),
+    )),
+    Seccion('ingresos', r'INGRESOS NETOS\b', ()),
+    Seccion('bienes_inmuebles', r'BIENES INMUEBLES\b', (
+        ('TIPO DE INMUEBLE', 'tipo_inmueble', 'texto'),
+        ('TITULAR DEL INMUEBLE', 'titular', 'texto'),
+        ('PORCENTAJE DE PROPIEDAD', 'porcentaje_propiedad', 'texto'),
+        ('SUPERFICIE DEL TERRENO', 'superficie_terreno', 'texto'),
+        ('SUPERFICIE DE CONSTRUCCION', 'superficie_construccion', 'texto'),
+        ('FORMA DE ADQUISICION', 'forma_adquisicion', 'texto'),
+        ('FORMA DE PAGO', 'forma_pago', 'texto'),
+        ('VALOR DE ADQUISICION', 'valor_adquisicion_centavos', 'monto'),
+        ('FECHA DE ADQUISICION', 'fecha_adquisicion', 'fecha'),
+    ), repetida=True),
+    Seccion('vehiculos', r'VEHICULOS\b', (
+        ('TIPO DE VEHICULO', 'tipo_vehiculo', 'texto'),
+        ('TITULAR DEL VEHICULO', 'titular', 'texto'),
+        ('MARCA', 'marca', 'texto'),
+        ('MODELO', 'modelo', 'texto'),
+        ('ANO', 'anio', 'texto'),
+        ('FORMA DE ADQUISICION', 'forma_adquisicion', 'texto'),
+        ('FORMA DE PAGO', 'forma_pago', 'texto'),
+        ('VALOR DE ADQUISICION', 'valor_adquisicion_centavos', 'monto'),
+        ('FECHA DE ADQUISICION', 'fecha_adquisicion', 'fecha'),
+    ), repetida=True),
+    Seccion('adeudos', r'ADEUDOS\b', (
+        ('TIPO DE ADEUDO', 'tipo_adeudo', 'texto'),
+        ('TITULAR DEL ADEUDO', 'titular', 'texto'),
+        ('FECHA DE ADQUISICION DEL ADEUDO', 'fecha_adquisicion', 'fecha'),
+        ('MONTO ORIGINAL DEL ADEUDO', 'monto_original_centavos', 'monto'),
+        ('SALDO INSOLUTO', 'saldo_insoluto_centavos', 'monto'),
+        ('OTORGANTE DEL CREDITO', 'otorgante', 'texto'),
+    ), repetida=True),
+)
+
+SECCIONES_POR_NOMBRE = {seccion.nombre: seccion for seccion in SECCIONES}
+
+# Renglones antes del primer encabezado (p. ej. la fecha de recepción en la
+# portada) se leen como datos generales
+SECCION_INICIAL = 'datos_generales'
+
+_REGEX_ENCABEZADOS = re.compile(
+    '^(?:' + '|'.join(f'(?P<{s.nombre}>{s.encabezado})' for s in SECCIONES) + ')')
+
+# Numerales de la tabla de ingresos y monto al final del renglón. Los
+# numerales de una letra o romanos llevan el punto obligatorio: sin él, un
+# renglón como "A LA FECHA DE..." abriría un numeral falso
+_REGEX_NUMERAL = re.compile(r'^(II\.[1-5]|(?:II|I|A|B|C)(?=\.))\.? (.*)$')
+_REGEX_MONTO_FINAL = re.compile(r'(?:^| )(\$ ?\d[\d,]*(?:\.\d{1,2})?|\d[\d,]*(?:\.\d{1,2})?)(?: MXN| M\.N\.)?$')
+
+ESQUEMA_INGRESOS = {
+    'codigo_declaracion': pl.String,
+    'numeral': pl.String,
+    'concepto': pl.String,
+    'monto_centavos': pl.Int64,
+}
+
+
+def _compilar_etiquetas(seccion: Seccion) -> Optional[re.Pattern]:
+    """Una sola regex por sección; las etiquetas largas se prueban primero."""
+    if not seccion.etiquetas:
+        return None
+    ordenadas = sorted(range(len(seccion.etiquetas)),
+                       key=lambda i: -len(seccion.etiquetas[i][0]))
+    alternativas = '|'.join(f'(?P<e{i}>{re.escape(seccion.etiquetas[i][0])})' for i in ordenadas)
+    return re.compile(f'^(?:{alternativas})(?: ?:|(?= )|$)')
+
+
+_REGEX_ETIQUETAS = {seccion.nombre: _compilar_etiquetas(seccion) for seccion in SECCIONES}
+
+
+def esquema_seccion(nombre: str) -> Dict[str, pl.DataType]:
+    """Esquema de la tabla de una sección."""
+    if nombre == 'ingresos':
+        return dict(ESQUEMA_INGRESOS)
+    seccion = SECCIONES_POR_NOMBRE[nombre]
+    esquema = {'codigo_declaracion': pl.String}
+    if seccion.repetida:
+        esquema['registro'] = pl.Int32
+    for _, columna, tipo in seccion.etiquetas:
+        esquema.setdefault(columna, DTYPES[tipo])
+    return esquema
+
+
+def _fecha(texto: str) -> Optional[date]:
+    match = re.match(r'(\d{1,2}/\d{1,2}/\d{4})', texto)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def _convertir(valor: str, tipo: str):
+    if tipo == 'monto':
+        match = re.match(r'\$? ?\d[\d,]*(?:\.\d+)?', valor)
+        return monto_a_centavos(match.group()) if match else None
+    if tipo == 'fecha':
+        return _fecha(valor)
+    return valor or None
+
+
+class _Lectura:
+    """Estado del recorrido de un documento."""
+
+    def __init__(self, codigo: str):
+        self.codigo = codigo
+        self.registros: Dict[str, List[Dict]] = {s.nombre: [] for s in SECCIONES}
+        self.actual: Dict[str, Dict] = {}
+        self.ingreso: Optional[Dict] = None
+
+    def registro_en_curso(self, seccion: Seccion, columna: str) -> Dict:
+        registro = self.actual.get(seccion.nombre)
+        if registro is None or (seccion.repetida and columna in registro):
+            registro = {'codigo_declaracion': self.codigo}
+            if seccion.repetida:
+                registro['registro'] = len(self.registros[seccion.nombre])
+            self.registros[seccion.nombre].append(registro)
+            self.actual[seccion.nombre] = registro
+        return registro
+
+    def etiqueta(self, seccion: Seccion, linea: str, sombra: str):
+        regex = _REGEX_ETIQUETAS[seccion.nombre]
+        match = regex.match(sombra) if regex else None
+        if not match:
+            return
+        _, columna, tipo = seccion.etiquetas[int(match.lastgroup[1:])]
+        registro = self.registro_en_curso(seccion, columna)
+        # En las secciones de un solo registro, la primera aparición gana
+        if columna not in registro:
+            registro[columna] = _convertir(linea[match.end():].strip(' :'), tipo)
+
+    def ingresos(self, linea: str, sombra: str):
+        match = _REGEX_NUMERAL.match(sombra)
+        if match:
+            self.ingreso = {'codigo_declaracion': self.codigo, 'numeral': match.group(1),
+                            'concepto': '', 'monto_centavos': None}
+            self.registros['ingresos'].append(self.ingreso)
+            linea = linea[match.start(2):]
+        elif self.ingreso is None:
+            return
+
+        monto = _REGEX_MONTO_FINAL.search(linea)
+        if monto and self.ingreso['monto_centavos'] is None:
+            self.ingreso['monto_centavos'] = monto_a_centavos(monto.group(1))
+            linea = linea[:monto.start()]
+        self.ingreso['concepto'] = f"{self.ingreso['concepto']} {linea}".strip()
+
+
+def parsear_declaracion(codigo: str, texto: Optional[str]) -> Dict[str, pl.DataFrame]:
+    """
+    Recorre el texto de una declaración una vez y retorna un DataFrame por
+    sección (ver SECCIONES y esquema_seccion). Las secciones ausentes
+    quedan como tablas vacías.
+    """
+    lectura = _Lectura(codigo)
+    seccion = SECCIONES_POR_NOMBRE[SECCION_INICIAL]
+
+    for linea, sombra in normalizar_lineas(texto or ''):
+        encabezado = _REGEX_ENCABEZADOS.match(sombra)
+        if encabezado:
+            seccion = SECCIONES_POR_NOMBRE[encabezado.lastgroup]
+            lectura.ingreso = None
+            continue
+        if seccion.nombre == 'ingresos':
+            lectura.ingresos(linea, sombra)
+        else:
+            lectura.etiqueta(seccion, linea, sombra)
+
+    return {nombre: pl.DataFrame(filas, schema=esquema_seccion(nombre), orient='row')
+            if filas else pl.DataFrame(schema=esquema_seccion(nombre))
+            for nombre, filas in lectura.registros.items()}
+
+
+def parsear_lote(textos: pl.DataFrame, columna_texto: str = 'texto') -> Dict[str, pl.DataFrame]:
+    """
+    parsear_declaracion sobre un DataFrame con `codigo_declaracion` y el
+    texto (p. ej. el de extraccion_pdf.cargar_textos_cache), concatenando
+    las tablas de cada sección.
+    """
+    partes: Dict[str, List[pl.DataFrame]] = {s.nombre: [] for s in SECCIONES}
+    for codigo, texto in textos.select('codigo_declaracion', columna_texto).iter_rows():
+        for nombre, tabla in parsear_declaracion(codigo, texto).items():
+            if tabla.height:
+                partes[nombre].append(tabla)
+
+    return {nombre: pl.concat(tablas) if tablas else pl.DataFrame(schema=esquema_seccion(nombre))
+            for nombre, tablas in partes.items()}
+
+
+def ruta_tabla(nombre: str, directorio: Path = DIRECTORIO_TABLAS) -> Path:
+    return directorio / f"{nombre}.parquet"
+
+
+def guardar_tablas(tablas: Dict[str, pl.DataFrame], directorio: Path = DIRECTORIO_TABLAS,
+                   codigos: Optional[Iterable[str]] = None):
+    """
+    Guarda cada sección en {directorio}/{seccion}.parquet. Las filas de las
+    declaraciones re-parseadas (`codigos`, default: las presentes en las
+    tablas nuevas) reemplazan a las anteriores; el resto se conserva.
+    """
+    directorio.mkdir(parents=True, exist_ok=True)
+    if codigos is None:
+        codigos = set()
+        for tabla in tablas.values():
+            codigos.update(tabla['codigo_declaracion'].to_list())
+    codigos = list(codigos)
+
+    for nombre, tabla in tablas.items():
+        ruta = ruta_tabla(nombre, directorio)
+        if ruta.exists():
+            anterior = pl.read_parquet(ruta).filter(~pl.col('codigo_declaracion').is_in(codigos))
+            tabla = pl.concat([anterior, tabla], how='diagonal_relaxed')
+        temporal = ruta.with_suffix('.tmp')
+        tabla.write_parquet(temporal)
+        os.replace(temporal, ruta)
+
+
+def cargar_tabla(nombre: str, directorio: Path = DIRECTORIO_TABLAS) -> pl.LazyFrame:
+    """Tabla persistida de una sección (vacía si aún no existe)."""
+    ruta = ruta_tabla(nombre, directorio)
+    if not ruta.exists():
+        return pl.LazyFrame(schema=esquema_seccion(nombre))
+    return pl.scan_parquet(ruta)
+
+
+def completar_textos(codigos: Iterable[str], directorio_pdfs: Path = DIRECTORIO_PDFS,
+                     directorio_archivo: Path = DIRECTORIO_ARCHIVO) -> int:
+    """
+    Extrae el texto completo de las declaraciones indicadas desde su PDF
+    (suelto o archivado) y lo deja en caché. Un PDF sin capa de texto queda
+    en caché con texto vacío para no volver a leerlo en cada corrida; una
+    extracción fallida o abortada no se guarda y se reintenta. Retorna
+    cuántas se completaron.
+    """
+    completados, sin_pdf, sin_texto, fallidos = 0, 0, 0, 0
+    for codigo in codigos:
+        fuente = fuente_pdf(codigo, directorio_pdfs, directorio_archivo)
+        if fuente is None:
+            sin_pdf += 1
+            continue
+        try:
+            texto = ejecutar_supervisado(extraer_texto_pdf, fuente)
+        except ExtraccionAbortada as e:
+            print(f"  ✗ {codigo}: {e.mensaje_error()} ({e.detalle})")
+            texto = None
+        finally:
+            if not isinstance(fuente, Path):
+                fuente.close()
+        if texto is None:
+            fallidos += 1
+            continue
+        if not texto.strip():
+            guardar_texto_cache(codigo, '')
+            sin_texto += 1
+            continue
+        guardar_texto_cache(codigo, texto)
+        completados += 1
+
+    if sin_pdf:
+        print(f"  ⚠ {sin_pdf} sin PDF local ni archivado")
+    if sin_texto:
+        print(f"  ⚠ {sin_texto} sin capa de texto (quedan en caché vacías)")
+    if fallidos:
+        print(f"  ⚠ {fallidos} extracciones fallidas (se reintentan en la próxima corrida)")
+    return completados
+
+
+def construir_tablas(codigos: Optional[Iterable[str]] = None,
+                     directorio: Path = DIRECTORIO_TABLAS,
+                     directorio_pdfs: Path = DIRECTORIO_PDFS) -> Dict[str, int]:
+    """
+    Parsea el texto en caché de las declaraciones indicadas (default:
+    todas) y actualiza las tablas por sección. Las que solo tienen el texto
+    parcial del modo dirigido se extraen completas antes desde su PDF.
+    Retorna filas por sección.
+    """
+    if codigos is not None:
+        codigos = list(codigos)
+    faltantes = codigos_sin_texto_completo(codigos)
+    if faltantes:
+        print(f"→ {len(faltantes)} declaraciones sin texto completo en caché, se extraen de su PDF")
+        completar_textos(faltantes, directorio_pdfs)
+
+    textos = cargar_textos_cache(codigos)
+    if textos.is_empty():
+        print("⚠ No hay textos en caché para construir las tablas")
+        return {}
+
+    tablas = parsear_lote(textos)
+    guardar_tablas(tablas, directorio, codigos=textos['codigo_declaracion'].to_list())
+
+    filas = {nombre: tabla.height for nombre, tabla in tablas.items()}
+    print(f"✓ Tablas por sección de {textos.height} declaraciones en {directorio}/")
+    for nombre, n in filas.items():
+        print(f"  {nombre:<20} {n:>8,} filas")
+    return filas
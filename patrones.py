@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de patrones de los campos de una declaración.
+
+Todos los scripts extraen los mismos campos con estos patrones. Las anclas
+y los campos se definen en campos.toml, que se compila al importar el
+módulo y se recompila si el archivo cambia durante una corrida. Cada patrón
+lleva un contador de aciertos para saber cuáles alternativas se usan
+realmente.
+
+Los patrones no buscan sobre el texto crudo sino sobre su sombra
+normalizada (ver normalizacion.py): ASCII, mayúsculas y espacios
+colapsados, así que son sensibles a mayúsculas y no necesitan flags. Una
+sola pasada sobre la sombra localiza todas las anclas (encabezados de
+sección y etiquetas de campo); después cada patrón busca solo dentro de la
+ventana de su ancla, de modo que el costo por documento es lineal en el
+largo del texto y un ancla faltante no hace que `.*?` recorra el resto
+del documento.
+
+Opcionalmente los patrones se compilan con RE2 (tiempo lineal garantizado,
+pip install google-re2); los que usan construcciones que RE2 no soporta,
+como lookahead, se quedan con `re`. Los mismos patrones se usan en
+extraer_campos_lote para extraer un lote completo con expresiones de
+Polars, por eso no deben usar lookahead ni lookbehind.
+
+Los montos se extraen como centavos enteros, con la clave
+{campo}_centavos (ver clave_valor); los pesos solo se derivan para mostrar.
+"""
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import polars as pl
+
+from montos import monto_a_centavos, expr_centavos
+from normalizacion import (TextoNormalizado, normalizar, nfc_columna,
+                           expr_normalizar, expr_sombra)
+
+try:
+    import tomllib
+except ImportError:
+    # Python < 3.11 (pip install tomli)
+    import tomli as tomllib
+
+# Especificación declarativa de anclas y campos. Su `version` queda
+# registrada en los metadatos de cada declaración procesada.
+RUTA_ESPECIFICACION = Path(__file__).with_name('campos.toml')
+VERSION_PATRONES = 0
+_MTIME_ESPECIFICACION: Optional[int] = None
+
+# Motor con el que se compilan los patrones: 're' o 're2'
+MOTOR_REGEX = 're'
+
+
+def _opciones_re2(re2, flags: int):
+    """Traduce los flags de `re` a re2.Options."""
+    opciones = re2.Options()
+    opciones.case_sensitive = not flags & re.IGNORECASE
+    opciones.dot_nl = bool(flags & re.DOTALL)
+    opciones.one_line = not flags & re.MULTILINE
+    opciones.log_errors = False
+    return opciones
+
+
+def compilar(patron: str, flags: int = 0, motor: Optional[str] = None) -> Tuple[Any, str]:
+    """
+    Compila el patrón con el motor pedido (default: MOTOR_REGEX).
+    Retorna (regex compilada, motor usado); si RE2 no está instalado o no
+    soporta el patrón, se usa `re`.
+    """
+    if (motor or MOTOR_REGEX) == 're2':
+        try:
+            import re2
+            return re2.compile(patron, _opciones_re2(re2, flags)), 're2'
+        except ImportError:
+            pass
+        except Exception:
+            # Construcción no soportada por RE2 (p. ej. lookahead)
+            pass
+    return re.compile(patron, flags), 're'
+
+
+# Anclas, ventanas y registro de patrones: se llenan al compilar campos.toml
+# (ver aplicar_especificacion). Los encabezados de sección van en orden de
+# aparición; las anclas de línea tienen ventana de longitud fija.
+ENCABEZADOS_SECCION: List[Tuple[str, str]] = []
+ANCLAS_LINEA: List[Tuple[str, str]] = []
+VENTANAS_LINEA: Dict[str, int] = {}
+
+# Límite de una ventana de sección cuando no aparece el encabezado siguiente
+LONGITUD_MAXIMA_VENTANA = 5000
+
+PATRON_ANCLAS = ''
+REGEX_ANCLAS = None
+_NOMBRES_LINEA: set = set()
+TOTAL_ANCLAS = 0
+
+
+def indexar_secciones(texto: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Encuentra todas las anclas (encabezados de sección y etiquetas de campo)
+    en una sola pasada lineal sobre la sombra normalizada del texto.
+
+    Retorna {ancla: (inicio, fin)}. La ventana de una sección va del
+    encabezado al siguiente encabezado (o hasta LONGITUD_MAXIMA_VENTANA);
+    la de un ancla de línea mide lo que indique su `ventana`. Si un ancla se
+    repite, cuenta la primera aparición. El recorrido se detiene en cuanto
+    aparecieron todas las anclas, que en DeclaraNet están en las primeras
+    páginas.
+    """
+    inicios: Dict[str, int] = {}
+    for match in REGEX_ANCLAS.finditer(texto):
+        inicios.setdefault(match.lastgroup, match.start())
+        if len(inicios) == TOTAL_ANCLAS:
+            break
+
+    indice = {}
+    secciones = sorted(((n, i) for n, i in inicios.items() if n not in _NOMBRES_LINEA),
+                       key=lambda x: x[1])
+    for i, (nombre, inicio) in enumerate(secciones):
+        fin = secciones[i + 1][1] if i + 1 < len(secciones) else len(texto)
+        indice[nombre] = (inicio, min(fin, inicio + LONGITUD_MAXIMA_VENTANA))
+
+    for nombre in _NOMBRES_LINEA & inicios.keys():
+        inicio = inicios[nombre]
+        indice[nombre] = (inicio, min(len(texto), inicio + VENTANAS_LINEA[nombre]))
+    return indice
+
+
+class PatronCampo:
+    """Patrón compilado de un campo, con su contador de aciertos."""
+
+    __slots__ = ('campo', 'nombre', 'patron', 'flags', 'regex', 'motor',
+                 'tipo', 'seccion', 'aciertos')
+
+    def __init__(self, campo: str, nombre: str, patron: str, flags: int = 0,
+                 tipo: str = 'monto', seccion: Optional[str] = None):
+        self.campo = campo
+        self.nombre = nombre
+        self.patron = patron
+        self.flags = flags
+        self.regex, self.motor = compilar(patron, flags)
+        self.tipo = tipo
+        self.seccion = seccion
+        self.aciertos = 0
+
+    def buscar(self, texto: str, indice: Dict[str, Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """
+        Retorna (inicio, fin) del primer grupo del patrón en la sombra, o None.
+        Si el patrón tiene sección, busca solo en su ventana; si la sección
+        no aparece en el índice, no hay valor.
+        """
+        if self.seccion is None:
+            match = self.regex.search(texto)
+        elif self.seccion in indice:
+            inicio, fin = indice[self.seccion]
+            match = self.regex.search(texto, inicio, fin)
+        else:
+            return None
+
+        if match:
+            self.aciertos += 1
+            return match.span(1)
+        return None
+
+
+# Campo -> alternativas en orden de preferencia
+REGISTRO: Dict[str, List[PatronCampo]] = {}
+CAMPOS_ADICIONALES: List[str] = []
+
+TIPOS_VALOR = ('monto', 'fecha', 'texto')
+
+
+def registrar(campo: str, nombre: str, patron: str, flags: int = 0,
+              tipo: str = 'monto', seccion: Optional[str] = None):
+    """Agrega una alternativa al registro de un campo."""
+    REGISTRO.setdefault(campo, []).append(PatronCampo(campo, nombre, patron, flags, tipo, seccion))
+
+
+def dividir_patron(patron: str) -> Tuple[str, str, str]:
+    """
+    Separa un patrón en (antes, grupo, después) alrededor de su primer grupo
+    de captura, que es el valor del campo. El grupo debe estar en el nivel
+    superior y el patrón no puede tener alternativas (|) en ese nivel; si
+    no, lanza ValueError.
+    """
+    clase, profundidad, inicio = False, 0, None
+    i = 0
+    while i < len(patron):
+        caracter = patron[i]
+        if caracter == '\\':
+            i += 2
+            continue
+        if clase:
+            clase = caracter != ']'
+        elif caracter == '[':
+            clase = True
+            # Un ']' justo después de '[' o '[^' es literal
+            if patron.startswith('^', i + 1):
+                i += 1
+            if patron.startswith(']', i + 1):
+                i += 1
+        elif caracter == '|' and profundidad == 0:
+            raise ValueError("el patrón no puede tener alternativas en el nivel superior")
+        elif caracter == '(':
+            if inicio is None and not patron.startswith('(?', i):
+                if profundidad:
+                    raise ValueError("el grupo del valor debe estar en el nivel superior")
+                inicio = i
+            profundidad += 1
+        elif caracter == ')':
+            profundidad -= 1
+            if inicio is not None and profundidad == 0 and i > inicio:
+                return patron[:inicio], patron[inicio + 1:i], patron[i + 1:]
+        i += 1
+    raise ValueError("el patrón no tiene grupo de captura")
+
+
+def cargar_especificacion(ruta: Path = RUTA_ESPECIFICACION) -> Dict:
+    """
+    Lee y valida el archivo de especificación de campos.
+    Lanza ValueError si algún campo es inválido.
+    """
+    with open(ruta, 'rb') as f:
+        especificacion = tomllib.load(f)
+
+    anclas = ({s['nombre'] for s in especificacion.get('seccion', [])}
+              | {l['nombre'] for l in especificacion.get('linea', [])})
+    for campo in especificacion.get('campo', []):
+        nombre = campo.get('nombre')
+        if campo.get('tipo') not in TIPOS_VALOR:
+            raise ValueError(f"{nombre}: tipo '{campo.get('tipo')}' no es uno de {TIPOS_VALOR}")
+        for alternativa in campo.get('alternativa', []):
+            llave = f"{nombre}/{alternativa.get('nombre')}"
+            if alternativa.get('ancla') is not None and alternativa['ancla'] not in anclas:
+                raise ValueError(f"{llave}: ancla desconocida '{alternativa['ancla']}'")
+            if not alternativa['patron'].isascii():
+                raise ValueError(f"{llave}: el patrón debe ser ASCII (se busca en la sombra sin acentos)")
+            try:
+                flags = _flags_de_nombres(alternativa.get('flags', []))
+                re.compile(alternativa['patron'], flags)
+                dividir_patron(alternativa['patron'])
+            except (re.error, AttributeError) as e:
+                raise ValueError(f"{llave}: patrón inválido ({e})")
+
+    for ancla in especificacion.get('seccion', []) + especificacion.get('linea', []):
+        if not ancla['patron'].isascii():
+            raise ValueError(f"{ancla['nombre']}: el patrón del ancla debe ser ASCII")
+    return especificacion
+
+
+def _flags_de_nombres(nombres: List[str]) -> int:
+    """Convierte ['IGNORECASE', 'DOTALL'] a los flags de `re`."""
+    flags = 0
+    for nombre in nombres:
+        flags |= getattr(re.RegexFlag, nombre)
+    return flags
+
+
+def aplicar_especificacion(especificacion: Dict):
+    """Compila las anclas y el registro de patrones a partir de la especificación."""
+    global VERSION_PATRONES, LONGITUD_MAXIMA_VENTANA, PATRON_ANCLAS, REGEX_ANCLAS
+    global _NOMBRES_LINEA, TOTAL_ANCLAS
+
+    ENCABEZADOS_SECCION[:] = [(s['nombre'], s['patron']) for s in especificacion.get('seccion', [])]
+    ANCLAS_LINEA[:] = [(l['nombre'], l['patron']) for l in especificacion.get('linea', [])]
+    VENTANAS_LINEA.clear()
+    VENTANAS_LINEA.update({l['nombre']: l.get('ventana', 400) for l in especificacion.get('linea', [])})
+    LONGITUD_MAXIMA_VENTANA = especificacion.get('ventana_maxima', LONGITUD_MAXIMA_VENTANA)
+
+    # Una sola expresión con todas las anclas: el índice se arma en una pasada.
+    # Los encabezados van primero para que, si se traslapan con un ancla de
+    # línea (p. ej. "DATOS DEL EMPLEO, CARGO O COMISIÓN"), gane el encabezado.
+    PATRON_ANCLAS = '|'.join(f'(?P<{nombre}>{patron})'
+                             for nombre, patron in ENCABEZADOS_SECCION + ANCLAS_LINEA)
+    REGEX_ANCLAS, _ = compilar(PATRON_ANCLAS)
+    _NOMBRES_LINEA = {nombre for nombre, _ in ANCLAS_LINEA}
+    TOTAL_ANCLAS = len(ENCABEZADOS_SECCION) + len(ANCLAS_LINEA)
+
+    REGISTRO.clear()
+    for campo in especificacion.get('campo', []):
+        for alternativa in campo.get('alternativa', []):
+            registrar(campo['nombre'], alternativa['nombre'], alternativa['patron'],
+                      _flags_de_nombres(alternativa.get('flags', [])),
+                      tipo=campo['tipo'], seccion=alternativa.get('ancla'))
+    CAMPOS_ADICIONALES[:] = [campo for campo in REGISTRO if campo != 'ingreso_anual_neto']
+
+    VERSION_PATRONES = especificacion['version']
+
+
+def recargar_especificacion(forzar: bool = False, ruta: Path = RUTA_ESPECIFICACION) -> bool:
+    """
+    Vuelve a compilar la especificación si el archivo cambió desde la última
+    carga. Si el archivo nuevo es inválido se conserva la especificación
+    anterior. Retorna True si se recargó.
+    """
+    global _MTIME_ESPECIFICACION
+
+    try:
+        mtime = ruta.stat().st_mtime_ns
+    except OSError as e:
+        if _MTIME_ESPECIFICACION is None:
+            raise
+        print(f"⚠ No se pudo leer {ruta.name}: {e}")
+        return False
+
+    if not forzar and mtime == _MTIME_ESPECIFICACION:
+        return False
+
+    try:
+        especificacion = cargar_especificacion(ruta)
+    except (ValueError, tomllib.TOMLDecodeError) as e:
+        if _MTIME_ESPECIFICACION is None:
+            raise
+        print(f"✗ {ruta.name} inválido, se conserva la versión {VERSION_PATRONES}: {e}")
+        _MTIME_ESPECIFICACION = mtime
+        return False
+
+    recarga = _MTIME_ESPECIFICACION is not None
+    aplicar_especificacion(especificacion)
+    _MTIME_ESPECIFICACION = mtime
+    if recarga:
+        print(f"✓ {ruta.name} recargado (versión {VERSION_PATRONES})")
+    return True
+
+
+recargar_especificacion()
+
+
+def campos_monto() -> List[str]:
+    """Campos cuyo valor es un monto (se extrae en centavos)."""
+    return [campo for campo, patrones in REGISTRO.items() if patrones[0].tipo == 'monto']
+
+
+def clave_valor(campo: str) -> str:
+    """Clave del valor extraído de un campo: los montos van como {campo}_centavos."""
+    return f'{campo}_centavos' if REGISTRO[campo][0].tipo == 'monto' else campo
+
+
+def convertir_valor(valor: str, tipo: str) -> Any:
+    """Convierte el texto capturado según el tipo del campo (montos a centavos)."""
+    if tipo == 'monto':
+        return monto_a_centavos(valor)
+    if tipo == 'texto':
+        return valor.strip()
+    return valor
+
+
+Texto = Union[str, TextoNormalizado]
+
+
+def _normalizado(texto: Texto) -> TextoNormalizado:
+    """Normaliza el texto si todavía no lo está."""
+    return texto if isinstance(texto, TextoNormalizado) else normalizar(texto)
+
+
+def extraer_campo(campo: str, texto: Texto,
+                  indice: Optional[Dict[str, Tuple[int, int]]] = None) -> Any:
+    """
+    Prueba las alternativas del campo en orden y retorna el primer valor.
+    Las posiciones se buscan en la sombra; el valor se toma del texto
+    normalizado, que conserva los acentos.
+    """
+    texto = _normalizado(texto)
+    if indice is None:
+        indice = indexar_secciones(texto.sombra)
+    for patron in REGISTRO[campo]:
+        posicion = patron.buscar(texto.sombra, indice)
+        if posicion is not None:
+            return convertir_valor(texto.texto[posicion[0]:posicion[1]], patron.tipo)
+    return None
+
+
+def extraer_ingreso_anual_neto(texto: Texto,
+                               indice: Optional[Dict[str, Tuple[int, int]]] = None) -> Optional[int]:
+    """Busca y extrae el ingreso anual neto (en centavos) del texto del PDF."""
+    if not texto:
+        return None
+    return extraer_campo('ingreso_anual_neto', texto, indice)
+
+
+def extraer_datos_adicionales(texto: Texto,
+                              indice: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict:
+    """Extrae información adicional del PDF para análisis futuro (montos en centavos)."""
+    if not texto:
+        return {clave_valor(campo): None for campo in CAMPOS_ADICIONALES}
+    texto = _normalizado(texto)
+    if indice is None:
+        indice = indexar_secciones(texto.sombra)
+    return {clave_valor(campo): extraer_campo(campo, texto, indice) for campo in CAMPOS_ADICIONALES}
+
+
+def extraer_campos(texto: str) -> Dict:
+    """
+    Extrae el ingreso anual neto y los datos adicionales en un solo diccionario,
+    normalizando e indexando el texto una sola vez. Las claves son las de
+    clave_valor (p. ej. 'ingreso_anual_neto_centavos').
+    """
+    recargar_especificacion()
+    normalizado = normalizar(texto) if texto else None
+    indice = indexar_secciones(normalizado.sombra) if normalizado else {}
+    datos = {clave_valor('ingreso_anual_neto'): extraer_ingreso_anual_neto(normalizado, indice)}
+    datos.update(extraer_datos_adicionales(normalizado, indice))
+    return datos
+
+
+def _prefijo_banderas(flags: int) -> str:
+    """Convierte flags de `re` al prefijo en línea del motor de Polars."""
+    letras = ''.join(letra for bandera, letra in
+                     ((re.IGNORECASE, 'i'), (re.DOTALL, 's'), (re.MULTILINE, 'm'))
+                     if flags & bandera)
+    return f'(?{letras})' if letras else ''
+
+
+def _expr_inicios(sombra: pl.Expr) -> Dict[str, pl.Expr]:
+    """
+    Posición de la primera aparición de cada ancla en la sombra (null si no
+    aparece). La sombra es ASCII, así que las posiciones en bytes que
+    reporta Polars coinciden con las de caracteres.
+    """
+    inicios = {nombre: sombra.str.find(patron) for nombre, patron in ENCABEZADOS_SECCION}
+    for nombre, etiqueta in ANCLAS_LINEA:
+        # Un encabezado que contiene la etiqueta (p. ej. "DATOS DEL EMPLEO,
+        # CARGO O COMISION") la consume en indexar_secciones; aquí se salta igual.
+        contenedores = '|'.join(p for _, p in ENCABEZADOS_SECCION if etiqueta in p)
+        if contenedores:
+            previo = sombra.str.extract(f'^(.*?(?:(?:{contenedores}).*?)??){etiqueta}', 1)
+            inicios[nombre] = previo.str.len_bytes()
+        else:
+            inicios[nombre] = sombra.str.find(etiqueta)
+    return inicios
+
+
+def _expr_ventanas(sombra: pl.Expr) -> List[pl.Expr]:
+    """Columnas _ini_{ancla} y _fin_{ancla} con las mismas ventanas que indexar_secciones."""
+    inicios = _expr_inicios(sombra)
+    largo = sombra.str.len_bytes()
+    columnas = []
+    for nombre, inicio in inicios.items():
+        if nombre in _NOMBRES_LINEA:
+            fin = pl.min_horizontal(inicio + VENTANAS_LINEA[nombre], largo)
+        else:
+            siguientes = [pl.when(otro > inicio).then(otro)
+                          for otro_nombre, otro in inicios.items()
+                          if otro_nombre != nombre and otro_nombre not in _NOMBRES_LINEA]
+            fin = pl.min_horizontal(*siguientes, inicio + LONGITUD_MAXIMA_VENTANA, largo)
+        columnas += [inicio.alias(f'_ini_{nombre}'), pl.when(inicio.is_not_null()).then(fin).alias(f'_fin_{nombre}')]
+    return columnas
+
+
+def _expr_valor(normalizado: pl.Expr, sombra: pl.Expr, patron: PatronCampo) -> pl.Expr:
+    """
+    Valor de una alternativa, ya convertido a su tipo. El patrón se busca en
+    la ventana de la sombra y el valor se toma de las mismas posiciones del
+    texto normalizado.
+    """
+    if patron.seccion is None:
+        inicio, ventana = pl.lit(0), sombra
+    else:
+        inicio = pl.col(f'_ini_{patron.seccion}')
+        ventana = sombra.str.slice(inicio, pl.col(f'_fin_{patron.seccion}') - inicio)
+
+    antes, grupo, despues = dividir_patron(patron.patron)
+    partes = ventana.str.extract_groups(
+        f'{_prefijo_banderas(patron.flags)}^(.*?(?:{antes}))({grupo}){despues}')
+    valor = normalizado.str.slice(inicio + partes.struct[0].str.len_bytes(),
+                                  partes.struct[1].str.len_bytes())
+
+    if patron.tipo == 'monto':
+        return expr_centavos(valor)
+    if patron.tipo == 'texto':
+        return valor.str.strip_chars()
+    return valor
+
+
+def extraer_campos_lote(df: pl.DataFrame, columna_texto: str = 'texto') -> pl.DataFrame:
+    """
+    Extrae todos los campos de un lote de declaraciones en una sola pasada
+    vectorizada de Polars.
+
+    Args:
+        df: DataFrame con `codigo_declaracion` y la columna de texto
+        columna_texto: Nombre de la columna con el texto del PDF
+
+    Retorna un DataFrame con `codigo_declaracion` y una columna por campo
+    (nombrada con clave_valor, montos en centavos Int64), con los mismos
+    valores que extraer_campos aplicada fila por fila. No
+    actualiza los contadores de aciertos.
+    """
+    recargar_especificacion()
+    normalizado, sombra = pl.col('_normalizado'), pl.col('_sombra')
+
+    campos = []
+    for campo in ['ingreso_anual_neto'] + CAMPOS_ADICIONALES:
+        alternativas = [_expr_valor(normalizado, sombra, p) for p in REGISTRO[campo]]
+        campos.append(pl.coalesce(alternativas).alias(clave_valor(campo)))
+
+    return (df.with_columns(nfc_columna(df[columna_texto]).alias('_nfc')).lazy()
+            .with_columns(expr_normalizar(pl.col('_nfc')).alias('_normalizado'))
+            .with_columns(expr_sombra(normalizado).alias('_sombra'))
+            .with_columns(_expr_ventanas(sombra))
+            .select(pl.col('codigo_declaracion'), *campos)
+            .collect())
+
+
+def configurar_motor(motor: str):
+    """
+    Recompila todos los patrones con el motor indicado ('re' o 're2').
+    Los patrones que RE2 no soporta se quedan con `re`.
+    """
+    global MOTOR_REGEX, REGEX_ANCLAS
+
+    if motor == 're2':
+        try:
+            import re2  # noqa: F401
+        except ImportError:
+            print("⚠ RE2 no disponible, se usa re (instala google-re2: pip install google-re2)")
+            motor = 're'
+
+    MOTOR_REGEX = motor
+    REGEX_ANCLAS, _ = compilar(PATRON_ANCLAS)
+    for patrones in REGISTRO.values():
+        for patron in patrones:
+            patron.regex, patron.motor = compilar(patron.patron, patron.flags)
+
+    en_re = [f"{p.campo}/{p.nombre}" for ps in REGISTRO.values() for p in ps if p.motor != motor]
+    print(f"✓ Motor de patrones: {motor}")
+    if en_re:
+        print(f"  ℹ Con re por construcciones no soportadas: {', '.join(en_re)}")
+
+
+def textos_adversariales(tamanio: int = 200_000) -> Dict[str, str]:
+    """
+    Textos que hacen retroceder mucho a los patrones con `.*?`: anclas
+    repetidas sin el valor que esperan y sin los encabezados que cierran
+    la ventana.
+    """
+    return {
+        'anclas_repetidas': 'INGRESO ANUAL NETO ' * (tamanio // 19),
+        'numeral_sin_monto': ('A. INGRESO ANUAL NETO DEL DECLARANTE NUMERAL I Y II ' * (tamanio // 52)),
+        'prestaciones_sin_monto': 'I. REMUNERACIÓN ANUAL NETA ' + 'PRESTACIONES ' * (tamanio // 13),
+        'etiqueta_sin_fin': 'EMPLEO, CARGO O COMISIÓN ' + 'A' * tamanio,
+    }
+
+
+def _medir_motores(textos: Dict[str, str], repeticiones: int) -> Tuple[Dict[str, Dict[str, float]],
+                                                                     Dict[str, Dict[str, Dict]]]:
+    """
+    Extrae los campos de cada texto con `re` y con RE2 (si está instalado).
+    Retorna (tiempos, salidas) por motor y por texto. Al terminar deja el
+    motor como estaba.
+    """
+    motor_original = MOTOR_REGEX
+    tiempos: Dict[str, Dict[str, float]] = {}
+    salidas: Dict[str, Dict[str, Dict]] = {}
+
+    for motor in ('re', 're2'):
+        configurar_motor(motor)
+        if MOTOR_REGEX != motor:
+            continue
+        tiempos[motor], salidas[motor] = {}, {}
+        for nombre, texto in textos.items():
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                salidas[motor][nombre] = extraer_campos(texto)
+            tiempos[motor][nombre] = (time.perf_counter() - inicio) / repeticiones
+
+    configurar_motor(motor_original)
+    return tiempos, salidas
+
+
+def comparar_motores(textos: Dict[str, str], repeticiones: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Compara `re` contra RE2 sobre los textos dados ({nombre: texto}).
+    Verifica que ambos motores extraigan los mismos campos y reporta el
+    tiempo total por motor.
+    """
+    tiempos, salidas = _medir_motores(textos, repeticiones)
+
+    print("\n" + "="*60)
+    print("COMPARACIÓN DE MOTORES DE REGEX")
+    print("="*60)
+    for motor, por_texto in tiempos.items():
+        total = sum(por_texto.values())
+        peor = max(por_texto, key=por_texto.get) if por_texto else None
+        print(f"{motor:>4}: total {total*1000:,.1f} ms | peor: {peor} ({por_texto.get(peor, 0)*1000:,.1f} ms)")
+
+    if len(salidas) == 2:
+        distintos = [n for n in textos if salidas['re'][n] != salidas['re2'][n]]
+        if distintos:
+            print(f"⚠ Resultados distintos entre motores en {len(distintos)} textos: {distintos[:5]}")
+        else:
+            print(f"✓ Ambos motores extraen los mismos campos en {len(textos)} textos")
+
+    return tiempos
+
+
+def contadores_aciertos() -> Dict[str, int]:
+    """Aciertos acumulados por patrón, con llave 'campo/nombre'."""
+    return {f"{p.campo}/{p.nombre}": p.aciertos
+            for patrones in REGISTRO.values() for p in patrones}
+
+
+def mostrar_aciertos():
+    """Muestra cuántas veces ha encontrado valor cada patrón."""
+    print(f"\nPatrones (versión {VERSION_PATRONES}):")
+    for llave, aciertos in contadores_aciertos().items():
+        print(f"  {llave:<45} {aciertos:>6} aciertos")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serialización compacta de registros de metadatos.
+
+- a_json / de_json: JSON en una línea con orjson si está instalado
+  (pip install orjson), si no con json de la biblioteca estándar.
+- EscritorSegmentos: escribe registros como JSON Lines en segmentos
+  metadatos_NNNNNN.jsonl de hasta REGISTROS_POR_SEGMENTO líneas. Cada
+  segmento se escribe en un temporal, se fuerza a disco una sola vez
+  (fsync) y se renombra: una caída nunca deja un segmento a medias.
+  Con reemplazar=True (exportación completa) los segmentos nuevos se
+  escriben aparte y sustituyen a los anteriores solo al terminar.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+REGISTROS_POR_SEGMENTO = 1000
+PREFIJO_SEGMENTO = "metadatos_"
+# Juego de segmentos que reemplaza al actual y la marca de que está completo
+DIRECTORIO_REEMPLAZO = ".segmentos_nuevos"
+MARCA_COMPLETO = "COMPLETO"
+
+
+def a_json(datos: Any) -> str:
+    """Registro -> JSON en una línea (UTF-8 sin escapar; lo no serializable como str)."""
+    if orjson is not None:
+        return orjson.dumps(datos, default=str).decode('utf-8')
+    return json.dumps(datos, ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+def de_json(texto) -> Any:
+    """JSON (str o bytes) -> registro."""
+    if orjson is not None:
+        return orjson.loads(texto)
+    return json.loads(texto)
+
+
+def _fsync_directorio(directorio: Path):
+    """Hace durable el renombrado (no aplica en Windows)."""
+    if os.name != 'posix':
+        return
+    descriptor = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _numero_segmento(ruta: Path) -> int:
+    return int(ruta.stem.removeprefix(PREFIJO_SEGMENTO))
+
+
+def _publicar_reemplazo(directorio: Path, descartar_incompleto: bool = True):
+    """
+    Termina un reemplazo pendiente en `directorio`: si el juego nuevo quedó
+    completo (tiene la marca) sustituye a los segmentos anteriores; si no,
+    se descarta (con `descartar_incompleto`; un lector no lo toca, porque
+    puede ser una exportación en curso). Se puede repetir tras una caída a
+    media publicación.
+    """
+    nuevo = directorio / DIRECTORIO_REEMPLAZO
+    if not nuevo.exists():
+        return
+    marca = nuevo / MARCA_COMPLETO
+    if marca.exists():
+        total = int(marca.read_text(encoding='utf-8'))
+        for ruta in sorted(nuevo.glob(f"{PREFIJO_SEGMENTO}*.jsonl")):
+            os.replace(ruta, directorio / ruta.name)
+        for ruta in directorio.glob(f"{PREFIJO_SEGMENTO}*.jsonl"):
+            if _numero_segmento(ruta) >= total:
+                ruta.unlink()
+        _fsync_directorio(directorio)
+    elif not descartar_incompleto:
+        return
+    shutil.rmtree(nuevo)
+
+
+class EscritorSegmentos:
+    """
+    Acumula registros y los escribe por segmentos JSON Lines atómicos. Con
+    reemplazar=True los segmentos anteriores del directorio se sustituyen
+    (de una vez, al cerrar) en lugar de continuar su numeración.
+    """
+
+    def __init__(self, directorio: Path, registros_por_segmento: int = REGISTROS_POR_SEGMENTO,
+                 reemplazar: bool = False):
+        self.destino = Path(directorio)
+        self.destino.mkdir(parents=True, exist_ok=True)
+        _publicar_reemplazo(self.destino)
+        self.reemplazar = reemplazar
+        self.registros_por_segmento = registros_por_segmento
+        self._lineas: List[str] = []
+        self.escritos = 0
+        if reemplazar:
+            self.directorio = self.destino / DIRECTORIO_REEMPLAZO
+            self.directorio.mkdir()
+            self._siguiente = 0
+        else:
+            self.directorio = self.destino
+            segmentos = sorted(self.directorio.glob(f"{PREFIJO_SEGMENTO}*.jsonl"))
+            self._siguiente = _numero_segmento(segmentos[-1]) + 1 if segmentos else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *_):
+        if tipo is not None and self.reemplazar:
+            # Exportación interrumpida: los segmentos anteriores se conservan
+            shutil.rmtree(self.directorio, ignore_errors=True)
+            return
+        self.cerrar()
+
+    def agregar(self, datos: Dict[str, Any]):
+        self._lineas.append(a_json(datos))
+        if len(self._lineas) >= self.registros_por_segmento:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe lo acumulado como un segmento nuevo."""
+        if not self._lineas:
+            return
+        ruta = self.directorio / f"{PREFIJO_SEGMENTO}{self._siguiente:06d}.jsonl"
+        temporal = ruta.with_name(ruta.name + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self._lineas) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+        _fsync_directorio(self.directorio)
+        self._siguiente += 1
+        self.escritos += len(self._lineas)
+        self._lineas.clear()
+
+    def cerrar(self):
+        self.vaciar()
+        if not self.reemplazar or not self.directorio.exists():
+            return
+        marca = self.directorio / MARCA_COMPLETO
+        with open(marca, 'w', encoding='utf-8') as f:
+            f.write(str(self._siguiente))
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_directorio(self.directorio)
+        _publicar_reemplazo(self.destino)
+
+
+def leer_segmentos(directorio: Path) -> Iterator[Dict[str, Any]]:
+    """Registros de todos los segmentos de un directorio, en orden de escritura."""
+    directorio = Path(directorio)
+    if directorio.exists():
+        _publicar_reemplazo(directorio, descartar_incompleto=False)
+    for ruta in sorted(directorio.glob(f"{PREFIJO_SEGMENTO}*.jsonl")):
+        with open(ruta, 'rb') as f:
+            for linea in f:
+                if linea.strip():
+                    yield de_json(linea)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura incremental de los resultados de una corrida en Parquet.
+
+En lugar de juntar todos los resultados en una lista y escribirlos al
+final, cada lote de TAMANO_LOTE filas se escribe como un archivo
+parte_NNNNNN.parquet dentro del directorio de la corrida, con un esquema
+fijo (esquema.esquema_resultados). La memoria no crece con el tamaño de la
+corrida y, mientras corre, lo ya terminado se puede leer con
+leer_resultados_corrida() (o pl.scan_parquet sobre el directorio).
+
+Cada parte se escribe en un temporal y se renombra, así que un lector
+nunca ve un archivo a medias.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import polars as pl
+
+from esquema import ResultadoDeclaracion, a_dataframe, esquema_resultados
+
+DIRECTORIO_RESULTADOS_CORRIDA = Path("corridas") / "resultados"
+TAMANO_LOTE = 25
+
+
+class SumideroParquet:
+    """Acumula filas y las escribe por lotes como partes Parquet de una corrida."""
+
+    def __init__(self, directorio: Path = DIRECTORIO_RESULTADOS_CORRIDA,
+                 tamano_lote: int = TAMANO_LOTE):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.tamano_lote = tamano_lote
+        self._lote: List[Union[ResultadoDeclaracion, Dict[str, Any]]] = []
+        partes = sorted(self.directorio.glob("parte_*.parquet"))
+        self._siguiente = int(partes[-1].stem.split('_')[1]) + 1 if partes else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def agregar(self, fila: Union[ResultadoDeclaracion, Dict[str, Any]]):
+        self._lote.append(fila)
+        if len(self._lote) >= self.tamano_lote:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe el lote pendiente como una parte nueva."""
+        if not self._lote:
+            return
+        ruta = self.directorio / f"parte_{self._siguiente:06d}.parquet"
+        temporal = ruta.with_suffix('.tmp')
+        a_dataframe(self._lote).write_parquet(temporal)
+        os.replace(temporal, ruta)
+        self._siguiente += 1
+        self._lote.clear()
+
+    def cerrar(self):
+        self.vaciar()
+
+    def codigos_escritos(self) -> set:
+        """Códigos que ya están en alguna parte de la corrida."""
+        return set(leer_resultados_corrida(self.directorio, perezoso=True)
+                   .select('codigo_declaracion').collect()['codigo_declaracion'].to_list())
+
+
+def leer_resultados_corrida(directorio: Path = DIRECTORIO_RESULTADOS_CORRIDA,
+                            perezoso: bool = False):
+    """
+    Resultados escritos hasta ahora en una corrida (en curso o terminada).
+    Si una declaración aparece más de una vez, se queda la última fila.
+    """
+    partes = sorted(Path(directorio).glob("parte_*.parquet"))
+    if partes:
+        # Con el esquema actual: si campos.toml cambió a media corrida, las
+        # partes anteriores reciben nulos en los campos nuevos
+        lf = (pl.scan_parquet(partes, schema=esquema_resultados(),
+                              missing_columns='insert', extra_columns='ignore')
+              .unique(subset='codigo_declaracion', keep='last', maintain_order=True))
+    else:
+        lf = pl.LazyFrame(schema=esquema_resultados())
+    return lf if perezoso else lf.collect()
+
+
+def archivar_corrida(directorio: Path = DIRECTORIO_RESULTADOS_CORRIDA,
+                     sufijo: Optional[str] = None):
+    """Mueve las partes de la corrida anterior a {directorio}_{sufijo} para empezar una nueva."""
+    directorio = Path(directorio)
+    if directorio.exists() and any(directorio.glob("parte_*.parquet")):
+        sufijo = sufijo or f"{datetime.now():%Y%m%d_%H%M%S}"
+        os.replace(directorio, directorio.with_name(f"{directorio.name}_{sufijo}"))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supervisor para ejecutar la extracción de cada PDF en un proceso aparte.
+
+Un PDF malformado o enorme puede colgar a pdfplumber indefinidamente.
+Aquí cada llamada corre en un proceso hijo con límite de tiempo y de
+memoria; si se excede, el hijo se mata y se lanza ExtraccionAbortada
+para que el lote continúe con el siguiente documento.
+
+El límite de memoria cuenta solo lo que el hijo agrega (memoria privada,
+USS): las páginas que comparte con el proceso padre tras el fork, p. ej.
+los DataFrames de una sesión de Spyder, no cuentan.
+"""
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Optional
+
+from exportacion import esperar_escrituras
+
+# Límites por documento
+TIEMPO_MAXIMO_S = 120
+MEMORIA_MAXIMA_MB = 1536
+
+# Prefijo con el que se registra el error en los resultados
+ERROR_EXTRACCION_ABORTADA = 'Extracción abortada'
+
+
+class ExtraccionAbortada(Exception):
+    """El documento excedió el tiempo o la memoria permitidos."""
+
+    def __init__(self, motivo: str, detalle: str = ''):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.detalle = detalle
+
+    def mensaje_error(self) -> str:
+        """Texto para la columna `error` de los resultados."""
+        return f"{ERROR_EXTRACCION_ABORTADA}: {self.motivo}"
+
+
+def _memoria_rss_mb(pid: int) -> Optional[float]:
+    """RSS del proceso en MB, o None si no se puede medir."""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _memoria_propia_mb(pid: int) -> Optional[float]:
+    """Memoria privada (USS) del proceso en MB, o None si no se puede medir."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            return sum(int(linea.split()[1]) for linea in f
+                       if linea.startswith(('Private_Clean:', 'Private_Dirty:'))) / 1024
+    except OSError:
+        pass
+
+    try:
+        import psutil
+        return psutil.Process(pid).memory_full_info().uss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _trabajador(emisor, funcion: Callable, args: tuple, kwargs: dict):
+    """Ejecuta la función en el proceso hijo y envía el resultado."""
+    try:
+        emisor.send(('ok', funcion(*args, **kwargs)))
+    except Exception as e:
+        emisor.send(('error', e))
+    finally:
+        emisor.close()
+
+
+def _terminar(proceso):
+    """Mata el proceso hijo y espera a que salga."""
+    if proceso.is_alive():
+        proceso.kill()
+    proceso.join(timeout=5)
+
+
+def ejecutar_supervisado(funcion: Callable, *args,
+                         tiempo_maximo: Optional[float] = TIEMPO_MAXIMO_S,
+                         memoria_maxima_mb: Optional[float] = MEMORIA_MAXIMA_MB,
+                         intervalo: float = 0.2,
+                         **kwargs) -> Any:
+    """
+    Ejecuta funcion(*args, **kwargs) en un proceso hijo vigilado.
+
+    Args:
+        funcion: Función a ejecutar (p. ej. extraer_texto_pdf o validar_pdf)
+        tiempo_maximo: Segundos de reloj permitidos (None para no limitar)
+        memoria_maxima_mb: Memoria que puede agregar el hijo, en MB (None para no limitar)
+        intervalo: Cada cuántos segundos revisar al hijo
+
+    Retorna lo que retorne la función. Lanza ExtraccionAbortada si el hijo
+    excede un límite o muere sin responder.
+    """
+    # fork evita tener que serializar la función (las celdas de Spyder
+    # definen funciones en __main__); en Windows solo existe spawn.
+    metodo = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    contexto = multiprocessing.get_context(metodo)
+    if metodo == 'fork':
+        # Hacer fork con otro hilo escribiendo (el XLSX de exportacion) no es seguro
+        esperar_escrituras()
+        # Sin USS se descuenta del RSS del hijo lo que ya tenía el padre
+        base_rss = _memoria_rss_mb(os.getpid()) or 0.0
+    else:
+        base_rss = 0.0
+
+    receptor, emisor = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(target=_trabajador, args=(emisor, funcion, args, kwargs), daemon=True)
+    proceso.start()
+    emisor.close()
+
+    inicio = time.monotonic()
+    try:
+        while True:
+            # poll() también regresa True si el hijo cerró la tubería al morir
+            if receptor.poll(intervalo):
+                try:
+                    estado, valor = receptor.recv()
+                except EOFError:
+                    proceso.join(timeout=5)
+                    raise ExtraccionAbortada(
+                        'proceso terminado',
+                        f"el proceso de extracción salió con código {proceso.exitcode}")
+                break
+
+            transcurrido = time.monotonic() - inicio
+            if tiempo_maximo is not None and transcurrido > tiempo_maximo:
+                _terminar(proceso)
+                raise ExtraccionAbortada(
+                    'tiempo excedido', f"{transcurrido:.1f}s > {tiempo_maximo}s")
+
+            if memoria_maxima_mb is not None:
+                memoria = _memoria_propia_mb(proceso.pid)
+                if memoria is None:
+                    rss = _memoria_rss_mb(proceso.pid)
+                    memoria = None if rss is None else rss - base_rss
+                if memoria is not None and memoria > memoria_maxima_mb:
+                    _terminar(proceso)
+                    raise ExtraccionAbortada(
+                        'memoria excedida', f"{memoria:.0f} MB > {memoria_maxima_mb} MB")
+    finally:
+        receptor.close()
+        proceso.join(timeout=1)
+        _terminar(proceso)
+
+    if estado == 'error':
+        raise valor
+    return valor
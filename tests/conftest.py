@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración común de las pruebas.
+
+Los módulos usan rutas relativas (cache_extraccion/, declaraciones.sqlite,
+...), así que cada prueba corre en su propio directorio temporal. Los PDFs
+de prueba se generan con reportlab con el formato de DeclaraNet.
+"""
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PAGINA_GENERALES = [
+    "DECLARACION DE SITUACION PATRIMONIAL",
+    "FECHA DE RECEPCIÓN: 15/05/2024",
+    "DATOS GENERALES",
+    "NOMBRE: JUAN PEREZ",
+]
+PAGINA_ENCARGO = [
+    "DATOS DEL EMPLEO, CARGO O COMISIÓN",
+    "NOMBRE DEL ENTE PÚBLICO CENTRO DE INVESTIGACION Y DOCENCIA ECONOMICAS, A.C.",
+    "ÁREA DE ADSCRIPCIÓN DIVISION",
+    "EMPLEO, CARGO O COMISIÓN PROFESOR INVESTIGADOR TITULAR",
+    "NIVEL DEL EMPLEO 123",
+]
+PAGINA_INGRESOS = [
+    "INGRESOS NETOS DEL DECLARANTE, PAREJA Y/O DEPENDIENTES ECONÓMICOS",
+    "I. REMUNERACIÓN ANUAL NETA DEL DECLARANTE POR SU CARGO PÚBLICO (POR CONCEPTO DE SUELDOS,",
+    "HONORARIOS, COMPENSACIONES, BONOS, AGUINALDOS Y OTRAS PRESTACIONES) (CANTIDADES NETAS 1,234,567",
+    "DESPUÉS DE IMPUESTOS)",
+    "II. OTROS INGRESOS DEL DECLARANTE (SUMA DEL II.1 AL II.5) 45,000",
+    "II.1 ACTIVIDAD INDUSTRIAL, COMERCIAL Y/O EMPRESARIAL (DESPUÉS DE IMPUESTOS) 0",
+    "II.2 ACTIVIDAD FINANCIERA (RENDIMIENTOS O GANANCIAS) (DESPUÉS DE IMPUESTOS) 5,000",
+    "II.3 SERVICIOS PROFESIONALES, CONSEJOS, CONSULTORÍAS Y/O ASESORÍAS (DESPUÉS DE IMPUESTOS) 40,000",
+    "II.4 ENAJENACIÓN DE BIENES (DESPUÉS DE IMPUESTOS) 0",
+    "II.5 OTROS INGRESOS NO CONSIDERADOS A LOS ANTERIORES (DESPUÉS DE IMPUESTOS) 0",
+    "A. INGRESO ANUAL NETO DEL DECLARANTE (SUMA DEL NUMERAL I Y II) 1,279,567",
+    "B. INGRESO ANUAL NETO DE LA PAREJA Y/O DEPENDIENTES ECONÓMICOS (DESPUÉS DE IMPUESTOS) 0",
+    "C. TOTAL DE INGRESOS ANUALES NETOS PERCIBIDOS POR EL DECLARANTE, PAREJA Y/O DEPENDIENTES",
+    "ECONÓMICOS (SUMA DE LOS APARTADOS A Y B) 1,279,567",
+]
+PAGINA_RELLENO = ["BIENES INMUEBLES", "TIPO DE INMUEBLE: CASA", "VALOR DE ADQUISICIÓN: 100,000"]
+
+# Valores en centavos de PAGINA_INGRESOS
+INGRESO_ANUAL_NETO_CENTAVOS = 127956700
+
+
+@pytest.fixture(autouse=True)
+def directorio_trabajo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def crear_pdf(tmp_path):
+    """Función (nombre, páginas) -> ruta de un PDF con una lista de renglones por página."""
+    pytest.importorskip("reportlab")
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    def crear(nombre: str, paginas: List[List[str]]) -> Path:
+        ruta = tmp_path / nombre
+        lienzo = canvas.Canvas(str(ruta), pagesize=letter)
+        for renglones in paginas:
+            y = 750
+            for renglon in renglones:
+                lienzo.drawString(40, y, renglon)
+                y -= 14
+            lienzo.showPage()
+        lienzo.save()
+        return ruta
+
+    return crear
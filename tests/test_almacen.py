@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from almacen import Almacen
+
+
+def _registro(codigo, **datos):
+    return {'codigo_declaracion': codigo, 'url': f'http://x/{codigo}', 'datos_extraidos': True,
+            **datos}
+
+
+@pytest.fixture
+def almacen(directorio_trabajo):
+    almacen = Almacen(directorio_trabajo / 'declaraciones.sqlite', tamano_lote=10)
+    yield almacen
+    almacen.cerrar()
+
+
+def test_lo_pendiente_se_lee_como_se_guardo(almacen):
+    datos = _registro('A', ingreso_anual_neto_centavos=123456)
+    almacen.guardar(datos)
+    datos['ingreso_anual_neto_centavos'] = 1
+
+    assert almacen.cargar('A')['ingreso_anual_neto_centavos'] == 123456
+    almacen.confirmar()
+    assert almacen.cargar('A')['ingreso_anual_neto_centavos'] == 123456
+
+
+def test_confirma_por_lotes(almacen, directorio_trabajo):
+    for i in range(9):
+        almacen.guardar(_registro(f'C{i}'))
+    with Almacen(directorio_trabajo / 'declaraciones.sqlite') as otro:
+        assert len(otro) == 0
+
+    almacen.registrar_intento('C0', 'descarga', True)
+    with Almacen(directorio_trabajo / 'declaraciones.sqlite') as otro:
+        assert len(otro) == 9
+        intentos = otro.consultar("SELECT etapa, exito FROM intentos")
+    assert intentos.rows() == [('descarga', 1)]
+
+
+def test_guardar_reemplaza_el_registro_y_sus_campos(almacen):
+    almacen.guardar(_registro('A', ingreso_anual_neto_centavos=100, cargo='PROFESOR'))
+    almacen.confirmar()
+    almacen.guardar(_registro('A', ingreso_anual_neto_centavos=250))
+
+    campos = almacen.consultar("SELECT campo, valor, centavos FROM campos ORDER BY campo")
+
+    assert campos.rows() == [('ingreso_anual_neto', '2.50', 250)]
+    assert len(almacen) == 1
+
+
+def test_montos_en_pesos_de_registros_anteriores(almacen):
+    almacen.guardar(_registro('A', ingreso_anual_neto=1279567.0))
+
+    campos = almacen.consultar("SELECT valor, centavos FROM campos WHERE campo = 'ingreso_anual_neto'")
+
+    assert campos.rows() == [('1279567.00', 127956700)]
+
+
+def test_busquedas_por_url_digest_y_campo_faltante(almacen):
+    almacen.guardar(_registro('A', digest_pdf='d1', ingreso_anual_neto_centavos=100))
+    almacen.guardar(_registro('B', digest_pdf='d1', error='Error al extraer texto del PDF'))
+
+    assert almacen.buscar_url('http://x/B')['codigo_declaracion'] == 'B'
+    assert almacen.buscar_url('http://x/Z') is None
+    assert sorted(almacen.buscar_digest('d1')) == ['A', 'B']
+    assert almacen.sin_campo()['codigo_declaracion'].to_list() == ['B']
+
+
+def test_exportar_e_importar_json(almacen, directorio_trabajo):
+    registros = [_registro('A', ingreso_anual_neto_centavos=100, nombre='JOSÉ'), _registro('B')]
+    for datos in registros:
+        almacen.guardar(datos)
+
+    assert almacen.exportar_json(directorio_trabajo / 'json') == 2
+    with Almacen(directorio_trabajo / 'otro.sqlite') as otro:
+        assert otro.importar_json(directorio_trabajo / 'json') == 2
+        assert otro.registros() == registros
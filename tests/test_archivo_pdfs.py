@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+from conftest import PAGINA_GENERALES, PAGINA_INGRESOS
+
+import archivo_pdfs
+import cide
+from almacen import Almacen
+from archivo_pdfs import (ArchivoPDF, DocumentoArchivado, abrir_documento, fuente_pdf, pdf_disponible,
+                          ubicacion_pdf)
+
+ARCHIVO = Path('archivo_pdfs')
+PDFS = Path('declaraciones_pdfs')
+
+
+@pytest.fixture(autouse=True)
+def archivos_del_proceso(monkeypatch):
+    """abrir_archivo guarda un ArchivoPDF por directorio: cada prueba tiene los suyos."""
+    abiertos = {}
+    monkeypatch.setattr(archivo_pdfs, '_ARCHIVOS', abiertos)
+    yield
+    for archivo in abiertos.values():
+        archivo.cerrar()
+
+
+@pytest.fixture
+def sueltos():
+    """Un PDF comprimible, uno que no lo es y una copia del primero."""
+    PDFS.mkdir()
+    contenidos = {
+        'A.pdf': b'%PDF-1.4 ' + b'texto repetido ' * 2000,
+        'B.pdf': b'%PDF-1.4 ' + os.urandom(30_000),
+        'C.pdf': b'%PDF-1.4 ' + b'texto repetido ' * 2000,
+    }
+    for nombre, datos in contenidos.items():
+        (PDFS / nombre).write_bytes(datos)
+    return contenidos
+
+
+def test_migrar_y_leer_los_mismos_bytes(sueltos):
+    with ArchivoPDF(ARCHIVO, tamano_segmento=20_000) as archivo:
+        assert archivo.migrar(PDFS, borrar=True) == 3
+
+        for nombre, datos in sueltos.items():
+            assert archivo.leer(nombre) == datos
+            assert archivo.digest(nombre) == hashlib.sha256(datos).hexdigest()
+        conteo = archivo.resumen()
+
+    assert not list(PDFS.iterdir())
+    assert conteo['documentos'] == 3
+    assert conteo['contenidos'] == 2
+    assert conteo['bytes_guardados'] < conteo['bytes_originales']
+    assert conteo['segmentos'] == 2
+
+
+def test_documento_tipo_archivo(sueltos):
+    with ArchivoPDF(ARCHIVO) as archivo:
+        archivo.migrar(PDFS)
+        for nombre in ('A.pdf', 'B.pdf'):
+            with archivo.abrir(nombre) as documento:
+                assert documento.read(9) == b'%PDF-1.4 '
+                documento.seek(-5, os.SEEK_END)
+                assert documento.read() == sueltos[nombre][-5:]
+                assert documento.tell() == len(sueltos[nombre])
+            assert documento.closed
+        assert archivo.abrir('Z.pdf') is None
+
+
+def test_agregar_sin_confirmar_se_lee_y_extrae(sueltos):
+    with ArchivoPDF(ARCHIVO) as archivo:
+        archivo.agregar_archivo(PDFS / 'B.pdf')
+        assert archivo.extraer('B.pdf', Path('recuperado.pdf'))
+        assert not archivo.extraer('Z.pdf', Path('otro.pdf'))
+    assert Path('recuperado.pdf').read_bytes() == sueltos['B.pdf']
+
+
+def test_fuente_pdf_prefiere_el_archivo_suelto(sueltos):
+    with ArchivoPDF(ARCHIVO) as archivo:
+        archivo.migrar(PDFS)
+    (PDFS / 'B.pdf').unlink()
+
+    suelto = fuente_pdf('A', PDFS, ARCHIVO)
+    archivado = fuente_pdf('B', PDFS, ARCHIVO)
+
+    assert suelto == PDFS / 'A.pdf' and ubicacion_pdf(suelto) == str(PDFS / 'A.pdf')
+    assert isinstance(archivado, DocumentoArchivado) and ubicacion_pdf(archivado) == 'archivo:B'
+    assert archivado.read() == sueltos['B.pdf']
+    archivado.close()
+    assert fuente_pdf('Z', PDFS, ARCHIVO) is None
+    assert pdf_disponible('A', PDFS, ARCHIVO) and pdf_disponible('B', PDFS, ARCHIVO)
+    assert not pdf_disponible('Z', PDFS, ARCHIVO)
+    assert not pdf_disponible('B', PDFS, Path('sin_archivo'))
+
+
+def test_documento_se_reabre_al_serializarse(sueltos):
+    with ArchivoPDF(ARCHIVO) as archivo:
+        archivo.migrar(PDFS)
+
+    documento = abrir_documento(ARCHIVO, 'A.pdf')
+    documento.read(100)
+    copia = pickle.loads(pickle.dumps(documento))
+
+    assert copia is not documento and copia.tell() == 0
+    assert copia.read() == sueltos['A.pdf']
+    assert copia.digest_pdf == documento.digest_pdf
+    documento.close()
+    copia.close()
+
+
+def test_cide_cierra_el_documento_archivado(crear_pdf, monkeypatch):
+    fila = {'nombre': 'JUAN', 'primer_apellido': 'PEREZ', 'segundo_apellido': 'L', 'url': 'http://x/1'}
+    codigo = cide.generar_codigo_declaracion('JUAN', 'PEREZ', 'L', 'http://x/1')
+    with ArchivoPDF() as archivo:
+        archivo.agregar(f"{codigo}.pdf", crear_pdf('d.pdf', [PAGINA_GENERALES, PAGINA_INGRESOS]).read_bytes())
+    almacen = Almacen(Path('declaraciones.sqlite'))
+    monkeypatch.setattr(cide, 'ALMACEN', almacen)
+    abiertos = []
+
+    def fuente_registrada(*args, **kwargs):
+        abiertos.append(fuente_pdf(*args, **kwargs))
+        return abiertos[-1]
+
+    monkeypatch.setattr(cide, 'fuente_pdf', fuente_registrada)
+    try:
+        resultado = cide.procesar_declaracion(fila)
+        cide.reprocesar(forzar=True)
+    finally:
+        almacen.cerrar()
+
+    assert resultado.ruta_pdf == f'archivo:{codigo}'
+    assert resultado.datos_extraidos
+    assert len(abiertos) == 3
+    assert all(isinstance(documento, DocumentoArchivado) and documento.closed for documento in abiertos)
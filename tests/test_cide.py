@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+
+import polars as pl
+import pytest
+from conftest import (INGRESO_ANUAL_NETO_CENTAVOS, PAGINA_ENCARGO, PAGINA_GENERALES,
+                      PAGINA_INGRESOS, PAGINA_RELLENO)
+
+import cide
+from almacen import Almacen
+from extraccion_pdf import DIRECTORIO_CACHE_TABLAS
+from sumidero import DIRECTORIO_RESULTADOS_CORRIDA
+
+FILA = {'nombre': 'JUAN', 'primer_apellido': 'PEREZ', 'segundo_apellido': 'L', 'url': 'http://x/1'}
+
+
+@pytest.fixture
+def almacen(directorio_trabajo, monkeypatch):
+    """Almacén propio de la prueba (cide abre el suyo al importarse)."""
+    almacen = Almacen(directorio_trabajo / 'declaraciones.sqlite')
+    monkeypatch.setattr(cide, 'ALMACEN', almacen)
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.fixture
+def declaracion(crear_pdf, directorio_trabajo):
+    """Código de FILA con su PDF en declaraciones_pdfs/."""
+    codigo = cide.generar_codigo_declaracion(FILA['nombre'], FILA['primer_apellido'],
+                                             FILA['segundo_apellido'], FILA['url'])
+    ruta = crear_pdf('decl.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO, PAGINA_INGRESOS, PAGINA_RELLENO])
+    cide.DIRECTORIO_PDFS.mkdir(exist_ok=True)
+    shutil.copy(ruta, cide.DIRECTORIO_PDFS / f"{codigo}.pdf")
+    return codigo
+
+
+def _desactualizar(almacen, codigo):
+    registro = almacen.cargar(codigo)
+    registro['version_patrones'] = 0
+    almacen.guardar(registro)
+    almacen.confirmar()
+
+
+def test_reaplicar_conserva_los_montos_de_la_tabla(almacen, declaracion):
+    resultado = cide.procesar_declaracion(FILA, tabla_ingresos=True)
+    assert resultado.get('ingreso_anual_neto_centavos') == INGRESO_ANUAL_NETO_CENTAVOS
+
+    # La tabla en caché difiere de lo que dan los patrones sobre el texto
+    ruta_tabla = DIRECTORIO_CACHE_TABLAS / f"{resultado.digest_pdf}.json"
+    filas = json.loads(ruta_tabla.read_text(encoding='utf-8'))
+    for fila in filas:
+        if fila['numeral'] == 'A':
+            fila['monto_centavos'] = 100
+    ruta_tabla.write_text(json.dumps(filas), encoding='utf-8')
+    _desactualizar(almacen, declaracion)
+
+    cide.reaplicar_especificacion()
+
+    registro = almacen.cargar(declaracion)
+    assert registro['ingreso_anual_neto_centavos'] == 100
+    assert registro['version_patrones'] == cide.patrones.VERSION_PATRONES
+
+
+def test_reaplicar_deja_para_reprocesar_si_no_hay_tabla_en_cache(almacen, declaracion, capsys):
+    resultado = cide.procesar_declaracion(FILA, tabla_ingresos=True)
+    (DIRECTORIO_CACHE_TABLAS / f"{resultado.digest_pdf}.json").unlink()
+    _desactualizar(almacen, declaracion)
+
+    cide.reaplicar_especificacion()
+
+    assert almacen.cargar(declaracion)['version_patrones'] == 0
+    assert 'con tabla de ingresos sin caché' in capsys.readouterr().out
+
+
+def test_sin_cambios_reutiliza_el_resultado(almacen, declaracion, capsys):
+    primero = cide.procesar_declaracion(FILA)
+    capsys.readouterr()
+
+    segundo = cide.procesar_declaracion(FILA)
+
+    assert 'Sin cambios desde la última extracción' in capsys.readouterr().out
+    assert segundo.get('ingreso_anual_neto_centavos') == INGRESO_ANUAL_NETO_CENTAVOS
+    assert segundo.digest_pdf == primero.digest_pdf
+
+
+def test_reprocesar_solo_campos_desde_el_texto_en_cache(almacen, declaracion, capsys):
+    cide.procesar_declaracion(FILA)
+    _desactualizar(almacen, declaracion)
+    capsys.readouterr()
+
+    cide.reprocesar()
+
+    salida = capsys.readouterr().out
+    assert '0 sin cambios, 1 solo campos, 0 desde el PDF' in salida
+    assert 'se re-extraen desde el texto en caché' in salida
+    registro = almacen.cargar(declaracion)
+    assert registro['version_patrones'] == cide.patrones.VERSION_PATRONES
+    assert registro['ingreso_anual_neto_centavos'] == INGRESO_ANUAL_NETO_CENTAVOS
+
+
+def test_reanudar_recupera_del_manifiesto_los_resultados_no_escritos(almacen, declaracion, capsys):
+    df = pl.DataFrame({'Hipervínculo': [FILA['url']], 'Nombre': [FILA['nombre']],
+                       'Primer apellido': [FILA['primer_apellido']],
+                       'Segundo apellido': [FILA['segundo_apellido']]})
+    cide.procesar_todas_declaraciones(df, 'Hipervínculo')
+    # Caída antes de que el sumidero escribiera su último lote
+    for parte in DIRECTORIO_RESULTADOS_CORRIDA.glob('parte_*.parquet'):
+        parte.unlink()
+    capsys.readouterr()
+
+    resultados = cide.procesar_todas_declaraciones(df, 'Hipervínculo', reanudar=True)
+
+    assert 'Procesando' not in capsys.readouterr().out
+    assert resultados['codigo_declaracion'].to_list() == [declaracion]
+    assert resultados['ingreso_anual_neto_centavos'].to_list() == [INGRESO_ANUAL_NETO_CENTAVOS]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+from compactacion import NOMBRE_COMPACTADO, compactar, snapshots
+from esquema import a_dataframe
+
+DIRECTORIO = Path('resultados')
+
+
+@pytest.fixture
+def historial():
+    """Una corrida en Parquet y una posterior en el CSV de antes de los centavos."""
+    DIRECTORIO.mkdir()
+    a_dataframe([
+        {'codigo_declaracion': 'A', 'ingreso_anual_neto_centavos': 100, 'cargo': 'PROFESOR'},
+        {'codigo_declaracion': 'B', 'ingreso_anual_neto_centavos': 200},
+    ]).write_parquet(DIRECTORIO / 'resultados_20240101_120000.parquet')
+    (DIRECTORIO / 'resultados_20240201_120000.csv').write_text(
+        "codigo_declaracion,ingreso_anual_neto,datos_extraidos\n"
+        "A,1500.25,true\n"
+        "C,10,true\n"
+        ",5,true\n", encoding='utf-8')
+
+
+def _compactado():
+    return (pl.read_parquet(DIRECTORIO / NOMBRE_COMPACTADO)
+            .select('codigo_declaracion', 'ingreso_anual_neto_centavos').rows())
+
+
+def test_criterio_completo_prefiere_la_fila_con_mas_campos(historial):
+    assert compactar(DIRECTORIO) == {'archivos': 2, 'declaraciones': 3}
+    assert _compactado() == [('A', 100), ('B', 200), ('C', 1000)]
+
+
+def test_criterio_reciente_prefiere_la_ultima_corrida(historial):
+    compactar(DIRECTORIO, criterio='reciente')
+    assert _compactado() == [('A', 150025), ('B', 200), ('C', 1000)]
+
+
+def test_parquet_antes_que_csv_de_la_misma_corrida(historial):
+    (DIRECTORIO / 'resultados_20240101_120000.csv').write_text("codigo_declaracion\nZ\n", encoding='utf-8')
+    assert snapshots(DIRECTORIO)['20240101_120000'].suffix == '.parquet'
+
+
+def test_podar_y_volver_a_compactar(historial):
+    compactar(DIRECTORIO, criterio='reciente', podar=True)
+    assert sorted(p.name for p in DIRECTORIO.iterdir()) == [NOMBRE_COMPACTADO]
+
+    a_dataframe([{'codigo_declaracion': 'B', 'ingreso_anual_neto_centavos': 250}]).write_parquet(
+        DIRECTORIO / 'resultados_20240301_120000.parquet')
+
+    assert compactar(DIRECTORIO, criterio='reciente') == {'archivos': 1, 'declaraciones': 3}
+    assert _compactado() == [('A', 150025), ('B', 250), ('C', 1000)]
+
+
+def test_criterio_desconocido():
+    with pytest.raises(ValueError):
+        compactar(DIRECTORIO, criterio='mayor')
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import json
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+import dataset_resultados
+from dataset_resultados import (NOMBRE_CONSOLIDADO, NOMBRE_INDICE, archivos_vivos, cargar_consolidado,
+                                escanear_resultados, leer_manifiesto, upsert_resultados)
+from esquema import a_dataframe, esquema_resultados
+
+DIRECTORIO = Path('dataset_resultados')
+
+
+def _filas(*filas):
+    """(codigo, institucion, fecha, centavos) -> DataFrame de resultados."""
+    return a_dataframe([
+        {'codigo_declaracion': codigo, 'institucion': institucion, 'fecha_recepcion': fecha,
+         'ingreso_anual_neto_centavos': centavos, 'datos_extraidos': True}
+        for codigo, institucion, fecha, centavos in filas])
+
+
+def _vivos():
+    return (escanear_resultados(directorio=DIRECTORIO).sort('codigo_declaracion')
+            .select('codigo_declaracion', 'ingreso_anual_neto_centavos').collect().rows())
+
+
+def test_particiones_por_institucion_y_anio():
+    upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 1), ('B', 'CIDE', '01/05/2023', 2),
+                             ('C', 'Colegio de México', '01/05/2024', 3), ('D', None, None, 4)),
+                      DIRECTORIO)
+
+    particiones = sorted(str(p.parent.relative_to(DIRECTORIO)) for p in archivos_vivos(directorio=DIRECTORIO))
+    assert particiones == ['institucion=CIDE/anio=2023', 'institucion=CIDE/anio=2024',
+                           'institucion=COLEGIO_DE_MEXICO/anio=2024', 'institucion=SIN_DATO/anio=0']
+
+    solo_cide = escanear_resultados(['CIDE'], [2024], DIRECTORIO).collect()
+    assert solo_cide['codigo_declaracion'].to_list() == ['A']
+
+
+def test_upsert_reemplaza_por_codigo():
+    upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 1), ('B', 'CIDE', '15/05/2024', 2)), DIRECTORIO)
+    archivo_anterior, = archivos_vivos(directorio=DIRECTORIO)
+
+    conteo = upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 10), ('A', 'CIDE', '15/05/2024', 11),
+                                      ('C', 'CIDE', '15/05/2023', 3)), DIRECTORIO)
+
+    assert conteo == {'filas': 2, 'archivos_retirados': 1}
+    assert _vivos() == [('A', 11), ('B', 2), ('C', 3)]
+    assert not archivo_anterior.exists()
+    assert leer_manifiesto(DIRECTORIO)['version'] == 2
+    indice = pl.read_parquet(DIRECTORIO / NOMBRE_INDICE).sort('codigo_declaracion')
+    assert indice['codigo_declaracion'].to_list() == ['A', 'B', 'C']
+    vivos = {p.relative_to(DIRECTORIO).as_posix() for p in archivos_vivos(directorio=DIRECTORIO)}
+    assert set(indice['archivo']) == vivos
+
+
+def test_upsert_desde_pandas_y_dataset_vacio():
+    pytest.importorskip("pandas")
+    assert escanear_resultados(directorio=DIRECTORIO).collect().is_empty()
+
+    upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 1)).to_pandas(), DIRECTORIO)
+
+    assert _vivos() == [('A', 1)]
+    assert escanear_resultados(directorio=DIRECTORIO).collect_schema()['fecha_recepcion'] == pl.Date
+
+
+def test_consolidado_vacio_sin_dataset():
+    assert cargar_consolidado(DIRECTORIO).is_empty()
+    assert dict(cargar_consolidado(DIRECTORIO).schema) == dict(esquema_resultados())
+
+
+@pytest.mark.parametrize('con_pyarrow', [True, False])
+def test_consolidado_sigue_al_dataset(monkeypatch, con_pyarrow):
+    if con_pyarrow:
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(dataset_resultados, 'pa', None)
+    upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 1), ('B', 'COLMEX', '15/05/2023', 2)), DIRECTORIO)
+    assert (DIRECTORIO / NOMBRE_CONSOLIDADO).exists()
+    assert leer_manifiesto(DIRECTORIO)['consolidado'] == leer_manifiesto(DIRECTORIO)['version']
+
+    consolidado = cargar_consolidado(DIRECTORIO)
+
+    assert consolidado.sort('codigo_declaracion').equals(
+        escanear_resultados(directorio=DIRECTORIO).collect().sort('codigo_declaracion'))
+
+
+def test_consolidado_desactualizado_se_regenera():
+    upsert_resultados(_filas(('A', 'CIDE', '15/05/2024', 1)), DIRECTORIO)
+    # Caída entre publicar el manifiesto y reescribir el snapshot
+    manifiesto = leer_manifiesto(DIRECTORIO)
+    manifiesto['consolidado'] -= 1
+    (DIRECTORIO / '_manifiesto.json').write_text(json.dumps(manifiesto), encoding='utf-8')
+    (DIRECTORIO / NOMBRE_CONSOLIDADO).unlink()
+
+    assert cargar_consolidado(DIRECTORIO)['codigo_declaracion'].to_list() == ['A']
+    assert leer_manifiesto(DIRECTORIO)['consolidado'] == manifiesto['version']
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+import polars as pl
+
+from esquema import ResultadoDeclaracion, a_dataframe, alinear, esquema_resultados
+
+
+def test_resultado_ida_y_vuelta_por_dict():
+    resultado = ResultadoDeclaracion('A', url='http://x/A', datos_extraidos=True)
+    resultado.actualizar({'ingreso_anual_neto_centavos': 127956700, 'cargo': 'PROFESOR',
+                          'otra_clave': 1, 'error': None})
+
+    copia = ResultadoDeclaracion.desde_dict(resultado.a_dict())
+
+    assert copia == resultado
+    assert copia.get('cargo') == 'PROFESOR'
+    assert copia.get('datos_extraidos') is True
+    assert copia.get('faltante', '-') == '-'
+
+
+def test_montos_en_pesos_de_registros_anteriores():
+    legado = ResultadoDeclaracion.desde_dict({'codigo_declaracion': 'A', 'ingreso_anual_neto': 1279567.5})
+    actual = ResultadoDeclaracion.desde_dict({'codigo_declaracion': 'A', 'ingreso_anual_neto': 1.0,
+                                              'ingreso_anual_neto_centavos': 7})
+
+    assert legado.get('ingreso_anual_neto_centavos') == 127956750
+    assert 'ingreso_anual_neto' not in legado.campos
+    assert actual.get('ingreso_anual_neto_centavos') == 7
+
+
+def test_a_dataframe_con_el_esquema_declarado():
+    df = a_dataframe([
+        ResultadoDeclaracion('A', datos_extraidos=True, error=None,
+                             campos={'ingreso_anual_neto_centavos': 123456, 'fecha_recepcion': '15/05/2024'}),
+        {'codigo_declaracion': 'B', 'error': 'Error al descargar PDF', 'columna_vieja': 'x'},
+    ])
+
+    assert dict(df.schema) == dict(esquema_resultados())
+    fila = df.row(0, named=True)
+    assert fila['ingreso_anual_neto_centavos'] == 123456
+    assert fila['ingreso_anual_neto'] == 1234.56
+    assert fila['fecha_recepcion'] == date(2024, 5, 15)
+    assert df['error'].cast(pl.String).to_list() == [None, 'Error al descargar PDF']
+
+
+def test_alinear_archivo_anterior():
+    # CSV de antes de los centavos: todo como texto, sin columnas de centavos
+    anterior = pl.LazyFrame({'codigo_declaracion': ['A'], 'datos_extraidos': ['True'],
+                             'ingreso_anual_neto': ['1500.25'], 'fecha_recepcion': ['2024-05-15'],
+                             'campo_retirado': [3]})
+
+    df = alinear(anterior).collect()
+
+    assert list(df.columns) == list(esquema_resultados()) + ['campo_retirado']
+    fila = df.row(0, named=True)
+    assert fila['datos_extraidos'] is True
+    assert fila['ingreso_anual_neto_centavos'] == 150025
+    assert fila['fecha_recepcion'] == date(2024, 5, 15)
+    assert fila['campo_retirado'] == '3'
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+import cide
+import exportacion
+from esquema import a_dataframe
+
+
+def _resultados(n=3):
+    return a_dataframe([{'codigo_declaracion': f'C{i}', 'ingreso_anual_neto_centavos': i * 100}
+                        for i in range(n)])
+
+
+def test_validar_formatos():
+    assert exportacion.validar_formatos(['csv', 'xlsx', 'csv']) == ('csv', 'xlsx')
+    with pytest.raises(ValueError, match='pdf'):
+        exportacion.validar_formatos(['csv', 'pdf'])
+
+
+def test_xlsx_en_segundo_plano():
+    pytest.importorskip("xlsxwriter")
+    ruta = Path('resultados.xlsx')
+
+    futuro = exportacion.exportar_xlsx_en_segundo_plano(_resultados(7).to_pandas(), ruta)
+
+    assert exportacion.esperar_exportaciones()
+    assert futuro.result() == 7
+    assert ruta.exists() and not ruta.with_name(ruta.name + '.tmp').exists()
+
+
+def test_error_del_hilo_se_reporta_al_esperar(monkeypatch):
+    monkeypatch.setattr(exportacion, 'xlsxwriter', None)
+
+    futuro = exportacion.exportar_xlsx_en_segundo_plano(_resultados(), Path('resultados.xlsx'))
+
+    assert not exportacion.esperar_exportaciones()
+    assert isinstance(futuro.exception(), RuntimeError)
+    assert not Path('resultados.xlsx').exists()
+
+
+def test_guardar_resultados_solo_en_los_formatos_pedidos(monkeypatch):
+    directorio = Path('resultados')
+    directorio.mkdir(exist_ok=True)
+    monkeypatch.setattr(cide, 'DIRECTORIO_RESULTADOS', directorio)
+
+    cide.guardar_resultados(_resultados(), formatos=('csv',))
+
+    csv, = directorio.glob('resultados_*.csv')
+    assert pl.read_csv(csv)['codigo_declaracion'].to_list() == ['C0', 'C1', 'C2']
+    assert [p.suffix for p in directorio.iterdir()] == ['.csv']
+    assert not Path(cide.DIRECTORIO_DATASET).exists()
+    with pytest.raises(ValueError):
+        cide.guardar_resultados(_resultados(), formatos=('csv', 'json'))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import pytest
+from conftest import (INGRESO_ANUAL_NETO_CENTAVOS, PAGINA_ENCARGO, PAGINA_GENERALES,
+                      PAGINA_INGRESOS, PAGINA_RELLENO)
+
+from extraccion_pdf import (VERSION_EXTRACTOR_TEXTO, cargar_mapa_paginas, comparar_huella, contar_paginas_pdf,
+                            extraer_texto_dirigido, extraer_texto_pdf, huella_extraccion, iterar_paginas_pdf)
+from patrones import extraer_campos
+
+
+def _paginas_leidas(salida: str) -> int:
+    renglon = next(r for r in salida.splitlines() if 'Texto de' in r)
+    return int(renglon.split('Texto de ')[1].split('/')[0])
+
+
+def test_iterar_paginas_en_el_orden_pedido(crear_pdf):
+    ruta = crear_pdf('d.pdf', [PAGINA_GENERALES, PAGINA_RELLENO, PAGINA_INGRESOS])
+
+    todas = list(iterar_paginas_pdf(ruta))
+    pedidas = list(iterar_paginas_pdf(ruta, paginas=[2, 0]))
+
+    assert contar_paginas_pdf(ruta) == 3
+    assert [num for num, _ in todas] == [0, 1, 2]
+    assert 'BIENES INMUEBLES' in todas[1][1]
+    assert pedidas == [todas[2], todas[0]]
+    assert extraer_texto_pdf(ruta) == '\n'.join(texto for _, texto in todas)
+
+
+def test_extraer_texto_de_un_archivo_que_no_es_pdf(capsys):
+    with open('roto.pdf', 'wb') as f:
+        f.write(b'no es un pdf')
+
+    assert extraer_texto_pdf('roto.pdf') is None
+    assert '✗ Error extrayendo texto' in capsys.readouterr().out
+
+
+def test_dirigido_se_detiene_al_encontrar_los_campos(crear_pdf, capsys):
+    ruta = crear_pdf('a.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO, PAGINA_INGRESOS] + [PAGINA_RELLENO] * 12)
+
+    datos = extraer_campos(extraer_texto_dirigido(ruta, extraer_campos))
+
+    assert datos['ingreso_anual_neto_centavos'] == INGRESO_ANUAL_NETO_CENTAVOS
+    assert _paginas_leidas(capsys.readouterr().out) < 15
+
+
+def test_dirigido_busca_por_ancla_aunque_el_mapa_ubique_el_campo(crear_pdf, capsys):
+    # El mapa aprendido con A (ingresos en la página 2) no sirve para B (página 6)
+    a = crear_pdf('a.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO, PAGINA_INGRESOS] + [PAGINA_RELLENO] * 12)
+    b = crear_pdf('b.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO] + [PAGINA_RELLENO] * 4
+                  + [PAGINA_INGRESOS] + [PAGINA_RELLENO] * 8)
+    extraer_texto_dirigido(a, extraer_campos)
+    assert cargar_mapa_paginas()['ingreso_anual_neto'] == [2]
+
+    datos = extraer_campos(extraer_texto_dirigido(b, extraer_campos))
+
+    assert datos['ingreso_anual_neto_centavos'] == INGRESO_ANUAL_NETO_CENTAVOS
+    assert datos['servicios_profesionales_centavos'] == 4000000
+    assert 6 in cargar_mapa_paginas()['ingreso_anual_neto']
+
+
+def test_dirigido_recorre_todo_si_falta_el_ancla(crear_pdf, capsys):
+    extraer_texto_dirigido(crear_pdf('a.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO, PAGINA_INGRESOS]),
+                           extraer_campos)
+    sin_ingresos = crear_pdf('b.pdf', [PAGINA_GENERALES, PAGINA_ENCARGO] + [PAGINA_RELLENO] * 8)
+    capsys.readouterr()
+
+    datos = extraer_campos(extraer_texto_dirigido(sin_ingresos, extraer_campos))
+
+    salida = capsys.readouterr().out
+    assert datos['ingreso_anual_neto_centavos'] is None
+    assert 'Sin ancla en el documento' in salida
+    assert _paginas_leidas(salida) == 10
+
+
+@pytest.fixture
+def huella(crear_pdf):
+    return huella_extraccion(crear_pdf('a.pdf', [PAGINA_GENERALES]), version_patrones=3)
+
+
+def test_huella_registra_las_entradas_del_resultado(huella):
+    assert len(huella['digest_pdf']) == 64
+    assert huella['version_texto'] == VERSION_EXTRACTOR_TEXTO
+    assert huella['version_patrones'] == 3
+    assert huella['modo_texto'] == 'completo'
+    assert huella['tabla_ingresos'] is False
+
+
+@pytest.mark.parametrize('cambio, estado', [
+    ({}, 'sin_cambios'),
+    ({'version_patrones': 2}, 'campos'),
+    ({'tabla_ingresos': True}, 'campos'),
+    ({'digest_pdf': '0' * 64}, 'completo'),
+    ({'version_texto': VERSION_EXTRACTOR_TEXTO - 1}, 'completo'),
+    ({'modo_texto': 'dirigido'}, 'completo'),
+    ({'datos_extraidos': False}, 'completo'),
+])
+def test_comparar_huella(huella, cambio, estado):
+    previo = {**huella, 'datos_extraidos': True, **cambio}
+    assert comparar_huella(previo, huella) == estado
+
+
+def test_sin_resultado_previo_se_extrae_completo(huella):
+    assert comparar_huella(None, huella) == 'completo'
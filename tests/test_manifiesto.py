@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+import pytest
+
+from esquema import ResultadoDeclaracion
+from manifiesto import Manifiesto, abrir_manifiesto
+
+RUTA = Path('corridas') / 'manifiesto.jsonl'
+
+
+def _resultado(codigo, extraido=True):
+    resultado = ResultadoDeclaracion(codigo, f'http://x/{codigo}', 'JUAN', 'PEREZ', 'L')
+    resultado.datos_extraidos = extraido
+    return resultado
+
+
+def test_una_ultima_linea_cortada_se_descarta():
+    with Manifiesto(RUTA) as manifiesto:
+        manifiesto.encolar(['A', 'B'])
+        manifiesto.terminar(_resultado('A'))
+    completo = RUTA.read_bytes()
+    with open(RUTA, 'ab') as f:
+        f.write(b'{"codigo":"B","estado":"extra')
+
+    with Manifiesto(RUTA) as manifiesto:
+        assert manifiesto.estados == {'A': 'extraido', 'B': 'en_cola'}
+        assert RUTA.read_bytes() == completo
+        manifiesto.terminar(_resultado('B', extraido=False))
+
+    with Manifiesto(RUTA) as manifiesto:
+        assert manifiesto.estados == {'A': 'extraido', 'B': 'fallido'}
+
+
+def test_completado_y_reintento_de_fallidos():
+    with Manifiesto(RUTA) as manifiesto:
+        manifiesto.encolar(['A', 'B', 'C'])
+        manifiesto.terminar(_resultado('A'))
+        manifiesto.terminar(_resultado('B', extraido=False))
+
+        assert [manifiesto.completado(c) for c in 'ABC'] == [True, True, False]
+        assert [manifiesto.completado(c, reintentar_fallidos=True) for c in 'ABC'] == [True, False, False]
+        assert manifiesto.resumen() == {'en_cola': 1, 'descargado': 0, 'extraido': 1, 'fallido': 1}
+
+
+def test_resultados_se_releen_del_archivo():
+    with Manifiesto(RUTA) as manifiesto:
+        manifiesto.terminar(_resultado('A', extraido=False))
+        manifiesto.terminar(_resultado('B'))
+        manifiesto.terminar(_resultado('A'))
+        assert not hasattr(manifiesto, 'resultados')
+
+    with Manifiesto(RUTA) as manifiesto:
+        resultados = manifiesto.resultados_guardados(['A', 'Z'])
+
+    assert [r['codigo_declaracion'] for r in resultados] == ['A']
+    assert resultados[0]['datos_extraidos'] is True
+
+
+def test_estado_desconocido():
+    with Manifiesto(RUTA) as manifiesto, pytest.raises(ValueError):
+        manifiesto.registrar('A', 'perdido')
+
+
+def test_sin_reanudar_se_archiva_el_anterior(capsys):
+    with abrir_manifiesto(ruta=RUTA) as manifiesto:
+        manifiesto.encolar(['A'])
+
+    with abrir_manifiesto(reanudar=True, ruta=RUTA) as manifiesto:
+        assert manifiesto.estados == {'A': 'en_cola'}
+    assert 'Reanudando corrida: 0 terminadas' in capsys.readouterr().out
+
+    with abrir_manifiesto(ruta=RUTA) as manifiesto:
+        assert manifiesto.estados == {}
+    assert len(list(RUTA.parent.glob('manifiesto_*.jsonl'))) == 1
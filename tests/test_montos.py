@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import polars as pl
+import pytest
+
+from montos import (estadisticas_centavos, expr_centavos, expr_centavos_a_pesos,
+                    expr_pesos_a_centavos, formatear_centavos, monto_a_centavos, pesos_a_centavos)
+
+CASOS = [
+    ('1,234', 123400),
+    ('$1,234.5', 123450),
+    ('1234.56 MXN', 123456),
+    ('1,234.56 M.N.', 123456),
+    ('$ 0.01', 1),
+    ('-1,234.567', -123457),
+    ('1,234.564', 123456),
+    ('(1,234.56)', -123456),
+    ('0', 0),
+    ('1,279,567', 127956700),
+    ('N/A', None),
+    ('', None),
+    ('1.2.3', None),
+    (None, None),
+]
+
+
+@pytest.mark.parametrize('texto,centavos', CASOS)
+def test_monto_a_centavos(texto, centavos):
+    assert monto_a_centavos(texto) == centavos
+
+
+def test_expr_centavos_coincide_con_monto_a_centavos():
+    df = pl.DataFrame({'monto': [texto for texto, _ in CASOS]}, schema={'monto': pl.String})
+    obtenido = df.select(expr_centavos(pl.col('monto')))['monto'].to_list()
+    assert obtenido == [centavos for _, centavos in CASOS]
+
+
+@pytest.mark.parametrize('centavos', [0, 1, 10, 99, 123456, 127956700, -123456, 10**15 + 7])
+def test_ida_y_vuelta_centavos_texto(centavos):
+    assert monto_a_centavos(formatear_centavos(centavos).replace('-$', '-')) == centavos
+
+
+@pytest.mark.parametrize('centavos', [1, 29, 57, 123456, 127956700, 999999999999])
+def test_ida_y_vuelta_centavos_pesos(centavos):
+    pesos = pl.DataFrame({'c': [centavos]}).select(expr_centavos_a_pesos(pl.col('c')))['c'][0]
+    assert pesos_a_centavos(pesos) == centavos
+    assert pl.DataFrame({'p': [pesos]}).select(expr_pesos_a_centavos(pl.col('p')))['p'][0] == centavos
+
+
+def test_formatear_centavos():
+    assert formatear_centavos(123456) == '$1,234.56'
+    assert formatear_centavos(-5) == '-$0.05'
+    assert formatear_centavos(None) == '-'
+
+
+def test_estadisticas_exactas():
+    # 0.1 + 0.2 en pesos no es exacto en float; en centavos sí
+    stats = estadisticas_centavos(pl.Series([10, 20, None, 30, 41]))
+    assert stats['n'] == 4
+    assert stats['total'] == 101
+    assert stats['mediana'] == 25
+    assert stats['minimo'] == 10 and stats['maximo'] == 41
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import unicodedata
+
+import polars as pl
+
+from normalizacion import expr_normalizar, expr_sombra, nfc_columna, normalizar, normalizar_lineas, sombra_de
+
+# "Recepción" con el acento como marca combinante y espacios repetidos
+CRUDO = "Fecha de  " + unicodedata.normalize('NFD', "recepción") + ":\n\n  15/05/2024  Niño"
+
+
+def test_forma_canonica_y_sombra():
+    normalizado = normalizar(CRUDO)
+
+    assert normalizado.texto == "FECHA DE RECEPCIÓN: 15/05/2024 NIÑO"
+    assert normalizado.sombra == "FECHA DE RECEPCION: 15/05/2024 NINO"
+    assert len(normalizado.offsets) == len(normalizado.texto)
+
+
+def test_posiciones_vuelven_al_texto_crudo():
+    normalizado = normalizar(CRUDO)
+    inicio = normalizado.sombra.index('RECEPCION')
+    fecha = normalizado.sombra.index('15/05/2024')
+
+    assert normalizado.fragmento_crudo(inicio, inicio + len('RECEPCION')) == CRUDO[10:20]
+    assert normalizado.fragmento_crudo(fecha, fecha + 10) == '15/05/2024'
+    assert normalizado.fragmento_crudo(fecha, fecha) == ''
+    assert normalizar('').posicion_cruda(0, 0) == (0, 0)
+
+
+def test_normalizar_lineas_conserva_los_renglones():
+    assert list(normalizar_lineas(CRUDO)) == [("FECHA DE RECEPCIÓN:", "FECHA DE RECEPCION:"),
+                                               ("15/05/2024 NIÑO", "15/05/2024 NINO")]
+
+
+def test_version_vectorizada_coincide():
+    textos = pl.Series(['Fecha de recepción: 15/05/2024', CRUDO, None, 'ÁREA  DE\tADSCRIPCIÓN'])
+
+    nfc = nfc_columna(textos)
+    df = pl.DataFrame({'texto': nfc}).select(normalizado=expr_normalizar(pl.col('texto')))
+    df = df.with_columns(sombra=expr_sombra(pl.col('normalizado')))
+
+    assert nfc[0] == textos[0] and nfc[1] == unicodedata.normalize('NFC', CRUDO)
+    for crudo, normalizado, sombra in zip(textos, df['normalizado'], df['sombra']):
+        if crudo is None:
+            assert normalizado is None
+            continue
+        esperado = normalizar(crudo)
+        assert normalizado == esperado.texto and sombra == esperado.sombra == sombra_de(normalizado)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from conftest import PAGINA_GENERALES
+
+import extraccion_pdf
+from extraccion_pdf import (DIRECTORIO_CACHE_OCR, DPI_OCR, IDIOMA_OCR, _ruta_cache_ocr, calcular_digest_pdf,
+                            extraer_texto_con_ocr, extraer_texto_pdf)
+
+
+def test_con_capa_de_texto_no_se_usa_ocr(crear_pdf, monkeypatch):
+    ruta = crear_pdf('d.pdf', [PAGINA_GENERALES])
+    monkeypatch.setattr(extraccion_pdf, 'ocr_disponible', lambda: 1 / 0)
+
+    assert extraer_texto_con_ocr(ruta) == extraer_texto_pdf(ruta)
+
+
+def test_sin_ocr_instalado_las_paginas_vacias_no_tienen_texto(crear_pdf, monkeypatch):
+    ruta = crear_pdf('d.pdf', [PAGINA_GENERALES, []])
+    monkeypatch.setattr(extraccion_pdf, 'ocr_disponible', lambda: False)
+
+    assert extraer_texto_con_ocr(ruta) is None
+
+
+def test_paginas_vacias_desde_la_cache_de_ocr(crear_pdf, monkeypatch, capsys):
+    ruta = crear_pdf('d.pdf', [[], PAGINA_GENERALES, []])
+    monkeypatch.setattr(extraccion_pdf, 'ocr_disponible', lambda: True)
+    digest = calcular_digest_pdf(ruta)
+    DIRECTORIO_CACHE_OCR.mkdir(parents=True)
+    for num_pagina in (0, 2):
+        _ruta_cache_ocr(digest, num_pagina, DPI_OCR, IDIOMA_OCR).write_text(f'OCR {num_pagina}', encoding='utf-8')
+
+    texto = extraer_texto_con_ocr(ruta)
+
+    paginas = texto.split('\n')
+    assert paginas[0] == 'OCR 0' and paginas[-1] == 'OCR 2'
+    assert 'DATOS GENERALES' in texto
+    assert '0 páginas nuevas, 2 desde caché' in capsys.readouterr().out
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import shutil
+from pathlib import Path
+
+from conftest import INGRESO_ANUAL_NETO_CENTAVOS, PAGINA_INGRESOS
+
+from extraccion_pdf import cargar_texto_cache, codigos_sin_texto_completo
+from parser_declaracion import construir_tablas, parsear_declaracion
+
+NUMERALES = ['I', 'II', 'II.1', 'II.2', 'II.3', 'II.4', 'II.5', 'A', 'B', 'C']
+
+
+def test_ingresos_un_renglon_por_numeral():
+    ingresos = parsear_declaracion('X', '\n'.join(PAGINA_INGRESOS))['ingresos']
+
+    assert ingresos['numeral'].to_list() == NUMERALES
+    fila_a = ingresos.row(NUMERALES.index('A'), named=True)
+    assert fila_a['monto_centavos'] == INGRESO_ANUAL_NETO_CENTAVOS
+    assert fila_a['concepto'].startswith('INGRESO ANUAL NETO DEL DECLARANTE')
+
+
+def test_renglon_con_letra_sin_punto_no_es_numeral():
+    renglones = PAGINA_INGRESOS[:2] + [
+        "A LA FECHA DE LA DECLARACION",
+        "I MPORTE EXPRESADO EN PESOS",
+        "C ON DEPENDIENTES",
+    ] + PAGINA_INGRESOS[2:]
+
+    ingresos = parsear_declaracion('X', '\n'.join(renglones))['ingresos']
+
+    assert ingresos['numeral'].to_list() == NUMERALES
+    assert ingresos.row(0, named=True)['monto_centavos'] == 123456700
+
+
+def test_pdf_sin_texto_no_se_vuelve_a_extraer(crear_pdf, capsys):
+    directorio_pdfs = Path('declaraciones_pdfs')
+    directorio_pdfs.mkdir()
+    shutil.copy(crear_pdf('vacio.pdf', [[]]), directorio_pdfs / 'VACIA.pdf')
+
+    construir_tablas(['VACIA'], directorio_pdfs=directorio_pdfs)
+    assert 'se extraen de su PDF' in capsys.readouterr().out
+    assert cargar_texto_cache('VACIA') == ''
+    assert codigos_sin_texto_completo(['VACIA']) == []
+
+    construir_tablas(['VACIA'], directorio_pdfs=directorio_pdfs)
+    assert 'se extraen de su PDF' not in capsys.readouterr().out
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from pathlib import Path
+
+import polars as pl
+import pytest
+from conftest import (INGRESO_ANUAL_NETO_CENTAVOS, PAGINA_ENCARGO, PAGINA_GENERALES,
+                      PAGINA_INGRESOS)
+
+import patrones
+from normalizacion import normalizar
+from patrones import (REGISTRO, RUTA_ESPECIFICACION, clave_valor, compilar, configurar_motor, extraer_campo,
+                      extraer_campos, extraer_campos_lote, indexar_secciones, recargar_especificacion,
+                      registrar, textos_adversariales)
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+requiere_re2 = pytest.mark.skipif(re2 is None, reason="google-re2 no instalado")
+
+# Tiempo máximo de RE2 por texto adversarial (de tamaño por defecto)
+TIEMPO_MAXIMO_ADVERSARIAL_S = 1.0
+
+TEXTO_DECLARACION = "\n".join(PAGINA_GENERALES + PAGINA_ENCARGO + PAGINA_INGRESOS)
+ADVERSARIALES = textos_adversariales()
+# Sin ventanas, `re` retrocede sobre todo el texto: para comparar las
+# capturas de cada patrón basta un tamaño menor
+ADVERSARIALES_CORTOS = textos_adversariales(tamanio=5_000)
+
+
+@pytest.fixture
+def motor_re():
+    """Deja el motor en `re` al terminar la prueba."""
+    yield
+    configurar_motor('re')
+
+
+@pytest.fixture
+def especificacion_original():
+    """Vuelve a compilar campos.toml al terminar la prueba."""
+    yield
+    recargar_especificacion(forzar=True)
+
+
+def _capturas(motor: str, texto: str):
+    capturas = {}
+    for alternativas in REGISTRO.values():
+        for patron in alternativas:
+            regex, _ = compilar(patron.patron, patron.flags, motor)
+            encontrado = regex.search(texto)
+            capturas[f"{patron.campo}/{patron.nombre}"] = encontrado.groups() if encontrado else None
+    return capturas
+
+
+@requiere_re2
+@pytest.mark.parametrize('nombre', sorted(ADVERSARIALES))
+def test_re_y_re2_capturan_lo_mismo(nombre):
+    texto = ADVERSARIALES_CORTOS[nombre]
+    esperado = _capturas('re', texto)
+
+    inicio = time.perf_counter()
+    obtenido = _capturas('re2', texto)
+
+    assert obtenido == esperado
+    assert time.perf_counter() - inicio < TIEMPO_MAXIMO_ADVERSARIAL_S
+
+
+@requiere_re2
+@pytest.mark.parametrize('nombre', sorted(ADVERSARIALES) + ['declaracion'])
+def test_re_y_re2_extraen_los_mismos_campos(nombre, motor_re):
+    texto = ADVERSARIALES.get(nombre, TEXTO_DECLARACION)
+    configurar_motor('re')
+    esperado = extraer_campos(texto)
+
+    configurar_motor('re2')
+    assert patrones.MOTOR_REGEX == 're2'
+    inicio = time.perf_counter()
+    obtenido = extraer_campos(texto)
+    transcurrido = time.perf_counter() - inicio
+
+    assert obtenido == esperado
+    assert transcurrido < TIEMPO_MAXIMO_ADVERSARIAL_S
+
+
+def test_extraer_campos_de_una_declaracion():
+    datos = extraer_campos(TEXTO_DECLARACION)
+    assert datos['ingreso_anual_neto_centavos'] == INGRESO_ANUAL_NETO_CENTAVOS
+    assert datos['remuneracion_cargo_publico_centavos'] == 123456700
+    assert datos['fecha_recepcion'] == '15/05/2024'
+    assert datos['cargo'] == 'PROFESOR INVESTIGADOR TITULAR'
+
+
+def test_lote_coincide_con_extraer_campos():
+    textos = {'declaracion': TEXTO_DECLARACION, 'vacio': '', **ADVERSARIALES}
+    lote = extraer_campos_lote(pl.DataFrame({'codigo_declaracion': list(textos),
+                                             'texto': list(textos.values())}))
+
+    for fila in lote.iter_rows(named=True):
+        codigo = fila.pop('codigo_declaracion')
+        assert fila == extraer_campos(textos[codigo]), codigo
+
+
+def test_registro_prueba_las_alternativas_en_orden(monkeypatch):
+    monkeypatch.setitem(REGISTRO, 'cargo', list(REGISTRO['cargo']))
+    registrar('cargo', 'puesto', r'PUESTO: (.+)', tipo='texto')
+    primera, alterna = REGISTRO['cargo']
+    aciertos = primera.aciertos, alterna.aciertos
+
+    assert extraer_campo('cargo', TEXTO_DECLARACION) == 'PROFESOR INVESTIGADOR TITULAR'
+    assert extraer_campo('cargo', 'PUESTO: RECTOR') == 'RECTOR'
+    assert (primera.aciertos, alterna.aciertos) == (aciertos[0] + 1, aciertos[1] + 1)
+    assert clave_valor('cargo') == 'cargo'
+    assert clave_valor('ingreso_anual_neto') == 'ingreso_anual_neto_centavos'
+
+
+def test_el_monto_no_se_toma_de_la_seccion_siguiente():
+    # II.2 sin monto: sin ventana, el patrón seguiría hasta el monto de II.3
+    sin_monto = [r for r in PAGINA_INGRESOS if not r.startswith('II.2')]
+    sin_monto.insert(3, "II.2 ACTIVIDAD FINANCIERA (RENDIMIENTOS O GANANCIAS) (DESPUÉS DE IMPUESTOS)")
+    texto = "\n".join(sin_monto)
+
+    assert extraer_campo('actividad_financiera', texto) is None
+    assert extraer_campo('servicios_profesionales', texto) == 4000000
+
+
+def test_sin_la_seccion_no_hay_valor():
+    texto = "\n".join(r for r in PAGINA_INGRESOS if not r.startswith('II.2'))
+
+    assert extraer_campo('actividad_financiera', texto) is None
+    assert extraer_campo('ingreso_anual_neto', texto) == INGRESO_ANUAL_NETO_CENTAVOS
+
+
+def test_indice_de_anclas_en_una_pasada(monkeypatch):
+    monkeypatch.setattr(patrones, 'LONGITUD_MAXIMA_VENTANA', 100)
+    # Un encabezado repetido cuenta en su primera aparición
+    sombra = normalizar(TEXTO_DECLARACION + "\nII.2 ACTIVIDAD FINANCIERA 1").sombra
+
+    indice = indexar_secciones(sombra)
+
+    secciones = sorted((v for k, v in indice.items() if k not in patrones.VENTANAS_LINEA))
+    for (inicio, fin), (siguiente, _) in zip(secciones, secciones[1:]):
+        assert fin == min(inicio + 100, siguiente)
+    assert indice['ii2'][0] == sombra.index('II.2 ACTIVIDAD FINANCIERA')
+    assert indice['ii3'] == (sombra.index('II.3 SERVICIOS'), sombra.index('II.4 ENAJENACION'))
+    inicio, fin = indice['linea_cargo']
+    assert sombra[inicio:].startswith('EMPLEO, CARGO O COMISION PROFESOR')
+    assert fin - inicio == min(patrones.VENTANAS_LINEA['linea_cargo'], len(sombra) - inicio)
+    assert indexar_secciones('SIN ANCLAS') == {}
+
+
+def test_recarga_la_especificacion_solo_si_cambio(especificacion_original, capsys):
+    ruta = Path('campos.toml')
+    original = RUTA_ESPECIFICACION.read_text(encoding='utf-8')
+    version = patrones.VERSION_PATRONES
+    ruta.write_text(original.replace(f'version = {version}', f'version = {version + 1}'), encoding='utf-8')
+
+    assert recargar_especificacion(ruta=ruta)
+    assert patrones.VERSION_PATRONES == version + 1
+    assert not recargar_especificacion(ruta=ruta)
+
+    # Un archivo inválido no reemplaza a la especificación vigente
+    ruta.write_text(original.replace("tipo = \"monto\"", "tipo = \"moneda\"", 1), encoding='utf-8')
+    os.utime(ruta, ns=(0, 0))
+    assert not recargar_especificacion(ruta=ruta)
+    assert patrones.VERSION_PATRONES == version + 1
+    assert 'inválido' in capsys.readouterr().out
+    assert REGISTRO['ingreso_anual_neto'][0].tipo == 'monto'
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import serializacion
+from serializacion import (DIRECTORIO_REEMPLAZO, MARCA_COMPLETO, EscritorSegmentos, a_json, de_json,
+                           leer_segmentos)
+
+DIRECTORIO = Path('metadatos')
+
+
+def _registros(n, etiqueta=''):
+    return [{'codigo_declaracion': f'{etiqueta}C{i:03d}', 'nombre': 'JOSÉ', 'centavos': i} for i in range(n)]
+
+
+def _segmentos():
+    return sorted(p.name for p in DIRECTORIO.iterdir())
+
+
+@pytest.mark.parametrize('con_orjson', [True, False])
+def test_json_en_una_linea(monkeypatch, con_orjson):
+    if con_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serializacion, 'orjson', None)
+    datos = {'nombre': 'JOSÉ', 'monto': 1, 'fecha': date(2024, 5, 15), 'lista': [1, None]}
+
+    texto = a_json(datos)
+
+    assert '\n' not in texto and 'JOSÉ' in texto
+    assert de_json(texto) == {**datos, 'fecha': '2024-05-15'}
+    assert de_json(texto.encode('utf-8')) == de_json(texto)
+
+
+def test_segmentos_por_tamano_y_en_orden():
+    with EscritorSegmentos(DIRECTORIO, registros_por_segmento=4) as escritor:
+        for datos in _registros(10):
+            escritor.agregar(datos)
+
+    assert escritor.escritos == 10
+    assert _segmentos() == ['metadatos_000000.jsonl', 'metadatos_000001.jsonl', 'metadatos_000002.jsonl']
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(10)
+
+
+def test_sin_reemplazar_continua_la_numeracion():
+    for etiqueta in ('A', 'B'):
+        with EscritorSegmentos(DIRECTORIO) as escritor:
+            for datos in _registros(2, etiqueta):
+                escritor.agregar(datos)
+
+    assert _segmentos() == ['metadatos_000000.jsonl', 'metadatos_000001.jsonl']
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(2, 'A') + _registros(2, 'B')
+
+
+def test_reemplazar_sustituye_todos_los_segmentos():
+    with EscritorSegmentos(DIRECTORIO, registros_por_segmento=2) as escritor:
+        for datos in _registros(6, 'A'):
+            escritor.agregar(datos)
+
+    with EscritorSegmentos(DIRECTORIO, registros_por_segmento=2, reemplazar=True) as escritor:
+        for datos in _registros(3, 'B'):
+            escritor.agregar(datos)
+        # Mientras escribe, los lectores siguen viendo el juego anterior
+        assert list(leer_segmentos(DIRECTORIO)) == _registros(6, 'A')
+
+    assert _segmentos() == ['metadatos_000000.jsonl', 'metadatos_000001.jsonl']
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(3, 'B')
+
+
+def test_exportacion_interrumpida_conserva_los_segmentos_anteriores():
+    with EscritorSegmentos(DIRECTORIO) as escritor:
+        escritor.agregar(_registros(1, 'A')[0])
+
+    with pytest.raises(KeyboardInterrupt):
+        with EscritorSegmentos(DIRECTORIO, registros_por_segmento=1, reemplazar=True) as escritor:
+            escritor.agregar(_registros(1, 'B')[0])
+            raise KeyboardInterrupt
+
+    assert _segmentos() == ['metadatos_000000.jsonl']
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(1, 'A')
+
+
+def test_caida_a_media_publicacion_se_completa_al_leer():
+    with EscritorSegmentos(DIRECTORIO, registros_por_segmento=1) as escritor:
+        for datos in _registros(3, 'A'):
+            escritor.agregar(datos)
+    # Caída después de la marca: un segmento ya movido, otro todavía en el juego nuevo
+    nuevo = DIRECTORIO / DIRECTORIO_REEMPLAZO
+    with EscritorSegmentos(nuevo, registros_por_segmento=1) as escritor:
+        for datos in _registros(2, 'B'):
+            escritor.agregar(datos)
+    (nuevo / MARCA_COMPLETO).write_text('2', encoding='utf-8')
+    (nuevo / 'metadatos_000000.jsonl').replace(DIRECTORIO / 'metadatos_000000.jsonl')
+
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(2, 'B')
+    assert _segmentos() == ['metadatos_000000.jsonl', 'metadatos_000001.jsonl']
+
+
+def test_juego_nuevo_sin_marca_lo_descarta_el_siguiente_escritor():
+    with EscritorSegmentos(DIRECTORIO) as escritor:
+        escritor.agregar(_registros(1, 'A')[0])
+    with EscritorSegmentos(DIRECTORIO / DIRECTORIO_REEMPLAZO) as escritor:
+        escritor.agregar(_registros(1, 'B')[0])
+
+    # Un lector no sabe si es una exportación en curso: lo ignora
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(1, 'A')
+    assert (DIRECTORIO / DIRECTORIO_REEMPLAZO).exists()
+
+    with EscritorSegmentos(DIRECTORIO, reemplazar=True) as escritor:
+        escritor.agregar(_registros(1, 'C')[0])
+    assert list(leer_segmentos(DIRECTORIO)) == _registros(1, 'C')
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from esquema import ResultadoDeclaracion, esquema_resultados
+from sumidero import SumideroParquet, archivar_corrida, leer_resultados_corrida
+
+DIRECTORIO = Path('corridas') / 'resultados'
+
+
+def _resultado(codigo, centavos=None):
+    resultado = ResultadoDeclaracion(codigo, f'http://x/{codigo}', 'JUAN', 'PEREZ', 'L')
+    resultado.actualizar({'ingreso_anual_neto_centavos': centavos})
+    return resultado
+
+
+def test_escribe_por_lotes():
+    with SumideroParquet(DIRECTORIO, tamano_lote=2) as sumidero:
+        for i in range(5):
+            sumidero.agregar(_resultado(f'C{i}', i))
+        assert len(list(DIRECTORIO.glob('parte_*.parquet'))) == 2
+        assert sumidero.codigos_escritos() == {'C0', 'C1', 'C2', 'C3'}
+
+    resultados = leer_resultados_corrida(DIRECTORIO)
+    assert resultados['codigo_declaracion'].to_list() == [f'C{i}' for i in range(5)]
+    assert dict(resultados.schema) == dict(esquema_resultados())
+    assert not list(DIRECTORIO.glob('*.tmp'))
+
+
+def test_reanudar_continua_la_numeracion_y_queda_la_ultima_fila():
+    with SumideroParquet(DIRECTORIO) as sumidero:
+        sumidero.agregar(_resultado('A', 1))
+    with SumideroParquet(DIRECTORIO) as sumidero:
+        sumidero.agregar(_resultado('A', 2))
+        sumidero.agregar(_resultado('B', 3))
+
+    assert sorted(p.name for p in DIRECTORIO.glob('parte_*.parquet')) == [
+        'parte_000000.parquet', 'parte_000001.parquet']
+    resultados = leer_resultados_corrida(DIRECTORIO)
+    assert resultados.select('codigo_declaracion', 'ingreso_anual_neto_centavos').rows() == [
+        ('A', 2), ('B', 3)]
+
+
+def test_archivar_corrida():
+    assert leer_resultados_corrida(DIRECTORIO).is_empty()
+    with SumideroParquet(DIRECTORIO) as sumidero:
+        sumidero.agregar(_resultado('A'))
+
+    archivar_corrida(DIRECTORIO, sufijo='anterior')
+
+    assert leer_resultados_corrida(DIRECTORIO).is_empty()
+    assert leer_resultados_corrida(DIRECTORIO.with_name('resultados_anterior')).height == 1
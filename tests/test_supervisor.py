@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from supervisor import ExtraccionAbortada, ejecutar_supervisado
+
+
+def _sumar(a, b):
+    return a + b
+
+
+def _fallar():
+    raise ValueError("PDF roto")
+
+
+def _dormir(segundos):
+    time.sleep(segundos)
+
+
+def _sumar_despacio(a, b):
+    time.sleep(0.5)
+    return a + b
+
+
+def _reservar(mb):
+    bloque = bytearray(mb * 1024 * 1024)
+    time.sleep(5)
+    return len(bloque)
+
+
+def test_retorna_el_resultado_del_hijo():
+    assert ejecutar_supervisado(_sumar, 2, b=3) == 5
+
+
+def test_propaga_la_excepcion_del_hijo():
+    with pytest.raises(ValueError, match="PDF roto"):
+        ejecutar_supervisado(_fallar)
+
+
+def test_tiempo_excedido_reporta_el_tiempo_real():
+    with pytest.raises(ExtraccionAbortada) as error:
+        ejecutar_supervisado(_dormir, 5, tiempo_maximo=0.5, intervalo=0.05)
+    assert error.value.motivo == 'tiempo excedido'
+    assert error.value.detalle.startswith('0.') and error.value.detalle.endswith('> 0.5s')
+
+
+def test_memoria_excedida():
+    with pytest.raises(ExtraccionAbortada) as error:
+        ejecutar_supervisado(_reservar, 200, memoria_maxima_mb=100, intervalo=0.05)
+    assert error.value.motivo == 'memoria excedida'
+
+
+def test_memoria_del_padre_no_cuenta_en_el_limite():
+    # Lo que el padre ya tiene (compartido tras el fork) no es del hijo
+    ocupado = bytearray(300 * 1024 * 1024)
+    ocupado[::4096] = b'x' * len(ocupado[::4096])
+    assert ejecutar_supervisado(_sumar_despacio, 1, 1, memoria_maxima_mb=150, intervalo=0.05) == 2
+
+
+def test_espera_las_exportaciones_antes_del_fork(tmp_path):
+    pytest.importorskip("xlsxwriter")
+    import polars as pl
+    from exportacion import esperar_exportaciones, exportar_xlsx_en_segundo_plano
+
+    futuro = exportar_xlsx_en_segundo_plano(pl.DataFrame({'a': list(range(20000))}), tmp_path / 'r.xlsx')
+    ejecutar_supervisado(_sumar, 1, 1)
+
+    assert futuro.done()
+    assert esperar_exportaciones()
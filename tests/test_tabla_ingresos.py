@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import json
+
+from conftest import INGRESO_ANUAL_NETO_CENTAVOS, PAGINA_GENERALES, PAGINA_INGRESOS, PAGINA_RELLENO
+
+from extraccion_pdf import (DIRECTORIO_CACHE_TABLAS, FilaIngreso, calcular_digest_pdf, campos_desde_tabla,
+                            extraer_tabla_ingresos)
+
+
+def test_filas_de_la_tabla_con_conceptos_de_varios_renglones(crear_pdf):
+    ruta = crear_pdf('d.pdf', [PAGINA_GENERALES, PAGINA_INGRESOS, PAGINA_RELLENO])
+
+    filas = extraer_tabla_ingresos(ruta)
+
+    assert [fila.numeral for fila in filas] == ['I', 'II', 'II.1', 'II.2', 'II.3', 'II.4', 'II.5', 'A', 'B', 'C']
+    assert all(fila.pagina == 1 for fila in filas)
+    assert filas[0].concepto.endswith('(CANTIDADES NETAS DESPUÉS DE IMPUESTOS)')
+    assert filas[0].monto_centavos == 123456700
+    assert campos_desde_tabla(filas) == {
+        'remuneracion_cargo_publico_centavos': 123456700,
+        'otros_ingresos_centavos': 4500000,
+        'actividad_financiera_centavos': 500000,
+        'servicios_profesionales_centavos': 4000000,
+        'ingreso_anual_neto_centavos': INGRESO_ANUAL_NETO_CENTAVOS,
+    }
+
+
+def test_tabla_en_cache_por_digest(crear_pdf):
+    ruta = crear_pdf('d.pdf', [PAGINA_INGRESOS])
+    filas = extraer_tabla_ingresos(ruta)
+    ruta_cache = DIRECTORIO_CACHE_TABLAS / f"{calcular_digest_pdf(ruta)}.json"
+    guardada = [FilaIngreso('A', 'DE LA CACHÉ', 1, 0)._asdict()]
+    ruta_cache.write_text(json.dumps(guardada), encoding='utf-8')
+
+    assert extraer_tabla_ingresos(ruta) == [FilaIngreso('A', 'DE LA CACHÉ', 1, 0)]
+    assert extraer_tabla_ingresos(ruta, usar_cache=False) == filas
+    assert extraer_tabla_ingresos(ruta) == filas
+
+
+def test_cache_con_montos_en_pesos_se_recalcula(crear_pdf):
+    ruta = crear_pdf('d.pdf', [PAGINA_INGRESOS])
+    DIRECTORIO_CACHE_TABLAS.mkdir(parents=True)
+    ruta_cache = DIRECTORIO_CACHE_TABLAS / f"{calcular_digest_pdf(ruta)}.json"
+    ruta_cache.write_text(json.dumps([{'numeral': 'A', 'concepto': 'INGRESO', 'monto': 1.0, 'pagina': 0}]),
+                          encoding='utf-8')
+
+    filas = extraer_tabla_ingresos(ruta)
+
+    assert FilaIngreso('A', 'INGRESO ANUAL NETO DEL DECLARANTE (SUMA DEL NUMERAL I Y II)',
+                       INGRESO_ANUAL_NETO_CENTAVOS, 0) in filas
+    assert all('monto_centavos' in fila for fila in json.loads(ruta_cache.read_text(encoding='utf-8')))
+
+
+def test_sin_tabla_de_ingresos(crear_pdf):
+    ruta = crear_pdf('d.pdf', [PAGINA_GENERALES, PAGINA_RELLENO])
+
+    filas = extraer_tabla_ingresos(ruta)
+
+    assert filas == []
+    assert all(valor is None for valor in campos_desde_tabla(filas).values())
@@ -19,6 +19,10 @@ from datetime import datetime
 from typing import Dict, Optional, Tuple
 from bs4 import BeautifulSoup
 
+from extraccion_pdf import validar_pdf, extraer_texto_pdf
+from patrones import extraer_ingreso_anual_neto, extraer_datos_adicionales
+from montos import estadisticas_centavos, formatear_centavos
+
 print("✓ Librerías importadas correctamente")
 
 # %% CELDA 2: Configuración de directorios
@@ -183,136 +187,6 @@ def descargar_pdf(url: str, codigo: str, max_intentos: int = 3) -> Optional[Path
 
 print("✓ Función descargar_pdf definida")
 
-# %% CELDA 6: Funciones para validar y extraer texto del PDF
-def validar_pdf(ruta_pdf: Path) -> bool:
-    """Valida si un archivo es realmente un PDF válido."""
-    try:
-        # Verificar que existe
-        if not ruta_pdf.exists():
-            return False
-        
-        # Verificar tamaño mínimo (PDFs vacíos son sospechosos)
-        if ruta_pdf.stat().st_size < 1024:  # Menos de 1KB
-            print(f"  ⚠ Archivo muy pequeño: {ruta_pdf.stat().st_size} bytes")
-            return False
-        
-        # Verificar que comienza con %PDF
-        with open(ruta_pdf, 'rb') as f:
-            header = f.read(4)
-            if not header.startswith(b'%PDF'):
-                print(f"  ✗ No tiene encabezado PDF válido: {header}")
-                return False
-        
-        # Intentar abrir con pdfplumber
-        with pdfplumber.open(ruta_pdf) as pdf:
-            if len(pdf.pages) == 0:
-                print(f"  ✗ PDF sin páginas")
-                return False
-        
-        return True
-        
-    except Exception as e:
-        print(f"  ✗ Error validando PDF: {str(e)}")
-        return False
-
-
-def extraer_texto_pdf(ruta_pdf: Path) -> Optional[str]:
-    """Extrae todo el texto de un PDF."""
-    try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            texto_completo = ""
-            for pagina in pdf.pages:
-                texto_completo += pagina.extract_text() or ""
-        return texto_completo
-    except Exception as e:
-        print(f"  ✗ Error extrayendo texto: {str(e)}")
-        return None
-
-print("✓ Funciones validar_pdf y extraer_texto_pdf definidas")
-
-# %% CELDA 7: Función para extraer ingreso anual neto
-def extraer_ingreso_anual_neto(texto: str) -> Optional[float]:
-    """Busca y extrae el ingreso anual neto del texto del PDF."""
-    if not texto:
-        return None
-    
-    # Patrón 1: Línea específica
-    patron1 = r'A\.\s*INGRESO ANUAL NETO DEL DECLARANTE.*?(\d[\d,]+)'
-    match1 = re.search(patron1, texto, re.IGNORECASE | re.DOTALL)
-    if match1:
-        monto = match1.group(1).replace(',', '')
-        return float(monto)
-    
-    # Patrón 2: Formato de tabla
-    patron2 = r'INGRESO ANUAL NETO.*?NUMERAL I Y II\)?\s*(\d[\d,]+)'
-    match2 = re.search(patron2, texto, re.IGNORECASE | re.DOTALL)
-    if match2:
-        monto = match2.group(1).replace(',', '')
-        return float(monto)
-    
-    return None
-
-print("✓ Función extraer_ingreso_anual_neto definida")
-
-# %% CELDA 8: Función para extraer datos adicionales
-def extraer_datos_adicionales(texto: str) -> Dict:
-    """Extrae información adicional del PDF."""
-    datos = {
-        'remuneracion_cargo_publico': None,
-        'otros_ingresos': None,
-        'actividad_financiera': None,
-        'servicios_profesionales': None,
-        'fecha_recepcion': None,
-        'cargo': None,
-        'institucion': None,
-    }
-    
-    # Remuneración por cargo público
-    patron = r'REMUNERACIÓN ANUAL NETA.*?PRESTACIONES.*?(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['remuneracion_cargo_publico'] = float(match.group(1).replace(',', ''))
-    
-    # Otros ingresos
-    patron = r'II\.\s*OTROS INGRESOS.*?II\.1 AL II\.5\)\s*(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['otros_ingresos'] = float(match.group(1).replace(',', ''))
-    
-    # Actividad financiera
-    patron = r'II\.2.*?ACTIVIDAD FINANCIERA.*?IMPUESTOS\)\s*(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['actividad_financiera'] = float(match.group(1).replace(',', ''))
-    
-    # Servicios profesionales
-    patron = r'II\.3.*?SERVICIOS PROFESIONALES.*?IMPUESTOS\)\s*(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['servicios_profesionales'] = float(match.group(1).replace(',', ''))
-    
-    # Fecha de recepción
-    patron = r'FECHA DE RECEPCIÓN:\s*(\d{2}/\d{2}/\d{4})'
-    match = re.search(patron, texto)
-    if match:
-        datos['fecha_recepcion'] = match.group(1)
-    
-    # Cargo
-    patron = r'EMPLEO, CARGO O COMISIÓN\s+([A-ZÁÉÍÓÚÑ\s]+?)(?=\s*DOCENCIA|ESPECIFIQUE|NIVEL)'
-    match = re.search(patron, texto, re.IGNORECASE)
-    if match:
-        datos['cargo'] = match.group(1).strip()
-    
-    # Institución
-    patron = r'NOMBRE DEL ENTE PÚBLICO\s+([A-ZÁÉÍÓÚÑ,.\s]+?)(?=\s*ÁREA|EMPLEO|NIVEL)'
-    match = re.search(patron, texto, re.IGNORECASE)
-    if match:
-        datos['institucion'] = match.group(1).strip()
-    
-    return datos
-
-print("✓ Función extraer_datos_adicionales definida")
-
 # %% CELDA 9: Función para guardar metadatos
 def guardar_metadatos(codigo: str, datos_completos: Dict):
     """Guarda metadatos completos en JSON."""
@@ -351,7 +225,7 @@ def procesar_declaracion(row: Dict, forzar_descarga: bool = False) -> Dict:
         'nombre': nombre,
         'primer_apellido': apellido1,
         'segundo_apellido': apellido2,
-        'ingreso_anual_neto': None,
+        'ingreso_anual_neto_centavos': None,
         'pdf_descargado': False,
         'datos_extraidos': False,
         'ruta_pdf': None,
@@ -395,7 +269,7 @@ def procesar_declaracion(row: Dict, forzar_descarga: bool = False) -> Dict:
     
     # Extraer datos
     ingreso = extraer_ingreso_anual_neto(texto)
-    resultado['ingreso_anual_neto'] = ingreso
+    resultado['ingreso_anual_neto_centavos'] = ingreso
     
     datos_adicionales = extraer_datos_adicionales(texto)
     resultado.update(datos_adicionales)
@@ -404,7 +278,7 @@ def procesar_declaracion(row: Dict, forzar_descarga: bool = False) -> Dict:
     guardar_metadatos(codigo, resultado)
     
     if ingreso:
-        print(f"  ✓ Ingreso anual neto: ${ingreso:,.2f}")
+        print(f"  ✓ Ingreso anual neto: {formatear_centavos(ingreso)}")
     else:
         print(f"  ⚠ Ingreso no encontrado")
     
@@ -520,7 +394,11 @@ def procesar_todas_declaraciones(df, columna_url: str = None, limite: Optional[i
         return None
     
     import pandas as pd
-    return pd.DataFrame(resultados)
+    df_resultados = pd.DataFrame(resultados)
+    # Centavos como enteros (con nulos), no como float
+    columnas_centavos = [c for c in df_resultados.columns if c.endswith('_centavos')]
+    df_resultados[columnas_centavos] = df_resultados[columnas_centavos].astype('Int64')
+    return df_resultados
 
 print("✓ Función procesar_todas_declaraciones definida")
 
@@ -559,7 +437,7 @@ def mostrar_estadisticas(df_resultados):
     total = len(df_resultados)
     exitosos = (df_resultados['datos_extraidos'] == True).sum()
     pdfs_desc = (df_resultados['pdf_descargado'] == True).sum()
-    con_ingreso = df_resultados['ingreso_anual_neto'].notna().sum()
+    con_ingreso = df_resultados['ingreso_anual_neto_centavos'].notna().sum()
     
     print(f"Total procesados: {total}")
     print(f"PDFs descargados: {pdfs_desc}")
@@ -567,11 +445,11 @@ def mostrar_estadisticas(df_resultados):
     print(f"Ingresos encontrados: {con_ingreso}")
     
     if con_ingreso > 0:
-        ingresos = df_resultados[df_resultados['ingreso_anual_neto'].notna()]
-        print(f"\nPromedio de ingresos: ${ingresos['ingreso_anual_neto'].mean():,.2f}")
-        print(f"Mediana: ${ingresos['ingreso_anual_neto'].median():,.2f}")
-        print(f"Mínimo: ${ingresos['ingreso_anual_neto'].min():,.2f}")
-        print(f"Máximo: ${ingresos['ingreso_anual_neto'].max():,.2f}")
+        stats = estadisticas_centavos(pl.Series(df_resultados['ingreso_anual_neto_centavos'].dropna().tolist()))
+        print(f"\nPromedio de ingresos: {formatear_centavos(stats['promedio'])}")
+        print(f"Mediana: {formatear_centavos(stats['mediana'])}")
+        print(f"Mínimo: {formatear_centavos(stats['minimo'])}")
+        print(f"Máximo: {formatear_centavos(stats['maximo'])}")
     
     print("="*60)
 
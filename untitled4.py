@@ -19,6 +19,7 @@ print("📦 Asegúrate de haber instalado: pip install selenium webdriver-manage
 
 # %% CELDA 2: Importar librerías
 import pandas as pd
+import polars as pl
 import pdfplumber
 import re
 from io import BytesIO
@@ -37,6 +38,10 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import requests
 
+from extraccion_pdf import validar_pdf, extraer_texto_pdf
+from patrones import extraer_ingreso_anual_neto, extraer_datos_adicionales
+from montos import estadisticas_centavos, formatear_centavos
+
 print("✓ Librerías importadas")
 
 # %% CELDA 3: Configuración de directorios
@@ -92,24 +97,6 @@ def generar_codigo_declaracion(nombre: str, apellido1: str, apellido2: str, url:
     codigo = f"{apellido1_limpio}_{apellido2_limpio}_{nombre_limpio}_{url_hash}"
     return codigo
 
-def validar_pdf(ruta_pdf: Path) -> bool:
-    """Valida si un archivo es un PDF válido."""
-    try:
-        if not ruta_pdf.exists() or ruta_pdf.stat().st_size < 1024:
-            return False
-        
-        with open(ruta_pdf, 'rb') as f:
-            if not f.read(4).startswith(b'%PDF'):
-                return False
-        
-        with pdfplumber.open(ruta_pdf) as pdf:
-            if len(pdf.pages) == 0:
-                return False
-        
-        return True
-    except:
-        return False
-
 print("✓ Funciones auxiliares definidas")
 
 # %% CELDA 6: Descargar PDF con Selenium
@@ -282,57 +269,6 @@ def descargar_pdf_selenium(driver, url: str, codigo: str, timeout: int = 30) ->
 print("✓ Función descargar_pdf_selenium definida")
 
 # %% CELDA 7: Funciones de extracción de datos
-def extraer_texto_pdf(ruta_pdf: Path) -> Optional[str]:
-    """Extrae texto del PDF."""
-    try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            texto = ""
-            for pagina in pdf.pages:
-                texto += pagina.extract_text() or ""
-        return texto
-    except Exception as e:
-        print(f"  ✗ Error extrayendo texto: {e}")
-        return None
-
-def extraer_ingreso_anual_neto(texto: str) -> Optional[float]:
-    """Extrae el ingreso anual neto."""
-    if not texto:
-        return None
-    
-    patrones = [
-        r'A\.\s*INGRESO ANUAL NETO DEL DECLARANTE.*?(\d[\d,]+)',
-        r'INGRESO ANUAL NETO.*?NUMERAL I Y II\)?\s*(\d[\d,]+)',
-    ]
-    
-    for patron in patrones:
-        match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-        if match:
-            return float(match.group(1).replace(',', ''))
-    
-    return None
-
-def extraer_datos_adicionales(texto: str) -> Dict:
-    """Extrae información adicional."""
-    datos = {
-        'remuneracion_cargo_publico': None,
-        'otros_ingresos': None,
-        'actividad_financiera': None,
-        'servicios_profesionales': None,
-        'fecha_recepcion': None,
-        'cargo': None,
-        'institucion': None,
-    }
-    
-    # Implementación de patrones (igual que antes)
-    patron = r'REMUNERACIÓN ANUAL NETA.*?PRESTACIONES.*?(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['remuneracion_cargo_publico'] = float(match.group(1).replace(',', ''))
-    
-    # ... (resto de patrones)
-    
-    return datos
-
 def guardar_metadatos(codigo: str, datos: Dict):
     """Guarda metadatos en JSON."""
     ruta = DIRECTORIO_METADATOS / f"{codigo}.json"
@@ -341,7 +277,7 @@ def guardar_metadatos(codigo: str, datos: Dict):
         json.dump(datos, f, indent=2, ensure_ascii=False)
     print(f"  ✓ Metadatos guardados")
 
-print("✓ Funciones de extracción definidas")
+print("✓ Función guardar_metadatos definida")
 
 # %% CELDA 8: Procesar una declaración
 def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Dict:
@@ -364,7 +300,7 @@ def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Di
         'nombre': nombre,
         'primer_apellido': apellido1,
         'segundo_apellido': apellido2,
-        'ingreso_anual_neto': None,
+        'ingreso_anual_neto_centavos': None,
         'pdf_descargado': False,
         'datos_extraidos': False,
         'ruta_pdf': None,
@@ -404,7 +340,7 @@ def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Di
         return resultado
     
     ingreso = extraer_ingreso_anual_neto(texto)
-    resultado['ingreso_anual_neto'] = ingreso
+    resultado['ingreso_anual_neto_centavos'] = ingreso
     
     datos_adicionales = extraer_datos_adicionales(texto)
     resultado.update(datos_adicionales)
@@ -413,7 +349,7 @@ def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Di
     guardar_metadatos(codigo, resultado)
     
     if ingreso:
-        print(f"  ✓ Ingreso anual neto: ${ingreso:,.2f}")
+        print(f"  ✓ Ingreso anual neto: {formatear_centavos(ingreso)}")
     else:
         print(f"  ⚠ Ingreso no encontrado")
     
@@ -500,7 +436,11 @@ def procesar_todas(df, limite: Optional[int] = None, forzar_descarga: bool = Fal
     if not resultados:
         return None
     
-    return pd.DataFrame(resultados)
+    df_resultados = pd.DataFrame(resultados)
+    # Centavos como enteros (con nulos), no como float
+    columnas_centavos = [c for c in df_resultados.columns if c.endswith('_centavos')]
+    df_resultados[columnas_centavos] = df_resultados[columnas_centavos].astype('Int64')
+    return df_resultados
 
 print("✓ Función procesar_todas definida")
 
@@ -535,18 +475,18 @@ def mostrar_estadisticas(df):
     
     total = len(df)
     exitosos = (df['datos_extraidos'] == True).sum()
-    con_ingreso = df['ingreso_anual_neto'].notna().sum()
+    con_ingreso = df['ingreso_anual_neto_centavos'].notna().sum()
     
     print(f"Total: {total}")
     print(f"Exitosos: {exitosos}")
     print(f"Con ingreso: {con_ingreso}")
     
     if con_ingreso > 0:
-        ing = df[df['ingreso_anual_neto'].notna()]['ingreso_anual_neto']
-        print(f"\nPromedio: ${ing.mean():,.2f}")
-        print(f"Mediana: ${ing.median():,.2f}")
-        print(f"Min: ${ing.min():,.2f}")
-        print(f"Max: ${ing.max():,.2f}")
+        stats = estadisticas_centavos(pl.Series(df['ingreso_anual_neto_centavos'].dropna().tolist()))
+        print(f"\nPromedio: {formatear_centavos(stats['promedio'])}")
+        print(f"Mediana: {formatear_centavos(stats['mediana'])}")
+        print(f"Min: {formatear_centavos(stats['minimo'])}")
+        print(f"Max: {formatear_centavos(stats['maximo'])}")
     
     errores = df[df['error'].notna()]
     if len(errores) > 0:
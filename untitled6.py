@@ -26,6 +26,7 @@ print("📦 Asegúrate de haber instalado: pip install selenium webdriver-manage
 
 # %% CELDA 2: Importar librerías
 import pandas as pd
+import polars as pl
 import pdfplumber
 import re
 from io import BytesIO
@@ -44,6 +45,27 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import requests
 
+from extraccion_pdf import (validar_pdf, extraer_texto_pdf, extraer_texto_dirigido,
+                            extraer_tabla_ingresos, cargar_tabla_ingresos_cache, campos_desde_tabla,
+                            extraer_texto_con_ocr, DPI_OCR,
+                            guardar_texto_cache, cargar_textos_cache, cargar_texto_cache,
+                            huella_extraccion, comparar_huella, ESTADOS_REPROCESO)
+import patrones
+from patrones import extraer_campos, extraer_campos_lote, recargar_especificacion
+from montos import agregar_columnas_centavos, estadisticas_centavos, formatear_centavos
+from almacen import Almacen, RUTA_ALMACEN
+from manifiesto import Manifiesto, abrir_manifiesto
+from sumidero import SumideroParquet, leer_resultados_corrida, archivar_corrida
+from esquema import ResultadoDeclaracion, a_dataframe
+from archivo_pdfs import (fuente_pdf, pdf_disponible, ubicacion_pdf, DocumentoArchivado,
+                          DIRECTORIO_ARCHIVO)
+from parser_declaracion import construir_tablas, cargar_tabla, DIRECTORIO_TABLAS
+from dataset_resultados import upsert_resultados, escanear_resultados, DIRECTORIO_DATASET
+from exportacion import (FORMATOS_DEFAULT, validar_formatos, exportar_xlsx_en_segundo_plano,
+                         esperar_exportaciones)
+from supervisor import (ejecutar_supervisado, ExtraccionAbortada,
+                        TIEMPO_MAXIMO_S, MEMORIA_MAXIMA_MB)
+
 print("✓ Librerías importadas")
 
 # %% CELDA 3: Configuración de directorios
@@ -55,6 +77,11 @@ DIRECTORIO_PDFS.mkdir(exist_ok=True)
 DIRECTORIO_METADATOS.mkdir(exist_ok=True)
 DIRECTORIO_RESULTADOS.mkdir(exist_ok=True)
 
+# Metadatos en SQLite; los JSON de corridas anteriores se importan la primera vez
+ALMACEN = Almacen(RUTA_ALMACEN)
+if len(ALMACEN) == 0 and any(DIRECTORIO_METADATOS.glob("*.json")):
+    print(f"✓ {ALMACEN.importar_json(DIRECTORIO_METADATOS)} metadatos JSON importados a {RUTA_ALMACEN}")
+
 print("✓ Directorios configurados")
 
 # %% CELDA 4: Configurar navegador Selenium
@@ -117,24 +144,6 @@ def generar_codigo_declaracion(nombre: str, apellido1: str, apellido2: str, url:
     
     return codigo
 
-def validar_pdf(ruta_pdf: Path) -> bool:
-    """Valida si un archivo es un PDF válido."""
-    try:
-        if not ruta_pdf.exists() or ruta_pdf.stat().st_size < 1024:
-            return False
-        
-        with open(ruta_pdf, 'rb') as f:
-            if not f.read(4).startswith(b'%PDF'):
-                return False
-        
-        with pdfplumber.open(ruta_pdf) as pdf:
-            if len(pdf.pages) == 0:
-                return False
-        
-        return True
-    except:
-        return False
-
 print("✓ Funciones auxiliares definidas")
 
 # %% CELDA 6: Descargar PDF con Selenium usando botón de descarga
@@ -259,70 +268,36 @@ def descargar_pdf_selenium(driver, url: str, codigo: str, timeout: int = 30) ->
 print("✓ Función descargar_pdf_selenium definida")
 
 # %% CELDA 7: Funciones de extracción de datos
-def extraer_texto_pdf(ruta_pdf: Path) -> Optional[str]:
-    """Extrae texto del PDF."""
-    try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            texto = ""
-            for pagina in pdf.pages:
-                texto += pagina.extract_text() or ""
-        return texto
-    except Exception as e:
-        print(f"  ✗ Error extrayendo texto: {e}")
-        return None
-
-def extraer_ingreso_anual_neto(texto: str) -> Optional[float]:
-    """Extrae el ingreso anual neto."""
-    if not texto:
-        return None
-    
-    patrones = [
-        r'A\.\s*INGRESO ANUAL NETO DEL DECLARANTE.*?(\d[\d,]+)',
-        r'INGRESO ANUAL NETO.*?NUMERAL I Y II\)?\s*(\d[\d,]+)',
-    ]
-    
-    for patron in patrones:
-        match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-        if match:
-            return float(match.group(1).replace(',', ''))
-    
-    return None
-
-def extraer_datos_adicionales(texto: str) -> Dict:
-    """Extrae información adicional."""
-    datos = {
-        'remuneracion_cargo_publico': None,
-        'otros_ingresos': None,
-        'actividad_financiera': None,
-        'servicios_profesionales': None,
-        'fecha_recepcion': None,
-        'cargo': None,
-        'institucion': None,
-    }
-    
-    # Implementación de patrones (igual que antes)
-    patron = r'REMUNERACIÓN ANUAL NETA.*?PRESTACIONES.*?(\d[\d,]+)'
-    match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        datos['remuneracion_cargo_publico'] = float(match.group(1).replace(',', ''))
-    
-    # ... (resto de patrones)
-    
-    return datos
-
 def guardar_metadatos(codigo: str, datos: Dict):
-    """Guarda metadatos en JSON."""
-    ruta = DIRECTORIO_METADATOS / f"{codigo}.json"
+    """Guarda metadatos en el almacén (JSON: python almacen.py exportar)."""
     datos['timestamp_procesamiento'] = datetime.now().isoformat()
-    with open(ruta, 'w', encoding='utf-8') as f:
-        json.dump(datos, f, indent=2, ensure_ascii=False)
+    datos['version_patrones'] = patrones.VERSION_PATRONES
+    datos['codigo_declaracion'] = codigo
+    ALMACEN.guardar(datos)
     print(f"  ✓ Metadatos guardados")
 
-print("✓ Funciones de extracción definidas")
+
+def cargar_metadatos(codigo: str) -> Optional[Dict]:
+    """Metadatos guardados, o None si no hay."""
+    return ALMACEN.cargar(codigo)
+
+print("✓ Funciones guardar_metadatos y cargar_metadatos definidas")
 
 # %% CELDA 8: Procesar una declaración
-def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Dict:
-    """Procesa una declaración completa."""
+def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False,
+                         extraccion_dirigida: bool = False,
+                         tiempo_maximo: Optional[float] = TIEMPO_MAXIMO_S,
+                         memoria_maxima_mb: Optional[float] = MEMORIA_MAXIMA_MB,
+                         tabla_ingresos: bool = False,
+                         usar_ocr: bool = False,
+                         dpi_ocr: int = DPI_OCR,
+                         forzar_extraccion: bool = False,
+                         manifiesto: Optional[Manifiesto] = None) -> ResultadoDeclaracion:
+    """
+    Procesa una declaración completa. Si el PDF local, las versiones de los
+    extractores y las opciones no cambiaron, reutiliza el resultado guardado.
+    Con driver=None (reprocesar) solo usa el PDF local y nunca lo borra.
+    """
     url = row.get('url', '')
     nombre = row.get('nombre', '')
     apellido1 = row.get('primer_apellido', '')
@@ -335,66 +310,147 @@ def procesar_declaracion(driver, row: Dict, forzar_descarga: bool = False) -> Di
     print(f"Código: {codigo}")
     print(f"{'='*60}")
     
-    resultado = {
-        'codigo_declaracion': codigo,
-        'url': url,
-        'nombre': nombre,
-        'primer_apellido': apellido1,
-        'segundo_apellido': apellido2,
-        'ingreso_anual_neto': None,
-        'pdf_descargado': False,
-        'datos_extraidos': False,
-        'ruta_pdf': None,
-        'error': None,
-    }
-    
-    ruta_pdf = DIRECTORIO_PDFS / f"{codigo}.pdf"
+    resultado = ResultadoDeclaracion(codigo, url, nombre, apellido1, apellido2)
     
-    # Verificar si existe y es válido
-    if ruta_pdf.exists() and not forzar_descarga:
-        print(f"  ℹ PDF existe, validando...")
-        if validar_pdf(ruta_pdf):
-            print(f"  ✓ PDF válido")
-        else:
-            print(f"  ⚠ PDF inválido, eliminando...")
-            ruta_pdf.unlink()
-            ruta_pdf = None
-    
-    # Descargar si es necesario
-    if not ruta_pdf or not ruta_pdf.exists():
-        ruta_pdf = descargar_pdf_selenium(driver, url, codigo)
-        if not ruta_pdf:
-            resultado['error'] = 'No se pudo descargar PDF'
+    # Validación y extracción corren en un proceso vigilado: si un PDF
+    # cuelga a pdfplumber o consume demasiada memoria, se registra y se sigue
+    limites = {'tiempo_maximo': tiempo_maximo, 'memoria_maxima_mb': memoria_maxima_mb}
+    recargar_especificacion()
+    previo = cargar_metadatos(codigo)
+    huella, estado = None, 'completo'
+    # Un documento archivado mantiene abierto un mmap del segmento hasta cerrarlo
+    archivado = None
+    try:
+        try:
+            # PDF suelto o, si no hay, el documento en archivo_pdfs
+            ruta_pdf = fuente_pdf(codigo, DIRECTORIO_PDFS)
+            archivado = ruta_pdf if isinstance(ruta_pdf, DocumentoArchivado) else None
+            
+            # Verificar si es válido. Un PDF con el mismo digest que el de la
+            # última extracción exitosa no se vuelve a validar
+            if ruta_pdf is not None and not forzar_descarga:
+                huella = huella_extraccion(ruta_pdf, patrones.VERSION_PATRONES,
+                                           extraccion_dirigida, tabla_ingresos)
+                estado = 'completo' if forzar_extraccion else comparar_huella(previo, huella)
+                if estado == 'completo':
+                    print(f"  ℹ PDF existe, validando..." if isinstance(ruta_pdf, Path)
+                          else f"  ℹ PDF archivado en {DIRECTORIO_ARCHIVO}, validando...")
+                    if ejecutar_supervisado(validar_pdf, ruta_pdf, **limites):
+                        print(f"  ✓ PDF válido")
+                    elif driver is None:
+                        # Sin navegador (reprocesar) no hay con qué reemplazarlo: se conserva
+                        print(f"  ✗ PDF inválido, se conserva (sin navegador para volver a descargarlo)")
+                        resultado.error = 'PDF local inválido'
+                        ALMACEN.registrar_intento(codigo, 'extraccion', False, resultado.error, url)
+                        return resultado
+                    elif isinstance(ruta_pdf, Path):
+                        print(f"  ⚠ PDF inválido, eliminando...")
+                        ruta_pdf.unlink()
+                        ruta_pdf = None
+                    else:
+                        # El archivo no se toca: la descarga nueva queda suelta y tiene prioridad
+                        print(f"  ⚠ PDF archivado inválido, se descarga de nuevo")
+                        ruta_pdf = None
+            
+            # Descargar si es necesario
+            if ruta_pdf is None:
+                if driver is None:
+                    print(f"  ✗ Sin PDF local y sin navegador para descargarlo")
+                    resultado.error = 'PDF no disponible'
+                    return resultado
+                ruta_pdf = descargar_pdf_selenium(driver, url, codigo)
+                if not ruta_pdf:
+                    resultado.error = 'No se pudo descargar PDF'
+                    ALMACEN.registrar_intento(codigo, 'descarga', False, resultado.error, url)
+                    return resultado
+            
+                if not ejecutar_supervisado(validar_pdf, ruta_pdf, **limites):
+                    resultado.error = 'PDF descargado es inválido'
+                    ALMACEN.registrar_intento(codigo, 'descarga', False, resultado.error, url)
+                    return resultado
+                ALMACEN.registrar_intento(codigo, 'descarga', True, url=url)
+                huella = None
+            
+            if huella is None:
+                huella = huella_extraccion(ruta_pdf, patrones.VERSION_PATRONES,
+                                           extraccion_dirigida, tabla_ingresos)
+                estado = 'completo' if forzar_extraccion else comparar_huella(previo, huella)
+            
+            if estado == 'sin_cambios':
+                print(f"  ✓ Sin cambios desde la última extracción, se reutiliza el resultado")
+                return ResultadoDeclaracion.desde_dict(previo)
+            
+            resultado.pdf_descargado = True
+            resultado.ruta_pdf = ubicacion_pdf(ruta_pdf)
+            resultado.actualizar(huella)
+            if manifiesto:
+                manifiesto.registrar(codigo, 'descargado')
+            
+            # Si solo cambió campos.toml basta el texto en caché
+            texto = cargar_texto_cache(codigo) if estado == 'campos' else None
+            desde_cache = texto is not None
+            if desde_cache:
+                print(f"  → Solo cambiaron los campos, se re-extraen desde el texto en caché")
+            elif extraccion_dirigida:
+                # Extraer datos (en modo dirigido solo las páginas con los campos)
+                texto = ejecutar_supervisado(extraer_texto_dirigido, ruta_pdf,
+                                             extraer_campos, **limites)
+            else:
+                texto = ejecutar_supervisado(extraer_texto_pdf, ruta_pdf, **limites)
+        except ExtraccionAbortada as e:
+            print(f"  ✗ {e.mensaje_error()} ({e.detalle})")
+            resultado.error = e.mensaje_error()
+            ALMACEN.registrar_intento(codigo, 'extraccion', False, resultado.error, url)
             return resultado
         
-        if not validar_pdf(ruta_pdf):
-            resultado['error'] = 'PDF descargado es inválido'
+        # Declaración escaneada: OCR solo de las páginas sin capa de texto
+        if usar_ocr and not (texto or '').strip():
+            texto = extraer_texto_con_ocr(ruta_pdf, dpi=dpi_ocr)
+        
+        if not texto or not texto.strip():
+            resultado.error = 'Error extrayendo texto'
+            ALMACEN.registrar_intento(codigo, 'extraccion', False, resultado.error, url)
             return resultado
-    
-    resultado['pdf_descargado'] = True
-    resultado['ruta_pdf'] = str(ruta_pdf)
-    
-    # Extraer datos
-    texto = extraer_texto_pdf(ruta_pdf)
-    if not texto:
-        resultado['error'] = 'Error extrayendo texto'
+        if not desde_cache:
+            ALMACEN.registrar_intento(codigo, 'extraccion', True, url=url)
+        
+        # El texto queda en caché para re-extraer campos en lote; el del modo
+        # dirigido como parcial, que construir_tablas completa desde el PDF
+        if not desde_cache:
+            guardar_texto_cache(codigo, texto, completo=not extraccion_dirigida)
+        
+        # Todos los campos en una sola pasada sobre el texto
+        datos = extraer_campos(texto)
+        ingreso = datos['ingreso_anual_neto_centavos']
+        resultado.actualizar(datos)
+        
+        # Montos de ingresos desde la tabla (geometría de las palabras) si se pidió
+        if tabla_ingresos:
+            try:
+                filas = ejecutar_supervisado(extraer_tabla_ingresos, ruta_pdf, **limites)
+            except ExtraccionAbortada as e:
+                print(f"  ⚠ Tabla de ingresos: {e.mensaje_error()} ({e.detalle})")
+                filas = None
+            if filas:
+                campos_tabla = campos_desde_tabla(filas)
+                resultado.actualizar({k: v for k, v in campos_tabla.items() if v is not None})
+                ingreso = resultado.get('ingreso_anual_neto_centavos')
+        
+        resultado.datos_extraidos = True
+        
+        registro = resultado.a_dict()
+        guardar_metadatos(codigo, registro)
+        resultado.actualizar(registro)
+        
+        if ingreso:
+            print(f"  ✓ Ingreso anual neto: {formatear_centavos(ingreso)}")
+        else:
+            print(f"  ⚠ Ingreso no encontrado")
+        
         return resultado
-    
-    ingreso = extraer_ingreso_anual_neto(texto)
-    resultado['ingreso_anual_neto'] = ingreso
-    
-    datos_adicionales = extraer_datos_adicionales(texto)
-    resultado.update(datos_adicionales)
-    resultado['datos_extraidos'] = True
-    
-    guardar_metadatos(codigo, resultado)
-    
-    if ingreso:
-        print(f"  ✓ Ingreso anual neto: ${ingreso:,.2f}")
-    else:
-        print(f"  ⚠ Ingreso no encontrado")
-    
-    return resultado
+    finally:
+        if archivado is not None:
+            archivado.close()
 
 print("✓ Función procesar_declaracion definida")
 
@@ -416,8 +472,15 @@ def leer_excel(ruta_excel: str, skiprows: int = 5):
 print("✓ Función leer_excel definida")
 
 # %% CELDA 10: Procesar todas las declaraciones
-def procesar_todas(df, limite: Optional[int] = None, forzar_descarga: bool = False):
-    """Procesa todas las declaraciones."""
+def procesar_todas(df, limite: Optional[int] = None, forzar_descarga: bool = False,
+                   extraccion_dirigida: bool = False, reanudar: bool = False,
+                   reintentar_fallidos: bool = False):
+    """
+    Procesa todas las declaraciones. Cada cambio de estado queda en el
+    manifiesto de la corrida y cada resultado se escribe por lotes en
+    Parquet (corridas/resultados/, legible mientras corre); con `reanudar`
+    se saltan las que ya terminaron.
+    """
     
     # Buscar columna URL
     columnas = df.columns.tolist()
@@ -442,64 +505,225 @@ def procesar_todas(df, limite: Optional[int] = None, forzar_descarga: bool = Fal
         registros = registros[:limite]
         print(f"\n⚠ Procesando solo {limite} registros")
     
-    # Crear driver
-    print("\n🌐 Iniciando navegador Chrome...")
-    driver = crear_driver()
-    
-    resultados = []
     total = len(registros)
+    pendientes = []
+    for idx, row in enumerate(registros, 1):
+        url = row.get(col_url)
+        if not (url and isinstance(url, str) and url.startswith('http')):
+            print(f"\n[{idx}/{total}] ✗ URL inválida")
+            continue
+        
+        row_proc = {
+            'url': url,
+            'nombre': row.get(col_nombre, ''),
+            'primer_apellido': row.get(col_ap1, ''),
+            'segundo_apellido': row.get(col_ap2, ''),
+        }
+        codigo = generar_codigo_declaracion(row_proc['nombre'], row_proc['primer_apellido'],
+                                            row_proc['segundo_apellido'], url)
+        pendientes.append((idx, codigo, row_proc))
+    
+    if not reanudar:
+        archivar_corrida()
+    manifiesto = abrir_manifiesto(reanudar)
+    manifiesto.encolar(codigo for _, codigo, _ in pendientes)
+    sumidero = SumideroParquet()
+    driver = None
     
     try:
-        for idx, row in enumerate(registros, 1):
-            url = row.get(col_url)
+        if reanudar:
+            # Terminadas cuyo lote no alcanzó a escribirse: su resultado se relee del manifiesto
+            escritos = sumidero.codigos_escritos()
+            for resultado in manifiesto.resultados_guardados(
+                    codigo for _, codigo, _ in pendientes
+                    if codigo not in escritos and manifiesto.completado(codigo, reintentar_fallidos)):
+                sumidero.agregar(resultado)
+        
+        for posicion, (idx, codigo, row_proc) in enumerate(pendientes, 1):
+            if manifiesto.completado(codigo, reintentar_fallidos):
+                continue
             
-            row_proc = {
-                'url': url,
-                'nombre': row.get(col_nombre, ''),
-                'primer_apellido': row.get(col_ap1, ''),
-                'segundo_apellido': row.get(col_ap2, ''),
-            }
+            # El navegador se abre solo si queda algo por procesar
+            if driver is None:
+                print("\n🌐 Iniciando navegador Chrome...")
+                driver = crear_driver()
             
-            if url and isinstance(url, str) and url.startswith('http'):
-                print(f"\n[{idx}/{total}]")
-                resultado = procesar_declaracion(driver, row_proc, forzar_descarga)
-                resultados.append(resultado)
-                
-                if idx < total:
-                    time.sleep(2)
-            else:
-                print(f"\n[{idx}/{total}] ✗ URL inválida")
+            print(f"\n[{idx}/{total}]")
+            pdf_local = pdf_disponible(codigo, DIRECTORIO_PDFS) and not forzar_descarga
+            
+            resultado = procesar_declaracion(driver, row_proc, forzar_descarga,
+                                             extraccion_dirigida, manifiesto=manifiesto)
+            # Los metadatos se confirman antes de que el manifiesto la dé por terminada
+            ALMACEN.confirmar()
+            manifiesto.terminar(resultado)
+            sumidero.agregar(resultado)
+            
+            # Pausa solo si hubo descarga
+            if posicion < len(pendientes) and not pdf_local:
+                time.sleep(2)
     
     finally:
-        print("\n🔒 Cerrando navegador...")
-        driver.quit()
+        sumidero.cerrar()
+        ALMACEN.confirmar()
+        manifiesto.cerrar()
+        if driver is not None:
+            print("\n🔒 Cerrando navegador...")
+            driver.quit()
+    
+    # Resultados de la corrida con su esquema (montos también en centavos)
+    df_resultados = leer_resultados_corrida()
+    if df_resultados.is_empty():
+        return None
+    return df_resultados.to_pandas()
+
+print("✓ Función procesar_todas definida")
+
+# %% CELDA 10B: Re-extraer campos desde la caché de texto
+def reextraer_desde_cache(codigos=None):
+    """Re-extrae todos los campos desde el texto en caché, sin abrir los PDFs."""
+    inicio = time.perf_counter()
+    textos = cargar_textos_cache(codigos)
+    if textos.is_empty():
+        print("⚠ No hay textos en caché")
+        return None
     
-    if not resultados:
+    campos = extraer_campos_lote(textos)
+    print(f"✓ {len(campos)} declaraciones re-extraídas en {time.perf_counter() - inicio:.2f}s")
+    return campos.to_pandas()
+
+
+def reaplicar_especificacion():
+    """
+    Re-extrae desde la caché de texto solo las declaraciones procesadas con
+    una versión anterior de campos.toml y actualiza sus metadatos.
+    """
+    recargar_especificacion()
+    version = patrones.VERSION_PATRONES
+    
+    desactualizadas = {datos['codigo_declaracion']: datos for datos in ALMACEN.registros()
+                       if datos.get('version_patrones', 0) < version}
+    
+    if not desactualizadas:
+        print(f"✓ Todas las declaraciones están en la versión {version}")
         return None
     
-    return pd.DataFrame(resultados)
+    print(f"→ {len(desactualizadas)} declaraciones con versión anterior a {version}")
+    campos = extraer_campos_lote(cargar_textos_cache(list(desactualizadas)))
+    
+    sin_tabla = 0
+    for fila in campos.iter_rows(named=True):
+        previo = desactualizadas[fila['codigo_declaracion']]
+        # Como registro: los montos en pesos de versiones anteriores no se arrastran
+        registro = ResultadoDeclaracion.desde_dict(previo)
+        registro.actualizar(fila)
+        if previo.get('tabla_ingresos'):
+            # Sus montos de ingresos vienen de la tabla, no de los patrones
+            filas_tabla = cargar_tabla_ingresos_cache(previo['digest_pdf']) if previo.get('digest_pdf') else None
+            if filas_tabla is None:
+                sin_tabla += 1
+                continue
+            registro.actualizar({k: v for k, v in campos_desde_tabla(filas_tabla).items() if v is not None})
+        guardar_metadatos(fila['codigo_declaracion'], registro.a_dict())
+    ALMACEN.confirmar()
+    
+    sin_texto = len(desactualizadas) - len(campos)
+    if sin_texto:
+        print(f"⚠ {sin_texto} sin texto en caché (hay que reprocesar su PDF)")
+    if sin_tabla:
+        print(f"⚠ {sin_tabla} con tabla de ingresos sin caché (quedan para reprocesar)")
+    return campos.to_pandas()
 
-print("✓ Función procesar_todas definida")
+
+def reprocesar(forzar: bool = False, usar_ocr: bool = False):
+    """
+    Recalcula solo las declaraciones guardadas cuyo PDF, versión del
+    extractor de texto, versión de campos.toml u opciones cambiaron. Usa
+    los PDFs locales; no abre el navegador.
+    """
+    inicio = time.perf_counter()
+    recargar_especificacion()
+    conteo = {estado: 0 for estado in ESTADOS_REPROCESO}
+    sin_pdf = 0
+    resultados = []
+    
+    for previo in ALMACEN.registros():
+        ruta_pdf = fuente_pdf(previo['codigo_declaracion'], DIRECTORIO_PDFS)
+        if ruta_pdf is None:
+            sin_pdf += 1
+            continue
+        
+        opciones = {
+            'extraccion_dirigida': previo.get('modo_texto') == 'dirigido',
+            'tabla_ingresos': bool(previo.get('tabla_ingresos')),
+        }
+        huella = huella_extraccion(ruta_pdf, patrones.VERSION_PATRONES, **opciones)
+        if isinstance(ruta_pdf, DocumentoArchivado):
+            ruta_pdf.close()
+        estado = 'completo' if forzar else comparar_huella(previo, huella)
+        conteo[estado] += 1
+        if estado == 'sin_cambios':
+            continue
+        
+        row = {clave: previo.get(clave, '') for clave in
+               ('url', 'nombre', 'primer_apellido', 'segundo_apellido')}
+        resultados.append(procesar_declaracion(None, row, usar_ocr=usar_ocr,
+                                               forzar_extraccion=forzar, **opciones))
+    ALMACEN.confirmar()
+    
+    print(f"\n✓ Reproceso en {time.perf_counter() - inicio:.2f}s: {conteo['sin_cambios']} sin cambios, "
+          f"{conteo['campos']} solo campos, {conteo['completo']} desde el PDF")
+    if sin_pdf:
+        print(f"⚠ {sin_pdf} sin PDF local ni archivado (hay que descargarlas)")
+    
+    if not resultados:
+        return None
+    return a_dataframe(resultados).to_pandas()
+
+print("✓ Funciones reextraer_desde_cache, reaplicar_especificacion y reprocesar definidas")
+
+# %% CELDA 10B2: EJECUTAR - Reprocesar solo lo que cambió
+# df_reproceso = reprocesar()
+
+# %% CELDA 10C: Tablas por sección (parser_declaracion)
+# Parsea una vez el texto en caché y guarda datos generales, encargo,
+# ingresos, bienes inmuebles, vehículos y adeudos en DIRECTORIO_TABLAS.
+# filas_tablas = construir_tablas()
+# bienes = cargar_tabla('bienes_inmuebles').collect().to_pandas()
 
 # %% CELDA 11: Guardar resultados
-def guardar_resultados(df_resultados):
-    """Guarda resultados."""
+# Salidas de cada corrida: 'csv', 'dataset' (particionado) y/o 'xlsx' (en segundo plano)
+FORMATOS_SALIDA = FORMATOS_DEFAULT
+
+def guardar_resultados(df_resultados, formatos=None):
+    """Guarda resultados en los formatos pedidos (default: FORMATOS_SALIDA)."""
     if df_resultados is None or len(df_resultados) == 0:
         print("⚠ Sin resultados")
         return
     
+    formatos = validar_formatos(formatos or FORMATOS_SALIDA)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    print()
     
-    ruta_csv = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.csv"
-    df_resultados.to_csv(ruta_csv, index=False)
-    print(f"\n✓ CSV: {ruta_csv}")
-    
-    try:
+    # El Excel se escribe en otro hilo; avisa con ✓/✗ cuando termina
+    if 'xlsx' in formatos:
         ruta_excel = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.xlsx"
-        df_resultados.to_excel(ruta_excel, index=False)
-        print(f"✓ Excel: {ruta_excel}")
-    except:
-        pass
+        exportar_xlsx_en_segundo_plano(df_resultados, ruta_excel)
+        print(f"→ Excel en segundo plano: {ruta_excel}")
+    
+    if 'csv' in formatos:
+        try:
+            ruta_csv = DIRECTORIO_RESULTADOS / f"resultados_{timestamp}.csv"
+            df_resultados.to_csv(ruta_csv, index=False)
+            print(f"✓ CSV: {ruta_csv}")
+        except Exception as e:
+            print(f"✗ CSV: {e}")
+    
+    if 'dataset' in formatos:
+        try:
+            conteo = upsert_resultados(df_resultados, DIRECTORIO_DATASET)
+            print(f"✓ Dataset: {DIRECTORIO_DATASET} ({conteo['filas']} declaraciones)")
+        except Exception as e:
+            print(f"✗ Dataset: {e}")
 
 def mostrar_estadisticas(df):
     """Muestra estadísticas."""
@@ -519,11 +743,14 @@ def mostrar_estadisticas(df):
     print(f"Con ingreso: {con_ingreso}")
     
     if con_ingreso > 0:
-        ing = df[df['ingreso_anual_neto'].notna()]['ingreso_anual_neto']
-        print(f"\nPromedio: ${ing.mean():,.2f}")
-        print(f"Mediana: ${ing.median():,.2f}")
-        print(f"Min: ${ing.min():,.2f}")
-        print(f"Max: ${ing.max():,.2f}")
+        if 'ingreso_anual_neto_centavos' not in df.columns:
+            df = agregar_columnas_centavos(df, ['ingreso_anual_neto'])
+        stats = estadisticas_centavos(pl.from_pandas(df['ingreso_anual_neto_centavos']))
+        print(f"\nPromedio: {formatear_centavos(stats['promedio'])}")
+        print(f"Mediana: {formatear_centavos(stats['mediana'])}")
+        print(f"Min: {formatear_centavos(stats['minimo'])}")
+        print(f"Max: {formatear_centavos(stats['maximo'])}")
+        print(f"Suma: {formatear_centavos(stats['total'])}")
     
     errores = df[df['error'].notna()]
     if len(errores) > 0:
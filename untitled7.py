@@ -7,28 +7,36 @@ Created on Thu Oct  9 14:29:32 2025
 """
 
 # %% VER TOP 10 CON MAYORES INGRESOS
-import pandas as pd
+import polars as pl
+from dataset_resultados import escanear_resultados, cargar_consolidado
+from montos import formatear_centavos
 
-# Leer el último archivo de resultados
-archivos = sorted(DIRECTORIO_RESULTADOS.glob("resultados_*.csv"))
-df_resultados = pd.read_csv(archivos[-1])
+# Particiones a leer (None = todas); p. ej. INSTITUCIONES = ["CENTRO DE INVESTIGACIÓN Y DOCENCIA ECONÓMICAS"]
+INSTITUCIONES = None
+ANIOS = None
 
-# Filtrar solo los que tienen ingreso
-con_ingreso = df_resultados[df_resultados['ingreso_anual_neto'].notna()].copy()
+if INSTITUCIONES is None and ANIOS is None:
+    # Dataset completo: snapshot Arrow mapeado en memoria (sin leer ni copiar)
+    df_resultados = cargar_consolidado()
+else:
+    # Solo se abren los archivos de las particiones pedidas
+    df_resultados = escanear_resultados(INSTITUCIONES, ANIOS).collect()
 
-# Ordenar de mayor a menor
-top_ingresos = con_ingreso.sort_values('ingreso_anual_neto', ascending=False)
+# Filtrar solo los que tienen ingreso y ordenar de mayor a menor
+top_ingresos = (df_resultados
+                .filter(pl.col('ingreso_anual_neto_centavos').is_not_null())
+                .sort('ingreso_anual_neto_centavos', descending=True))
 
 print("\n" + "="*80)
 print("💰 TOP 10 - MAYORES INGRESOS ANUALES NETOS")
 print("="*80)
 
-for idx, row in top_ingresos.head(90).iterrows():
+for idx, row in enumerate(top_ingresos.head(90).iter_rows(named=True)):
     nombre_completo = f"{row['primer_apellido']} {row['segundo_apellido']} {row['nombre']}"
-    ingreso = row['ingreso_anual_neto']
+    ingreso = row['ingreso_anual_neto_centavos']
     print(f"\n{idx+1}. {nombre_completo}")
-    print(f"   💵 Ingreso anual neto: ${ingreso:,.2f}")
-    if pd.notna(row.get('cargo')):
+    print(f"   💵 Ingreso anual neto: {formatear_centavos(ingreso)}")
+    if row.get('cargo') is not None:
         print(f"   👔 Cargo: {row['cargo']}")
-    if pd.notna(row.get('institucion')):
-        print(f"   🏢 Institución: {row['institucion']}")
\ No newline at end of file
+    if row.get('institucion') is not None:
+        print(f"   🏢 Institución: {row['institucion']}")
@@ -14,7 +14,9 @@ print("\n⏱️  Tiempo estimado: ~25-30 minutos")
 print("💡 El navegador se abrirá y trabajará automáticamente")
 print("💡 Puedes minimizar la ventana pero no cierres Spyder\n")
 
-df_resultados_404 = procesar_todas(df, limite=404, forzar_descarga=False)
+# Si la corrida se interrumpe, volver a ejecutar esta celda: con reanudar=True
+# las declaraciones ya terminadas se toman del manifiesto (corridas/)
+df_resultados_404 = procesar_todas(df, limite=404, forzar_descarga=False, reanudar=True)
 #%%
 
 if df_resultados_404 is not None: